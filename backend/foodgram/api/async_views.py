@@ -0,0 +1,130 @@
+"""
+Асинхронные версии самых частых маршрутов чтения.
+
+Под ASGI (foodgram.asgi, воркеры uvicorn) их подключает
+foodgram.asgi_urls вместо вьюсетов DRF: ожидание базы и медленных
+клиентов не занимает поток воркера. Ответы совпадают с ответами
+TagViewSet.list, IngredientViewSet.list и
+RecipeViewset.download_shopping_cart: поиск ингредиентов, проверка
+токена, рендереры и ответ с файлом - общие с ними. Под WSGI работают
+вьюсеты.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from rest_framework import exceptions, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+
+from api.renderers import SHOPPING_LIST_RENDERERS, shopping_list_response
+from api.serializers import IngredientSerializer, TagSerializer
+from foodgram.db_router import ReplicaTokenAuthentication
+from recipes.ingredient_search import find_ingredients
+from recipes.models import Ingredient, ShoppingListIngredient, Tag
+
+# Поля ответа - те же, что у сериализаторов вьюсетов.
+TAG_FIELDS = tuple(TagSerializer().fields)
+INGREDIENT_FIELDS = tuple(IngredientSerializer().fields)
+TOKEN_AUTHENTICATION = ReplicaTokenAuthentication()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(
+        data, status=status_code, safe=False,
+        # Как JSONRenderer DRF: компактно и без \u-экранирования.
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+async def values(queryset):
+    return [row async for row in queryset.aiterator()]
+
+
+def read_only(view):
+    """Только GET и HEAD, как у маршрутов чтения вьюсетов."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            error = exceptions.MethodNotAllowed(request.method)
+            response = json_response(
+                {'detail': error.detail}, error.status_code
+            )
+            response['Allow'] = 'GET, HEAD'
+            return response
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@read_only
+async def tag_list(request):
+    return json_response(await values(Tag.objects.values(*TAG_FIELDS)))
+
+
+@read_only
+async def ingredient_list(request):
+    """Как IngredientViewSet.list, поиск - тот же find_ingredients."""
+    name = request.GET.get('name')
+    search = request.GET.get('search')
+    if not (name or search):
+        return json_response(
+            await values(Ingredient.objects.values(*INGREDIENT_FIELDS))
+        )
+    # Индекс может строиться из базы при первом обращении.
+    return json_response(await sync_to_async(find_ingredients)(
+        name, search, request.GET.get('limit')
+    ))
+
+
+async def authenticate(request):
+    """Пользователь по заголовку Authorization, как во вьюсете."""
+    user_auth = await sync_to_async(TOKEN_AUTHENTICATION.authenticate)(
+        Request(request)
+    )
+    if user_auth is None:
+        raise exceptions.NotAuthenticated()
+    return user_auth[0]
+
+
+def negotiate(request):
+    """Рендерер, как в APIView: при неизвестном формате - первый из списка."""
+    renderers = [renderer() for renderer in SHOPPING_LIST_RENDERERS]
+    try:
+        renderer, _ = DefaultContentNegotiation().select_renderer(
+            Request(request), renderers
+        )
+        return renderer, None
+    except Http404:
+        # exception_handler DRF превращает Http404 в NotFound.
+        return renderers[0], exceptions.NotFound()
+
+
+@read_only
+async def download_shopping_cart(request):
+    """
+    Как RecipeViewset.download_shopping_cart: файл отдается потоком
+    из QuerySet.aiterator(), формат и ошибки - так же, как в DRF.
+    """
+    renderer, error = negotiate(request)
+    content_type = f'{renderer.media_type}; charset={renderer.charset}'
+    try:
+        user = await authenticate(request)
+        if error:
+            raise error
+    except exceptions.APIException as error:
+        response = HttpResponse(
+            renderer.render({'detail': error.detail}),
+            status=error.status_code,
+            content_type=content_type
+        )
+        if error.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = (
+                TOKEN_AUTHENTICATION.authenticate_header(request)
+            )
+        return response
+    ingredients = ShoppingListIngredient.objects.file_rows(user)
+    return shopping_list_response(
+        user, renderer.astream(ingredients.aiterator()), renderer
+    )
@@ -0,0 +1,180 @@
+import base64
+import binascii
+import io
+import re
+import uuid
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from foodgram.constants import (
+    BASE64_CHUNK_SIZE,
+    MAX_IMAGE_PIXELS,
+    MAX_IMAGE_UPLOAD_SIZE,
+)
+
+# Начало файла -> (формат Pillow, расширение).
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'PNG', 'png'),
+    (b'\xff\xd8\xff', 'JPEG', 'jpg'),
+    (b'GIF87a', 'GIF', 'gif'),
+    (b'GIF89a', 'GIF', 'gif'),
+    (b'RIFF', 'WEBP', 'webp'),
+)
+NOT_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
+# Сколько первых байт картинки смотреть для проверки типа и размеров.
+HEADER_SIZE = 16 * 1024
+
+
+class StreamingBase64ImageField(serializers.ImageField):
+    """
+    Картинка в base64 (можно с заголовком data:image/...;base64,).
+    Строка декодируется кусками во временный файл, поэтому память
+    на загрузку не зависит от размера картинки. Тип и размеры в
+    пикселях проверяются по первым байтам, до декодирования остального.
+    Django затем перемещает временный файл в хранилище, не копируя.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Картинка должна быть строкой base64.',
+        'too_large': 'Размер картинки больше {max_size} МБ.',
+        'invalid_type': 'Допустимы картинки PNG, JPEG, GIF и WebP.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+
+    def to_internal_value(self, data):
+        if data in ('', None):
+            return None
+        if not isinstance(data, str):
+            self.fail('invalid_base64')
+        start = data.find(';base64,', 0, 100)
+        start = 0 if start == -1 else start + len(';base64,')
+        if (len(data) - start) * 3 // 4 > MAX_IMAGE_UPLOAD_SIZE:
+            self.fail('too_large', max_size=MAX_IMAGE_UPLOAD_SIZE >> 20)
+
+        upload = TemporaryUploadedFile(
+            name='image', content_type=None, size=0, charset=None
+        )
+        try:
+            extension = self.decode(data, start, upload)
+            upload.size = upload.tell()
+            upload.seek(0)
+            upload.name = f'{uuid.uuid4()}.{extension}'
+            image_file = super().to_internal_value(upload)
+            self.check_pixels(*image_file.image.size)
+            return image_file
+        except BaseException:
+            upload.close()
+            raise
+
+    def decode(self, data, start, upload):
+        """Пишет декодированные байты в upload, возвращает расширение."""
+        extension = None
+        head = b''
+        carry = ''
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            chunk = carry + data[position:position + BASE64_CHUNK_SIZE]
+            if NOT_BASE64.search(chunk):
+                chunk = NOT_BASE64.sub('', chunk)
+            aligned = len(chunk) - len(chunk) % 4
+            chunk, carry = chunk[:aligned], chunk[aligned:]
+            try:
+                decoded = base64.b64decode(chunk)
+            except (binascii.Error, ValueError):
+                self.fail('invalid_base64')
+            if extension is None and len(head) < HEADER_SIZE:
+                head += decoded
+                if len(head) >= HEADER_SIZE:
+                    extension = self.check_header(head)
+            upload.write(decoded)
+        if carry.strip('='):
+            self.fail('invalid_base64')
+        if extension is None and head:
+            extension = self.check_header(head)
+        if extension is None:
+            self.fail('invalid_image')
+        return extension
+
+    def check_header(self, head):
+        """Тип по сигнатуре и, если хватает байт, размеры в пикселях."""
+        for signature, image_format, extension in SIGNATURES:
+            if head.startswith(signature):
+                break
+        else:
+            self.fail('invalid_type')
+        if image_format == 'WEBP' and head[8:12] != b'WEBP':
+            self.fail('invalid_type')
+        try:
+            with Image.open(
+                io.BytesIO(head), formats=(image_format,)
+            ) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=MAX_IMAGE_PIXELS)
+        except Exception:
+            # Заголовок не уместился в первый кусок (например, JPEG
+            # с большим EXIF): размеры проверятся по всему файлу.
+            return extension
+        self.check_pixels(width, height)
+        return extension
+
+    def check_pixels(self, width, height):
+        if width * height > MAX_IMAGE_PIXELS:
+            self.fail('too_many_pixels', max_pixels=MAX_IMAGE_PIXELS)
+
+
+def get_by_ids(queryset, ids, message):
+    """
+    Объекты по списку id одним запросом id__in, в порядке ids.
+    Все ненайденные id сообщаются одной ошибкой.
+    """
+    objects = queryset.in_bulk(set(ids))
+    missing = sorted(set(ids) - objects.keys())
+    if missing:
+        raise serializers.ValidationError(
+            message.format(ids=', '.join(map(str, missing)))
+        )
+    return [objects[pk] for pk in ids]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список id, который проверяется одним запросом, а не по одному."""
+
+    default_error_messages = {
+        'does_not_exist': 'Не найдены объекты с id: {ids}.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                ids.append(int(item))
+            except (TypeError, ValueError):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+        return get_by_ids(
+            self.child_relation.get_queryset(),
+            ids,
+            self.error_messages['does_not_exist']
+        )
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, с many=True ищущий все id одним запросом."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
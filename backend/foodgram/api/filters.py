@@ -1,6 +1,7 @@
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.recipe_search import search_recipes
 
 
 class RecipeFilter(FilterSet):
@@ -17,6 +18,8 @@ class RecipeFilter(FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all(),
     )
+    # Полнотекстовый поиск по названию и описанию, см. recipes.recipe_search
+    search = filters.CharFilter(method='method_search')
 
     class Meta:
         model = Recipe
@@ -24,7 +27,8 @@ class RecipeFilter(FilterSet):
             'is_in_shopping_cart',
             'is_favorited',
             'author',
-            'tags'
+            'tags',
+            'search'
         )
 
     def method_is_favorited(self, queryset, name, value):
@@ -37,11 +41,16 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shoppingcart__user=self.request.user)
         return queryset
 
+    def method_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
+
 
 class IngredientsFilter(FilterSet):
     """Фильтр для ингредиентов"""
 
-    name = filters.CharFilter(lookup_expr='startswith')
+    name = filters.CharFilter(lookup_expr='istartswith')
 
     class Meta:
         model = Ingredient
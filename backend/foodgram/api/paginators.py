@@ -1,5 +1,114 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.constants import CURSOR_PAGE_SIZE
 
 
 class CustomPaginationLimit(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipePagination(CustomPaginationLimit):
+    """
+    Постраничный вывод рецептов.
+    По умолчанию - номера страниц. С параметром cursor (можно пустым)
+    включается keyset-пагинация по (pub_date, id) как в Recipe.Meta.ordering:
+    вместо OFFSET и COUNT(*) каждая страница - один запрос по индексу
+    с условием на ключ последнего рецепта, на любой глубине ленты.
+    Список в другом порядке (например, по релевантности в ?search=)
+    курсор не переупорядочивает: для него остаются номера страниц.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    # Порядки, совпадающие с ключом курсора; () - Recipe.Meta.ordering.
+    cursor_orderings = ((), ('-pub_date', '-id'), ('-pub_date', '-pk'))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.cursor_query_param in request.query_params
+            and tuple(queryset.query.order_by) in self.cursor_orderings
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request) or CURSOR_PAGE_SIZE
+        reverse, position = self.decode_cursor(request)
+
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                )
+        ordering = ('pub_date', 'pk') if reverse else ('-pub_date', '-pk')
+        results = list(queryset.order_by(*ordering)[:size + 1])
+        has_more = len(results) > size
+        results = results[:size]
+        if reverse:
+            results.reverse()
+
+        # В обратном направлении "еще" означает наличие предыдущей страницы.
+        has_next = (has_more if not reverse else position is not None)
+        has_previous = (has_more if reverse else position is not None)
+        self.next_position = (
+            self.position_of(results[-1]) if has_next and results else None
+        )
+        self.previous_position = (
+            self.position_of(results[0]) if has_previous and results else None
+        )
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.next_position, reverse=False),
+            'previous': self.get_cursor_link(
+                self.previous_position, reverse=True
+            ),
+            'results': data,
+        })
+
+    @staticmethod
+    def position_of(recipe):
+        return recipe.pub_date, recipe.pk
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        pub_date, pk = position
+        cursor = urlsafe_b64encode(
+            f'{int(reverse)}|{pub_date.isoformat()}|{pk}'.encode()
+        ).decode()
+        return replace_query_param(
+            remove_query_param(self.base_url, 'page'),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def decode_cursor(self, request):
+        """Возвращает (направление назад, (pub_date, id) или None)."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            reverse, pub_date, pk = urlsafe_b64decode(
+                encoded.encode()
+            ).decode().split('|')
+            return bool(int(reverse)), (datetime.fromisoformat(pub_date),
+                                        int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
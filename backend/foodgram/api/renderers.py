@@ -0,0 +1,133 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from rest_framework import renderers
+
+SHOPPING_LIST_TITLE = ('Ваш список ингредиентов для '
+                       'создания всех рецептов из корзины.\n\n')
+SHOPPING_LIST_FIELDS = ('name', 'amount', 'measurement_unit')
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: отдает строку вместо записи в файл."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListStreamMixin(ABC):
+    """
+    Файл списка покупок по частям: head, строка line на каждый
+    ингредиент и tail. stream читает обычный итератор строк базы,
+    astream - асинхронный (QuerySet.aiterator() в async-вьюхах).
+    """
+
+    def head(self):
+        return ''
+
+    @abstractmethod
+    def line(self, ingredient, number):
+        """Строка файла для ingredient, number - номер с единицы."""
+
+    def tail(self, count):
+        return ''
+
+    def stream(self, ingredients):
+        yield self.head()
+        count = 0
+        for count, ingredient in enumerate(ingredients, 1):
+            yield self.line(ingredient, count)
+        yield self.tail(count)
+
+    async def astream(self, ingredients):
+        yield self.head()
+        count = 0
+        async for ingredient in ingredients:
+            count += 1
+            yield self.line(ingredient, count)
+        yield self.tail(count)
+
+
+class ShoppingListTextRenderer(ShoppingListStreamMixin,
+                               renderers.BaseRenderer):
+    """
+    Список покупок в формате txt.
+    Строки файла отдаются генератором stream, render нужен
+    только для ответов с ошибками.
+    """
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def head(self):
+        return SHOPPING_LIST_TITLE
+
+    def line(self, ingredient, number):
+        return (f'{ingredient["name"]} --> '
+                f'{ingredient["amount"]} '
+                f'({ingredient["measurement_unit"]})\n')
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    """Список покупок в формате csv."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    writer = csv.writer(Echo())
+
+    def head(self):
+        return self.writer.writerow(SHOPPING_LIST_FIELDS)
+
+    def line(self, ingredient, number):
+        return self.writer.writerow(
+            ingredient[field] for field in SHOPPING_LIST_FIELDS
+        )
+
+
+class ShoppingListJSONRenderer(ShoppingListStreamMixin,
+                               renderers.JSONRenderer):
+    """Список покупок в формате json, массив пишется по одному элементу."""
+
+    charset = 'utf-8'
+
+    def line(self, ingredient, number):
+        return ('[' if number == 1 else ',') + json.dumps(
+            {field: ingredient[field] for field in SHOPPING_LIST_FIELDS},
+            ensure_ascii=False
+        )
+
+    def tail(self, count):
+        return ']' if count else '[]'
+
+
+# Форматы скачивания списка покупок: первый - по умолчанию.
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+)
+
+
+def shopping_list_response(user, content, renderer):
+    """
+    Файл списка покупок потоком: content - renderer.stream(...)
+    во вьюсете или renderer.astream(...) в async-вьюхе.
+    """
+    response = StreamingHttpResponse(
+        content,
+        content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment=True,
+        filename=f'{user.username}_shopping_list_ingredients.{renderer.format}'
+    )
+    return response
@@ -1,15 +1,28 @@
 # api.serializers
 # Все сериализаторы
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 
-from foodgram.constants import MAX_AMOUNT_VALUE, MIN_VALUE, MAX_COOKING_VALUE
+from api.fields import (
+    BulkPrimaryKeyRelatedField,
+    StreamingBase64ImageField,
+    get_by_ids
+)
+from foodgram.constants import (
+    MAX_AMOUNT_VALUE,
+    MAX_BATCH_RECIPES,
+    MAX_COOKING_VALUE,
+    MIN_VALUE
+)
+from recipes import jobs
 from recipes.models import (
-    Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
-    ShoppingCart,
+    RecipeJob,
+    ShoppingListIngredient,
     Tag,
     User
 )
@@ -34,6 +47,9 @@ class FoodgramUserSerializer(serializers.ModelSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            # Значение уже посчитано в queryset через annotate_subscribed
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (user.is_authenticated
                 and user.follower.filter(
@@ -52,7 +68,7 @@ class FollowSerializer(FoodgramUserSerializer):
     """
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(FoodgramUserSerializer.Meta):
         fields = ('email',
@@ -68,6 +84,8 @@ class FollowSerializer(FoodgramUserSerializer):
         """Получение краткой информации о рецептах."""
         request = self.context.get('request')
         recipes_limit = request.query_params.get('recipes_limit')
+        # Если рецепты подгружены через prefetch во вьюсете,
+        # они уже ограничены лимитом и срез не делает запросов.
         recipes = obj.recipes.all()
 
         if recipes_limit and recipes_limit.isdigit():
@@ -80,9 +98,6 @@ class FollowSerializer(FoodgramUserSerializer):
             read_only=True
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class FollowModelSerializer(serializers.ModelSerializer):
     """Сериализатор для модели подписки."""
@@ -107,9 +122,6 @@ class FollowModelSerializer(serializers.ModelSerializer):
             )
         return data
 
-    def to_representation(self, instance):
-        return FollowSerializer(instance.following, context=self.context).data
-
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """
@@ -142,11 +154,25 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    """Ингредиенты всех строк рецепта ищутся одним запросом."""
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = get_by_ids(
+            Ingredient.objects.all(),
+            [item['id'] for item in items],
+            'Нет ингредиентов с id: {ids}.'
+        )
+        for item, ingredient in zip(items, ingredients):
+            item['id'] = ingredient
+        return items
+
+
 class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор модели Ингредиент для добавления в рецепт."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                            write_only=True)
+    id = serializers.IntegerField(write_only=True)
     amount = serializers.IntegerField(
         min_value=MIN_VALUE,
         max_value=MAX_AMOUNT_VALUE
@@ -155,6 +181,7 @@ class IngredientAddToRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
@@ -164,14 +191,15 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
     author = FoodgramUserSerializer(read_only=True)
     ingredients = IngredientAddToRecipeSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
     cooking_time = serializers.IntegerField(
         min_value=MIN_VALUE,
         max_value=MAX_COOKING_VALUE
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
-        many=True
+        many=True,
+        error_messages={'does_not_exist': 'Нет тегов с id: {ids}.'}
     )
 
     class Meta:
@@ -210,6 +238,16 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Need to add an image!')
         return value
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл картинки хранилище перемещает, а не копирует,
+            # закрываем его сами, как Django закрывает загруженные файлы.
+            image = self.validated_data.get('image')
+            if image:
+                image.close()
+
     @staticmethod
     def save_ingredients(recipe, ingredients):
         """Отдельная функция для сохранения ингредиентов."""
@@ -222,6 +260,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(ingredients_list)
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients = validated_data.pop('ingredients')
@@ -229,18 +268,64 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags)
         self.save_ingredients(recipe, ingredients)
+        # Похожие рецепты пересчитывает воркер process_recipe_jobs.
+        jobs.enqueue([recipe], (RecipeJob.SIMILAR,))
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, new_amounts):
+        """
+        Пишет только разницу с текущими ингредиентами рецепта: новые
+        строки, измененные количества и удаленные строки.
+        Возвращает прежние количества {ingredient_id: amount}.
+        """
+        existing = {
+            row.ingredient_id: row for row in recipe.recipe_ingredient.all()
+        }
+        old_amounts = {key: row.amount for key, row in existing.items()}
+        to_create, to_update = [], []
+        for ingredient_id, amount in new_amounts.items():
+            row = existing.get(ingredient_id)
+            if row is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            recipe.recipe_ingredient.filter(ingredient__in=removed).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        return old_amounts
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
+        new_amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in validated_data.pop('ingredients')
+        }
         tags = validated_data.pop('tags')
-        instance.tags.clear()
+        old_tags = {tag.pk for tag in instance.tags.all()}
+        # set() сам добавляет и удаляет только отличающиеся теги.
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.save_ingredients(instance, ingredients)
+        old_amounts = self.update_ingredients(instance, new_amounts)
+        ShoppingListIngredient.objects.update_recipe(
+            instance, old_amounts, new_amounts
+        )
+        if (old_amounts.keys() != new_amounts.keys()
+                or old_tags != {tag.pk for tag in tags}):
+            jobs.enqueue([instance], (RecipeJob.SIMILAR,))
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags', 'recipe_ingredient__ingredient',
+            'image_variants'
+        )
         return GetRecipeDetailSerializer(instance, context=self.context).data
 
 
@@ -279,8 +364,10 @@ class GetRecipeDetailSerializer(serializers.ModelSerializer):
         source='recipe_ingredient'
     )
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
     is_favorited = serializers.IntegerField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    favorites_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -291,48 +378,35 @@ class GetRecipeDetailSerializer(serializers.ModelSerializer):
             'ingredients',
             'is_favorited',
             'is_in_shopping_cart',
+            'favorites_count',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для корзины."""
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже в корзине.'
+    def get_image_variants(self, obj):
+        """
+        Ссылки на готовые варианты текущей картинки. Пока воркер их
+        не сделал, словарь пустой и клиент показывает image.
+        """
+        request = self.context.get('request')
+        return {
+            variant.kind: (
+                request.build_absolute_uri(variant.file.url)
+                if request else variant.file.url
             )
-        ]
-
-    def to_representation(self, instance):
-        return RecipeMinifiedSerializer(
-            instance.recipe, context=self.context
-        ).data
-
+            for variant in obj.image_variants.all()
+            if variant.source == obj.image.name
+        }
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор для избранного."""
 
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже в избранном.'
-            )
-        ]
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного изменения корзины и избранного."""
 
-    def to_representation(self, instance):
-        return GetRecipeDetailSerializer(
-            instance.recipe, context=self.context
-        ).data
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_RECIPES
+    )
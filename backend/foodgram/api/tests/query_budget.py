@@ -0,0 +1,72 @@
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+from rest_framework.serializers import Serializer
+
+UNATTRIBUTED = '<view>'
+
+
+def serializer_field_path():
+    """
+    Путь сериализуемого в данный момент поля по стеку вызовов,
+    например 'GetRecipeDetailSerializer.author > FoodgramUserSerializer.id'.
+    """
+    path = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        field = frame.f_locals.get('field')
+        serializer = frame.f_locals.get('self')
+        if (frame.f_code.co_name == 'to_representation'
+                and isinstance(serializer, Serializer)
+                and field is not None):
+            path.append(
+                f'{type(serializer).__name__}.{field.field_name}'
+            )
+        frame = frame.f_back
+    return ' > '.join(reversed(path)) or UNATTRIBUTED
+
+
+class QueryRecorder:
+    """Запоминает SQL-запросы вместе с полем сериализатора."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((serializer_field_path(), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        lines = []
+        for source, count in Counter(
+            source for source, _ in self.queries
+        ).most_common():
+            sql = next(sql for name, sql in self.queries if name == source)
+            lines.append(f'  {count:>4} x {source}\n         {sql[:200]}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    Проверка количества SQL-запросов с разбивкой по полям. exact=True -
+    ровно budget запросов, как assertNumQueries: тогда тест замечает
+    и лишний, и пропавший запрос (например, потерянную аннотацию,
+    которую заменили запросы в другом месте).
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, exact=False):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            yield recorder
+        if len(recorder) > budget or exact and len(recorder) != budget:
+            expected = 'ровно' if exact else 'при бюджете'
+            self.fail(
+                f'{len(recorder)} запросов, ожидалось {expected} {budget}:\n'
+                f'{recorder.report()}'
+            )
@@ -0,0 +1,27 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+
+class TempMediaMixin:
+    """
+    Временный каталог на тест-класс: в нем MEDIA_ROOT и индекс
+    ингредиентов (INGREDIENT_INDEX_PATH). Настройки подменяются до
+    setUpTestData, каталог удаляется после тестов класса.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.temp_dir, ignore_errors=True)
+        temp_settings = override_settings(
+            MEDIA_ROOT=cls.temp_dir,
+            INGREDIENT_INDEX_PATH=os.path.join(
+                cls.temp_dir, 'ingredients.idx'
+            )
+        )
+        temp_settings.enable()
+        cls.addClassCleanup(temp_settings.disable)
+        super().setUpClass()
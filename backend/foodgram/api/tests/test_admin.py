@@ -0,0 +1,200 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from users.models import FoodgramUser, Follow
+
+CHANGELISTS = (
+    '/admin/recipes/recipe/',
+    '/admin/recipes/recipeingredient/',
+    '/admin/recipes/favorite/',
+    '/admin/recipes/shoppingcart/',
+    '/admin/users/foodgramuser/',
+    '/admin/users/follow/',
+)
+
+
+class AdminScalingTests(TestCase):
+    """Запросы и размер страниц админки не растут вместе с данными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = FoodgramUser.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass'
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(5)
+        )
+        cls.tag = Tag.objects.create(name='тег', color='#000000', slug='tag')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.created = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.created += 1
+            author = FoodgramUser.objects.create_user(
+                email=f'author{self.created}@foodgram.ru',
+                username=f'author{self.created}',
+                password='pass'
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'рецепт {self.created}',
+                text='описание',
+                image='recipes/images/test.png',
+                cooking_time=10
+            )
+            recipe.tags.add(self.tag)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=10)
+                for ingredient in self.ingredients
+            )
+            Favorite.objects.create(user=author, recipe=recipe)
+            ShoppingCart.objects.create(user=author, recipe=recipe)
+            Follow.objects.create(user=self.admin, following=author)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_are_constant(self):
+        self.add_rows(2)
+        few = {url: self.count_queries(url) for url in CHANGELISTS}
+        self.add_rows(20)
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+    def test_recipe_ingredients_are_aggregated(self):
+        self.add_rows(1)
+        response = self.client.get('/admin/recipes/recipe/')
+        self.assertContains(response, 'ингредиент 0, ингредиент')
+        self.assertContains(response, 'ингредиент 4')
+
+    def test_pickers_do_not_list_all_rows(self):
+        self.add_rows(3)
+        response = self.client.get('/admin/recipes/recipe/add/')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'ингредиент 3')
+        self.assertNotContains(response, 'author2@foodgram.ru')
+        response = self.client.get('/admin/recipes/recipe/')
+        self.assertNotContains(response, 'author__id__exact')
+
+    def test_input_filters(self):
+        self.add_rows(12)
+        response = self.client.get(
+            '/admin/recipes/recipe/?author=author1&name=рецепт 1'
+        )
+        self.assertEqual(
+            {recipe.name for recipe in
+             response.context['cl'].result_list},
+            {'рецепт 1', 'рецепт 10', 'рецепт 11', 'рецепт 12'}
+        )
+        response = self.client.get('/admin/users/foodgramuser/?email=admin')
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.admin]
+        )
+
+    def test_autocomplete_searches_by_prefix(self):
+        for term, expected in (('ингр', 5), ('редиент', 0)):
+            response = self.client.get('/admin/autocomplete/', {
+                'app_label': 'recipes',
+                'model_name': 'recipeingredient',
+                'field_name': 'ingredient',
+                'term': term,
+            })
+            self.assertEqual(len(response.json()['results']), expected)
+
+
+class AdminCountersTests(TempMediaMixin, TestCase):
+    """Счетчики популярности нельзя задать из админки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = FoodgramUser.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.tag = Tag.objects.create(name='тег', color='#000000', slug='tag')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def recipe_form(self, url, **data):
+        """Данные формы рецепта со счетчиками, которых в форме нет."""
+        formset = self.client.get(url).context[
+            'inline_admin_formsets'
+        ][0].formset
+        prefix = formset.prefix
+        if formset.initial_forms:
+            data[f'{prefix}-0-id'] = formset.initial_forms[0].instance.pk
+        return {
+            'author': self.admin.pk,
+            'name': 'рецепт',
+            'text': 'описание',
+            'tags': [self.tag.pk],
+            'cooking_time': 10,
+            f'{prefix}-TOTAL_FORMS': 1,
+            f'{prefix}-INITIAL_FORMS': formset.initial_form_count(),
+            f'{prefix}-MIN_NUM_FORMS': 1,
+            f'{prefix}-MAX_NUM_FORMS': 1000,
+            f'{prefix}-0-ingredient': self.ingredient.pk,
+            f'{prefix}-0-amount': 5,
+            'favorites_count': 99,
+            'in_carts_count': 99,
+            **data
+        }
+
+    def test_recipe_counters_are_ignored(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+        url = '/admin/recipes/recipe/add/'
+        response = self.client.post(url, self.recipe_form(
+            url, image=SimpleUploadedFile(
+                'recipe.png', buffer.getvalue(), 'image/png'
+            )
+        ))
+        self.assertEqual(response.status_code, 302)
+        recipe = Recipe.objects.get()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (0, 0)
+        )
+
+        Favorite.objects.create(user=self.admin, recipe=recipe)
+        url = f'/admin/recipes/recipe/{recipe.pk}/change/'
+        response = self.client.post(
+            url, self.recipe_form(url, name='новое название')
+        )
+        self.assertEqual(response.status_code, 302)
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.name, recipe.favorites_count, recipe.in_carts_count),
+            ('новое название', 1, 0)
+        )
+
+    def test_user_counters_are_ignored(self):
+        url = f'/admin/users/foodgramuser/{self.admin.pk}/change/'
+        form = self.client.get(url).context['adminform'].form
+        self.assertNotIn('recipes_count', form.fields)
+        self.assertNotIn('followers_count', form.fields)
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.temp_media import TempMediaMixin
+from foodgram.asgi import ASGI_URLCONF
+from recipes.ingredient_index import build_index
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from users.models import FoodgramUser
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+async def read(response):
+    if not response.streaming:
+        return response.content
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class AsyncViewsTests(TempMediaMixin, TestCase):
+    """Async-вьюхи под ASGI отвечают так же, как вьюсеты под WSGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        Tag.objects.bulk_create(
+            Tag(name=f'тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+            for i in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Молоко', 'молоко топленое', 'мука', 'яблоко')
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user,
+            name='рецепт',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+            for ingredient in ingredients
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        build_index()
+
+    def compare(self, method, url, data=None, token=None, **headers):
+        """(статус, заголовки, тело) вьюсета и async-вьюхи должны совпасть."""
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        sync = getattr(APIClient(), method)(url, data, headers=headers)
+        with self.settings(ROOT_URLCONF=ASGI_URLCONF):
+            asynchronous = async_to_sync(getattr(AsyncClient(), method))(
+                url, data, headers=headers
+            )
+            body = async_to_sync(read)(asynchronous)
+        self.assertIsNone(getattr(asynchronous, 'data', None))
+        expected = (
+            sync.getvalue() if sync.streaming else sync.content
+        )
+        self.assertEqual(
+            (asynchronous.status_code, body),
+            (sync.status_code, expected)
+        )
+        for header in ('Content-Type', 'Content-Disposition',
+                       'WWW-Authenticate'):
+            self.assertEqual(asynchronous.get(header), sync.get(header))
+        return asynchronous
+
+    def test_tags(self):
+        self.compare('get', '/api/tags/')
+
+    def test_ingredients(self):
+        for params in ({}, {'name': 'мол'}, {'search': 'малоко'},
+                       {'name': 'м', 'limit': 1}):
+            with self.subTest(params=params):
+                self.compare('get', '/api/ingredients/', params)
+
+    @mock.patch('recipes.ingredient_search.get_index', side_effect=OSError)
+    def test_ingredients_without_index(self, get_index):
+        for params in ({'name': 'мол'}, {'search': 'малоко'}):
+            with self.subTest(params=params):
+                self.compare('get', '/api/ingredients/', params)
+        self.assertEqual(get_index.call_count, 4)
+
+    def test_download_shopping_cart(self):
+        for params, headers in (
+            ({}, {}),
+            ({'format': 'csv'}, {}),
+            ({}, {'Accept': 'application/json'}),
+        ):
+            with self.subTest(params=params, headers=headers):
+                response = self.compare(
+                    'get', DOWNLOAD_URL, params, self.token.key, **headers
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_download_errors(self):
+        for token, params, status_code in (
+            (None, {}, 401),
+            ('wrong', {}, 401),
+            (self.token.key, {'format': 'xml'}, 404),
+        ):
+            with self.subTest(token=token, params=params):
+                response = self.compare('get', DOWNLOAD_URL, params, token)
+                self.assertEqual(response.status_code, status_code)
+
+    def test_write_methods_not_allowed(self):
+        with self.settings(ROOT_URLCONF=ASGI_URLCONF):
+            response = async_to_sync(AsyncClient().post)('/api/tags/')
+        self.assertEqual(response.status_code, 405)
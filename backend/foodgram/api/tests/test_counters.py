@@ -0,0 +1,153 @@
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import FoodgramUser, Follow
+
+
+class PopularityCountersTests(TestCase):
+    """Счетчики избранного, корзин, рецептов и подписчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = FoodgramUser.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='рецепт',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        return (self.recipe.favorites_count, self.recipe.in_carts_count,
+                self.author.recipes_count, self.author.followers_count)
+
+    def test_api_writes_change_counters(self):
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.client.post(f'{url}favorite/')
+        self.client.post(f'{url}shopping_cart/')
+        self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+        self.assertEqual(
+            self.client.get(url).data['favorites_count'], 1
+        )
+
+        self.client.delete(f'{url}favorite/')
+        self.client.delete(f'{url}shopping_cart/')
+        self.client.delete(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+
+    def test_toggle_responses(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            set(response.data), {'id', 'name', 'image', 'cooking_time'}
+        )
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'errors': 'Рецепт уже в избранном.'})
+        self.assertEqual(self.counts()[0], 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(self.counts()[0], 0)
+        response = self.client.post('/api/recipes/1000/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'errors': 'Рецепт не найден.'})
+
+    def test_deleting_user_decrements_counters(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        Follow.objects.create(user=self.user, following=self.author)
+        self.user.delete()
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+
+    def test_user_links_are_deleted_in_bulk(self):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=self.author, name=f'рецепт {number}', text='текст',
+                   image='recipes/images/test.png', cooking_time=10)
+            for number in range(10)
+        )
+        other = FoodgramUser.objects.create_user(
+            email='other@foodgram.ru', username='other', password='pass'
+        )
+        for user, count in ((self.user, 1), (other, 10)):
+            for model in (Favorite, ShoppingCart):
+                model.objects.bulk_create(
+                    model(user=user, recipe=recipe)
+                    for recipe in recipes[:count]
+                )
+            Follow.objects.create(user=user, following=self.author)
+        queries = []
+        for user in (self.user, other):
+            with CaptureQueriesContext(connection) as context:
+                user.delete()
+            queries.append(len(context))
+        # Каскад не выбирает связи построчно: запросов столько же,
+        # сколько у пользователя с одной связью.
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(
+            Recipe.objects.filter(
+                favorites_count=0, in_carts_count=0
+            ).count(), 11
+        )
+        self.assertEqual(self.counts()[3], 0)
+
+    def test_direct_deletes_decrement_counters(self):
+        for model in (Favorite, ShoppingCart):
+            model.objects.create(user=self.user, recipe=self.recipe)
+        follow = Follow.objects.create(user=self.user, following=self.author)
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+        Favorite.objects.get(user=self.user).delete()
+        ShoppingCart.objects.filter(user=self.user).delete()
+        follow.delete()
+        self.assertEqual(self.counts(), (0, 0, 1, 0))
+        self.assertIsNone(follow.pk)
+
+    def test_deleting_recipe_decrements_recipes_count(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        Favorite.objects.bulk_create([
+            Favorite(user=self.user, recipe=self.recipe),
+            Favorite(user=self.author, recipe=self.recipe),
+        ])
+        FoodgramUser.objects.filter(pk=self.author.pk).update(
+            recipes_count=7
+        )
+        with self.assertRaises(CommandError):
+            call_command('reconcile_counters', '--check', stdout=None)
+        call_command('reconcile_counters', stdout=None)
+        self.assertEqual(self.counts(), (2, 0, 1, 0))
+        call_command('reconcile_counters', '--check', stdout=None)
+
+    def test_save_does_not_overwrite_counters(self):
+        stale_recipe = Recipe.objects.get(pk=self.recipe.pk)
+        stale_author = FoodgramUser.objects.get(pk=self.author.pk)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Follow.objects.create(user=self.user, following=self.author)
+        stale_recipe.name = 'новое название'
+        stale_recipe.save()
+        stale_author.set_password('new-pass')
+        stale_author.save()
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        self.assertEqual(self.recipe.name, 'новое название')
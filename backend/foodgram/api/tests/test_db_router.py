@@ -0,0 +1,166 @@
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.db_router import (
+    STICKY_CACHE,
+    STICKY_COOKIE,
+    ReplicaMiddleware,
+    ReplicaRouter,
+)
+from recipes.models import Recipe, ShoppingCart
+from users.models import FoodgramUser
+
+REPLICA = 'replica'
+# Реплика для тестов - зеркало основной базы, как реплики в settings:
+# алиас нужен раннеру тестов до создания тестовых баз.
+connections.settings.setdefault(REPLICA, {
+    **connections.settings['default'], 'TEST': {
+        **connections.settings['default']['TEST'], 'MIRROR': 'default'
+    }
+})
+
+router = ReplicaRouter()
+
+
+def view(request):
+    """Отвечает алиасами баз, которые роутер выбрал бы в запросе."""
+    return HttpResponse(
+        f'{router.db_for_read(Recipe)} {router.db_for_write(Recipe)}'
+    )
+
+
+@override_settings(
+    REPLICA_DATABASES=['replica1', 'replica2'], REPLICA_STICKY_SECONDS=5
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Чтение с реплик и чтение своих записей из основной базы."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(view)
+
+    def call(self, method, **cookies):
+        request = getattr(self.factory, method)('/api/recipes/')
+        request.COOKIES.update(cookies)
+        response = self.middleware(request)
+        return response.content.decode().split(), response
+
+    def test_safe_requests_read_from_replica(self):
+        (read, write), response = self.call('get')
+        self.assertIn(read, ('replica1', 'replica2'))
+        self.assertEqual(write, 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_writes_stick_to_primary(self):
+        (read, write), response = self.call('post')
+        self.assertEqual((read, write), ('default', 'default'))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+        (read, _), _ = self.call('get', **{STICKY_COOKIE: '1'})
+        self.assertEqual(read, 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        (read, _), response = self.call('delete')
+        self.assertEqual(read, 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
+        self.assertFalse(router.allow_migrate('replica1', 'recipes'))
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA], REPLICA_STICKY_SECONDS=60)
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Запросы API через настоящий второй алиас: реплика - отдельное
+    соединение с той же тестовой базой, запросы видны по соединениям.
+    """
+
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        caches[STICKY_CACHE].clear()
+        self.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='рецепт',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def tables(self, method, url, **kwargs):
+        """
+        Выполняет запрос, читая потоковый ответ до конца, и возвращает
+        {алиас: SQL всех запросов} для основной базы и реплики.
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return {
+            alias: ' '.join(query['sql'] for query in context)
+            for alias, context in (('default', primary), (REPLICA, replica))
+        }
+
+    def test_reads_go_to_replica(self):
+        sql = self.tables('get', '/api/recipes/')
+        self.assertIn('recipes_recipe', sql[REPLICA])
+        self.assertNotIn('recipes_recipe', sql['default'])
+
+    def test_token_user_reads_own_writes_from_primary(self):
+        # Клиент с токеном не возвращает cookie STICKY_COOKIE.
+        self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.client.cookies.clear()
+        sql = self.tables('get', '/api/recipes/')
+        self.assertIn('recipes_recipe', sql['default'])
+        # С реплики - только поиск токена, который и дает пользователя.
+        self.assertNotIn('recipes_recipe', sql[REPLICA])
+        # Другой пользователь по-прежнему читает с реплики.
+        other = FoodgramUser.objects.create_user(
+            email='other@foodgram.ru', username='other', password='pass'
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other)}'
+        )
+        self.assertIn('recipes_recipe', self.tables('get', '/api/recipes/')[
+            REPLICA
+        ])
+
+    def test_login_reads_from_primary(self):
+        self.client.credentials()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': 'user@foodgram.ru', 'password': 'pass'
+        })
+        self.client.cookies.clear()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+        sql = self.tables('get', '/api/recipes/')
+        self.assertIn('recipes_recipe', sql['default'])
+        self.assertNotIn('recipes_recipe', sql[REPLICA])
+
+    def test_streamed_response_reads_from_replica(self):
+        sql = self.tables('get', '/api/recipes/download_shopping_cart/')
+        self.assertIn('recipes_shoppinglistingredient', sql[REPLICA])
+        self.assertNotIn('recipes_shoppinglistingredient', sql['default'])
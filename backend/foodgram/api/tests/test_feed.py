@@ -0,0 +1,168 @@
+import io
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from foodgram.constants import JOB_LOCK_TIMEOUT
+from recipes.jobs import enqueue, process_jobs
+from recipes.models import Recipe, RecipeJob, TimelineEntry
+from users.models import FoodgramUser, Follow
+
+URL = '/api/recipes/feed/'
+
+
+class FeedTests(TestCase):
+    """Лента подписок: /api/recipes/feed/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.cook, cls.star, cls.stranger = (
+            FoodgramUser.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, password='pass'
+            ) for name in ('reader', 'cook', 'star', 'stranger')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, name):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        call_command('process_recipe_jobs', once=True, stdout=io.StringIO())
+        return recipe
+
+    def feed(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        # Без ?limit= лента отдается списком, без пагинации.
+        recipes = (
+            response.data['results'] if 'limit' in params else response.data
+        )
+        return [recipe['name'] for recipe in recipes]
+
+    def test_new_recipes_are_fanned_out(self):
+        self.publish(self.cook, 'до подписки')
+        self.client.post(f'/api/users/{self.cook.pk}/subscribe/')
+        self.publish(self.cook, 'первый')
+        self.publish(self.stranger, 'чужой')
+        self.publish(self.cook, 'второй')
+        self.assertEqual(self.feed(), ['второй', 'первый', 'до подписки'])
+        self.assertEqual(self.feed(limit=1, page=2), ['первый'])
+
+        self.client.delete(f'/api/users/{self.cook.pk}/subscribe/')
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @mock.patch('recipes.feed.FEED_FANOUT_MAX_FOLLOWERS', 1)
+    def test_popular_authors_are_fanned_in(self):
+        Follow.objects.create(user=self.stranger, following=self.star)
+        self.client.post(f'/api/users/{self.star.pk}/subscribe/')
+        self.client.post(f'/api/users/{self.cook.pk}/subscribe/')
+        self.publish(self.star, 'звездный')
+        self.publish(self.cook, 'домашний')
+        self.publish(self.star, 'снова звездный')
+        self.assertEqual(
+            self.feed(), ['снова звездный', 'домашний', 'звездный']
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+
+    @mock.patch('recipes.feed.FEED_LENGTH', 2)
+    def test_timelines_are_trimmed(self):
+        Follow.objects.create(user=self.reader, following=self.cook)
+        for number in range(4):
+            self.publish(self.cook, f'рецепт {number}')
+        self.assertEqual(self.feed(), ['рецепт 3', 'рецепт 2'])
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+
+    def test_fan_out_runs_in_worker(self):
+        Follow.objects.create(user=self.reader, following=self.cook)
+        recipe = Recipe.objects.create(
+            author=self.cook,
+            name='первый',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        self.assertEqual(self.feed(), [])
+        with mock.patch(
+            'recipes.feed.fan_out', side_effect=DatabaseError('сбой')
+        ):
+            self.assertEqual(process_jobs(10), (0, 1))
+        job = RecipeJob.objects.get(recipe=recipe, kind=RecipeJob.FEED)
+        self.assertEqual((job.attempts, job.error),
+                         (1, 'DatabaseError: сбой'))
+        self.assertEqual(process_jobs(10), (1, 0))
+        self.assertEqual(self.feed(), ['первый'])
+        self.assertFalse(RecipeJob.objects.exists())
+
+    def test_job_requeued_while_running_stays_queued(self):
+        recipe = Recipe.objects.create(
+            author=self.cook,
+            name='первый',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        with mock.patch(
+            'recipes.feed.fan_out',
+            side_effect=lambda *args: enqueue([recipe], (RecipeJob.FEED,))
+        ):
+            self.assertEqual(process_jobs(10), (1, 0))
+        job = RecipeJob.objects.get(recipe=recipe)
+        self.assertEqual((job.attempts, job.locked_at), (0, None))
+        self.assertEqual(process_jobs(10), (1, 0))
+        self.assertFalse(RecipeJob.objects.exists())
+
+    def test_job_of_crashed_worker_is_taken_again(self):
+        Recipe.objects.create(
+            author=self.cook,
+            name='первый',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        RecipeJob.objects.update(locked_at=timezone.now(), attempts=1)
+        self.assertEqual(process_jobs(10), (0, 0))
+        RecipeJob.objects.update(locked_at=timezone.now() - timedelta(
+            seconds=JOB_LOCK_TIMEOUT + 1
+        ))
+        self.assertEqual(process_jobs(10), (1, 0))
+        self.assertFalse(RecipeJob.objects.exists())
+
+    def test_rebuild(self):
+        Follow.objects.create(user=self.reader, following=self.cook)
+        Follow.objects.create(user=self.stranger, following=self.cook)
+        self.publish(self.cook, 'первый')
+        self.publish(self.cook, 'второй')
+        TimelineEntry.objects.filter(user=self.reader).delete()
+        call_command('rebuild_feeds', stdout=io.StringIO())
+        self.assertEqual(self.feed(), ['второй', 'первый'])
+        self.assertEqual(TimelineEntry.objects.count(), 4)
+
+    def test_migration_fills_existing_feeds(self):
+        Follow.objects.create(user=self.reader, following=self.cook)
+        self.publish(self.cook, 'первый')
+        self.publish(self.cook, 'второй')
+        TimelineEntry.objects.all().delete()
+        import_module(
+            'recipes.migrations.0016_fill_timeline'
+        ).fill_timeline(apps, None)
+        self.assertEqual(self.feed(), ['второй', 'первый'])
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get(URL).status_code, 401)
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.ingredient_index import build_index, get_index
+from recipes.models import Ingredient
+
+
+class IngredientIndexTests(TempMediaMixin, TestCase):
+    """Автодополнение ингредиентов по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'Молоко', 'молоко топленое', 'молотый перец',
+                'мука', 'абрикос', 'яблоко', 'масло сливочное',
+            )
+        )
+        build_index()
+
+    def search(self, name, mode='name', **params):
+        response = APIClient().get(
+            '/api/ingredients/', {mode: name, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(
+            self.search('МОЛО'),
+            ['Молоко', 'молоко топленое', 'молотый перец']
+        )
+        self.assertEqual(self.search('яблоко'), ['яблоко'])
+        self.assertEqual(self.search('я'), ['яблоко'])
+        self.assertEqual(self.search('ананас'), [])
+
+    def test_ranked_search_with_typos(self):
+        self.assertEqual(self.search('молако', mode='search'), ['Молоко'])
+        self.assertEqual(
+            self.search('сливочное', mode='search'), ['масло сливочное']
+        )
+
+    def test_ranked_search_puts_prefix_first(self):
+        self.assertEqual(
+            self.search('моло', mode='search')[:3],
+            ['Молоко', 'молоко топленое', 'молотый перец']
+        )
+
+    def test_limit(self):
+        self.assertEqual(
+            self.search('мо', limit=2), ['Молоко', 'молоко топленое']
+        )
+
+    @mock.patch('recipes.ingredient_search.INGREDIENTS_SEARCH_LIMIT', 1)
+    def test_default_limit_only_for_search(self):
+        self.assertEqual(
+            self.search('моло'),
+            ['Молоко', 'молоко топленое', 'молотый перец']
+        )
+        self.assertEqual(self.search('моло', mode='search'), ['Молоко'])
+
+    def test_corrupt_index_falls_back_to_database(self):
+        self.addCleanup(build_index)
+        with open(settings.INGREDIENT_INDEX_PATH, 'wb') as index_file:
+            index_file.write(b'not an index')
+        self.assertEqual(self.search('мук'), ['мука'])
+        self.assertEqual(self.search('ябл', mode='search'), ['яблоко'])
+
+    def test_failed_build_falls_back_to_database(self):
+        with mock.patch(
+            'recipes.ingredient_search.get_index',
+            side_effect=DatabaseError
+        ):
+            self.assertEqual(self.search('абр'), ['абрикос'])
+
+    def test_response_fields(self):
+        ingredient = Ingredient.objects.get(name='мука')
+        response = APIClient().get('/api/ingredients/', {'name': 'мук'})
+        self.assertEqual(response.data, [{
+            'id': ingredient.pk,
+            'name': 'мука',
+            'measurement_unit': 'г',
+        }])
+
+    def test_rebuild_is_picked_up(self):
+        index = get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='мёд', measurement_unit='г')
+        self.assertIsNot(get_index(), index)
+        self.assertEqual(self.search('мё'), ['мёд'])
+
+    def test_benchmark_database_mode_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_ingredient_search', size=10, queries=1,
+                database=True
+            )
+        self.assertEqual(Ingredient.objects.count(), 7)
@@ -0,0 +1,72 @@
+import io
+import json
+import os
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Follow
+
+
+class LoadHarnessTests(TempMediaMixin, TestCase):
+    """Синтетические данные и нагрузочный тест API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        )
+        Tag.objects.create(name='завтрак', color='#E26C2D', slug='breakfast')
+        Tag.objects.create(name='обед', color='#49B64E', slug='lunch')
+        call_command(
+            'generate_data', users=40, recipes=200, follows=5, favorites=5,
+            carts=2, seed=1, stdout=io.StringIO()
+        )
+
+    def test_generated_data(self):
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(ShoppingCart.objects.exists())
+        self.assertGreater(
+            len(set(Recipe.objects.values_list('pub_date', flat=True))), 1
+        )
+        call_command('rebuild_shopping_lists', check=True,
+                     stdout=io.StringIO())
+
+    def test_popularity_is_skewed(self):
+        authors = list(Recipe.objects.values_list('author', flat=True))
+        top = max(set(authors), key=authors.count)
+        self.assertGreater(authors.count(top), len(authors) / 10)
+        self.assertGreater(
+            Favorite.objects.filter(
+                recipe=Recipe.objects.order_by('id').first()
+            ).count(),
+            1
+        )
+
+    def test_benchmark_report(self):
+        output = os.path.join(self.temp_dir, 'report.json')
+        favorites = Favorite.objects.count()
+        for interface, concurrency in (('wsgi', 1), ('asgi', 4)):
+            with self.subTest(interface=interface):
+                call_command(
+                    'benchmark_api', processes=0, requests=60, warmup=2,
+                    users=5, interface=interface, concurrency=concurrency,
+                    output=output, stdout=io.StringIO()
+                )
+                with open(output, encoding='UTF-8') as report_file:
+                    report = json.load(report_file)
+                self.assertEqual(report['meta']['interface'], interface)
+                self.assertEqual(report['total']['errors'], 0)
+                self.assertIn('recipes:list:GET', report['endpoints'])
+                self.assertGreater(
+                    report['endpoints']['tags:list:GET']['queries_max'], 0
+                )
+                for summary in report['endpoints'].values():
+                    self.assertLessEqual(
+                        summary['p50_ms'], summary['p95_ms']
+                    )
+                self.assertEqual(Favorite.objects.count(), favorites)
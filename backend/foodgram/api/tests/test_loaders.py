@@ -0,0 +1,78 @@
+import io
+import json
+import os
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.ingredient_index import get_index
+from recipes.models import Ingredient, Tag
+
+
+class ReferenceLoaderTests(TempMediaMixin, TestCase):
+    """Загрузка справочников командами load_data и load_tags."""
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w', encoding='UTF-8') as data_file:
+            data_file.write(content)
+        return path
+
+    def call(self, command, path):
+        out = io.StringIO()
+        call_command(command, path=path, stdout=out)
+        return out.getvalue()
+
+    def test_load_is_idempotent(self):
+        path = self.write('ingredients.csv', 'мука,г\nсоль,г\nмука,г\n')
+        self.assertIn(
+            'добавлено: 2, обновлено: 0, без изменений: 1',
+            self.call('load_data', path)
+        )
+        self.assertIn(
+            'добавлено: 0, обновлено: 0, без изменений: 3',
+            self.call('load_data', path)
+        )
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(
+            [record['name'] for record in get_index().search('м', 10)],
+            ['мука']
+        )
+
+    def test_load_json(self):
+        rows = [
+            {'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+            for number in range(50)
+        ]
+        path = self.write('ingredients.json', json.dumps(rows))
+        with mock.patch('recipes.management.loaders.JSON_CHUNK_SIZE', 7):
+            self.assertIn('добавлено: 50,', self.call('load_data', path))
+        self.assertEqual(Ingredient.objects.count(), 50)
+
+    def test_tags_are_updated_by_slug(self):
+        Tag.objects.create(name='завтрак', color='#000000', slug='breakfast')
+        path = self.write(
+            'tags.csv', 'утро,#111111,breakfast\nобед,#222222,lunch\n'
+        )
+        self.assertIn(
+            'добавлено: 1, обновлено: 1, без изменений: 0',
+            self.call('load_tags', path)
+        )
+        self.assertEqual(
+            list(Tag.objects.order_by('slug').values_list('name', 'color')),
+            [('утро', '#111111'), ('обед', '#222222')]
+        )
+
+    def test_errors_are_not_swallowed(self):
+        for name, content in (
+            ('broken.csv', 'мука,г\nсоль\n'),
+            ('broken.json', '[{"name": "мука"}]'),
+            ('unclosed.json', '[{"name": "мука", "measurement_unit": "г"}'),
+        ):
+            with self.subTest(name), self.assertRaises(CommandError):
+                self.call('load_data', self.write(name, content))
+        self.assertFalse(Ingredient.objects.exists())
+        with self.assertRaises(CommandError):
+            self.call('load_data', os.path.join(self.temp_dir, 'missing.csv'))
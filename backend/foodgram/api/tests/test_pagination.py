@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.tests.query_budget import QueryBudgetMixin
+from recipes.models import Recipe, Tag
+from users.models import FoodgramUser
+
+URL = '/api/recipes/'
+
+
+class RecipeCursorPaginationTests(QueryBudgetMixin, TestCase):
+    """Keyset-пагинация ленты рецептов по (pub_date, id)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other = FoodgramUser.objects.bulk_create((
+            FoodgramUser(email='author@foodgram.ru', username='author'),
+            FoodgramUser(email='other@foodgram.ru', username='other'),
+        ))
+        cls.tag = Tag.objects.create(name='обед', color='#000000',
+                                     slug='lunch')
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.author if number % 3 else cls.other,
+                name=f'рецепт {number}',
+                text='описание',
+                image='recipes/images/test.png',
+                cooking_time=10
+            ) for number in range(20)
+        )
+        now = timezone.now()
+        for number, recipe in enumerate(Recipe.objects.order_by('pk')):
+            # Пары рецептов с одинаковой датой проверяют второй ключ (id)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=number // 2)
+            )
+            if number % 2:
+                recipe.tags.add(cls.tag)
+        cls.expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def walk(self, url):
+        client = APIClient()
+        pages = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def ids(self, pages):
+        return [
+            recipe['id'] for page in pages for recipe in page['results']
+        ]
+
+    def test_walk_forward_and_back(self):
+        pages = self.walk(f'{URL}?cursor=&limit=3')
+        self.assertEqual(self.ids(pages), self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        client = APIClient()
+        url, backwards = pages[-1]['previous'], []
+        while url:
+            response = client.get(url)
+            backwards.insert(0, response.data)
+            url = response.data['previous']
+        self.assertEqual(self.ids(backwards), self.expected[:-2])
+
+    def test_filters(self):
+        pages = self.walk(f'{URL}?cursor=&limit=4&tags=lunch'
+                          f'&author={self.author.pk}')
+        self.assertEqual(
+            self.ids(pages),
+            list(Recipe.objects.filter(
+                tags=self.tag, author=self.author
+            ).order_by('-pub_date', '-id').values_list('id', flat=True))
+        )
+
+    def test_page_number_is_default(self):
+        response = APIClient().get(f'{URL}?limit=5&page=2')
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            self.expected[5:10]
+        )
+
+    def test_no_count_query(self):
+        url = self.walk(f'{URL}?cursor=&limit=3')[3]['next']
+        with self.assertQueryBudget(5, exact=True) as queries:
+            APIClient().get(url)
+        self.assertFalse(any('COUNT(' in sql for _, sql in queries.queries))
+
+    def test_search_keeps_rank_order(self):
+        # Порядок по релевантности не совпадает с ключом курсора:
+        # ответ - обычные страницы поиска.
+        client = APIClient()
+        params = {'search': 'рецепт', 'limit': 3}
+        response = client.get(URL, {**params, 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual(
+            response.data['results'], client.get(URL, params).data['results']
+        )
+
+    def test_invalid_cursor(self):
+        response = APIClient().get(f'{URL}?cursor=bad')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,294 @@
+import base64
+import io
+
+from django.test import TestCase
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.query_budget import QueryBudgetMixin
+from api.tests.temp_media import TempMediaMixin
+from recipes.feed import rebuild as build_feeds
+from recipes.ingredient_index import build_index
+from recipes.similar import rebuild as build_similar
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListIngredient,
+    Tag
+)
+from users.models import FoodgramUser, Follow
+
+
+AUTHORS = 12
+RECIPES_PER_AUTHOR = 4
+INGREDIENTS_PER_RECIPE = 8
+PAGE = f'limit={AUTHORS * RECIPES_PER_AUTHOR}'
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class QueryBudgetTests(TempMediaMixin, QueryBudgetMixin, TestCase):
+    """
+    Бюджет SQL-запросов для всех маршрутов api/urls.py и users/urls.py.
+    Данные заведомо больше бюджета: любой N+1 его превысит.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+            for i in range(4)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(60)
+        )
+        cls.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru',
+            username='user',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-123'
+        )
+        cls.authors = FoodgramUser.objects.bulk_create(
+            FoodgramUser(
+                email=f'author{i}@foodgram.ru',
+                username=f'author{i}',
+                first_name='Автор',
+                last_name=str(i)
+            ) for i in range(AUTHORS)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, following=author)
+            for author in cls.authors[:AUTHORS // 2]
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'рецепт {author.pk}-{i}',
+                text='описание',
+                image='recipes/images/test.png',
+                cooking_time=10
+            )
+            for author in cls.authors for i in range(RECIPES_PER_AUTHOR)
+        )
+        recipe_ingredients = []
+        for number, recipe in enumerate(cls.recipes):
+            recipe.tags.set(cls.tags[number % 2:number % 2 + 2])
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[
+                        (number + i) % len(cls.ingredients)
+                    ],
+                    amount=i + 1
+                ) for i in range(INGREDIENTS_PER_RECIPE)
+            )
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::3]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::2]
+        )
+        ShoppingListIngredient.objects.add_recipes(
+            cls.user.pk, [recipe.pk for recipe in cls.recipes[::2]]
+        )
+        cls.own_recipe = Recipe.objects.create(
+            author=cls.user,
+            name='свой рецепт',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        build_index()
+        build_similar()
+        build_feeds()
+
+    def setUp(self):
+        self.guest = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def assertRouteBudget(self, budget, method, url, data=None,
+                          client=None, expected_status=status.HTTP_200_OK):
+        """Маршрут делает ровно budget запросов."""
+        client = client or self.client
+        with self.assertQueryBudget(budget, exact=True):
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                # Потоковый ответ читает базу во время отправки
+                response.streamed_content = response.getvalue()
+        self.assertEqual(
+            response.status_code, expected_status, getattr(
+                response, 'data', None
+            )
+        )
+        return response
+
+    def recipe_payload(self):
+        return {
+            'name': 'новый рецепт',
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': make_image(),
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in self.ingredients[:INGREDIENTS_PER_RECIPE]
+            ],
+        }
+
+    def test_tags(self):
+        self.assertRouteBudget(2, 'get', '/api/tags/')
+        self.assertRouteBudget(2, 'get', f'/api/tags/{self.tags[0].pk}/')
+
+    def test_ingredients(self):
+        self.assertRouteBudget(2, 'get', '/api/ingredients/')
+        self.assertRouteBudget(1, 'get', '/api/ingredients/?name=ингр')
+        self.assertRouteBudget(
+            0, 'get', '/api/ingredients/?name=ингр', client=self.guest
+        )
+        self.assertRouteBudget(
+            2, 'get', f'/api/ingredients/{self.ingredients[0].pk}/'
+        )
+
+    def test_recipe_list(self):
+        self.assertRouteBudget(8, 'get', f'/api/recipes/?{PAGE}')
+        self.assertRouteBudget(
+            7, 'get', f'/api/recipes/?{PAGE}', client=self.guest
+        )
+
+    def test_recipe_list_filters(self):
+        for query, budget in (
+            ('is_favorited=1', 8),
+            ('is_in_shopping_cart=1', 8),
+            (f'author={self.authors[0].pk}', 9),
+            ('tags=tag0&tags=tag1', 9),
+        ):
+            with self.subTest(query=query):
+                self.assertRouteBudget(
+                    budget, 'get', f'/api/recipes/?{PAGE}&{query}'
+                )
+
+    def test_recipe_detail(self):
+        self.assertRouteBudget(
+            7, 'get', f'/api/recipes/{self.recipes[0].pk}/'
+        )
+
+    def test_feed(self):
+        self.assertRouteBudget(9, 'get', f'/api/recipes/feed/?{PAGE}')
+
+    def test_similar_recipes(self):
+        self.assertRouteBudget(
+            7, 'get', f'/api/recipes/{self.recipes[0].pk}/similar/'
+        )
+
+    def test_recipe_create_update_delete(self):
+        response = self.assertRouteBudget(
+            20, 'post', '/api/recipes/', self.recipe_payload(),
+            expected_status=status.HTTP_201_CREATED
+        )
+        url = f'/api/recipes/{response.data["id"]}/'
+        self.assertRouteBudget(
+            18, 'patch', url, self.recipe_payload()
+        )
+        self.assertRouteBudget(
+            21, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_favorite_toggle(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        self.assertRouteBudget(
+            6, 'post', url, expected_status=status.HTTP_201_CREATED
+        )
+        self.assertRouteBudget(
+            5, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_shopping_cart_toggle(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/shopping_cart/'
+        self.assertRouteBudget(
+            7, 'post', url, expected_status=status.HTTP_201_CREATED
+        )
+        self.assertRouteBudget(
+            7, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_batch_toggles(self):
+        data = {'recipes': [recipe.pk for recipe in self.recipes[:20]]}
+        for url, add_budget, remove_budget in (
+            ('/api/recipes/favorite/', 6, 5),
+            ('/api/recipes/shopping_cart/', 7, 7),
+        ):
+            with self.subTest(url=url):
+                self.assertRouteBudget(add_budget, 'post', url, data)
+                self.assertRouteBudget(remove_budget, 'delete', url, data)
+
+    def test_download_shopping_cart(self):
+        for file_format in ('txt', 'csv', 'json'):
+            with self.subTest(file_format=file_format):
+                self.assertRouteBudget(
+                    2, 'get', '/api/recipes/download_shopping_cart/'
+                    f'?format={file_format}'
+                )
+
+    def test_users(self):
+        self.assertRouteBudget(3, 'get', f'/api/users/?{PAGE}')
+        self.assertRouteBudget(2, 'get', f'/api/users/{self.authors[0].pk}/')
+        self.assertRouteBudget(2, 'get', '/api/users/me/')
+
+    def test_subscriptions(self):
+        self.assertRouteBudget(
+            4, 'get', f'/api/users/subscriptions/?{PAGE}&recipes_limit=2'
+        )
+        self.assertRouteBudget(4, 'get', f'/api/users/subscriptions/?{PAGE}')
+
+    def test_subscribe_toggle(self):
+        url = f'/api/users/{self.authors[-1].pk}/subscribe/'
+        self.assertRouteBudget(
+            11, 'post', url, expected_status=status.HTTP_201_CREATED
+        )
+        self.assertRouteBudget(
+            5, 'delete', url, expected_status=status.HTTP_204_NO_CONTENT
+        )
+
+    def test_auth(self):
+        self.assertRouteBudget(
+            5, 'post', '/api/users/', {
+                'email': 'new@foodgram.ru',
+                'username': 'new',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': 'password-123',
+            }, client=self.guest, expected_status=status.HTTP_201_CREATED
+        )
+        self.assertRouteBudget(
+            3, 'post', '/api/auth/token/login/', {
+                'email': 'user@foodgram.ru',
+                'password': 'password-123',
+            }, client=self.guest
+        )
+        self.assertRouteBudget(
+            2, 'post', '/api/users/set_password/', {
+                'current_password': 'password-123',
+                'new_password': 'password-456',
+            }, expected_status=status.HTTP_204_NO_CONTENT
+        )
+        self.assertRouteBudget(
+            2, 'post', '/api/auth/token/logout/',
+            expected_status=status.HTTP_204_NO_CONTENT
+        )
@@ -0,0 +1,241 @@
+import base64
+import io
+import os
+import tracemalloc
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from api.fields import StreamingBase64ImageField
+from api.tests.temp_media import TempMediaMixin
+from foodgram.constants import IMAGE_VARIANTS, MAX_IMAGE_PIXELS
+from recipes.models import Ingredient, RecipeImageJob, StoredImage, Tag
+from recipes.storage import ContentAddressedStorage
+from users.models import FoodgramUser
+
+
+def make_image(size, color='red', mode='RGBA', image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format=image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+class RecipeImageVariantsTests(TempMediaMixin, TestCase):
+    """Варианты картинок рецептов, которые делает process_images."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = FoodgramUser.objects.create(
+            email='cook@example.com', username='cook'
+        )
+        cls.tag = Tag.objects.create(
+            name='обед', color='#49B64E', slug='lunch'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, image):
+        return {
+            'name': 'пирог',
+            'text': 'описание',
+            'cooking_time': 30,
+            'image': image,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 100}],
+        }
+
+    def process(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('process_images', once=True, stdout=io.StringIO())
+
+    def variants(self, recipe_id):
+        return self.client.get(
+            f'/api/recipes/{recipe_id}/'
+        ).data['image_variants']
+
+    def test_variants_are_made_in_background(self):
+        response = self.client.post(
+            '/api/recipes/', self.payload(make_image((2000, 1500))),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['image_variants'], {})
+        self.assertTrue(RecipeImageJob.objects.exists())
+
+        self.process()
+        variants = self.variants(response.data['id'])
+        self.assertEqual(set(variants), set(IMAGE_VARIANTS))
+        self.assertFalse(RecipeImageJob.objects.exists())
+        for kind, (width, height, image_format) in IMAGE_VARIANTS.items():
+            path = os.path.join(
+                self.temp_dir, variants[kind].split('/media/', 1)[1]
+            )
+            with Image.open(path) as image:
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(image.size, (width, width * 3 // 4))
+
+    def test_new_image_replaces_variants(self):
+        recipe_id = self.client.post(
+            '/api/recipes/', self.payload(make_image((800, 600))),
+            format='json'
+        ).data['id']
+        self.process()
+        old = self.variants(recipe_id)
+
+        self.client.patch(
+            f'/api/recipes/{recipe_id}/',
+            self.payload(make_image((800, 600), 'blue')),
+            format='json'
+        )
+        self.assertEqual(self.variants(recipe_id), {})
+        self.process()
+        new = self.variants(recipe_id)
+        self.assertEqual(set(new), set(IMAGE_VARIANTS))
+        for url in old.values():
+            self.assertNotIn(url, new.values())
+            self.assertFalse(os.path.exists(
+                os.path.join(self.temp_dir, url.split('/media/', 1)[1])
+            ))
+
+    def test_broken_image_is_retried_then_skipped(self):
+        recipe_id = self.client.post(
+            '/api/recipes/', self.payload(make_image((10, 10))),
+            format='json'
+        ).data['id']
+        job = RecipeImageJob.objects.get(recipe_id=recipe_id)
+        with open(job.recipe.image.path, 'wb') as image_file:
+            image_file.write(b'not an image')
+        self.process()
+        job.refresh_from_db()
+        self.assertGreater(job.attempts, 0)
+        self.assertIn('UnidentifiedImageError', job.error)
+        self.assertEqual(self.variants(recipe_id), {})
+
+    def test_same_image_is_stored_once(self):
+        image = make_image((64, 48), 'green')
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = (
+                self.client.post(
+                    '/api/recipes/', self.payload(image), format='json'
+                ).data for _ in range(2)
+            )
+        self.assertEqual(first['image'], second['image'])
+        name = first['image'].split('/media/', 1)[1]
+        self.assertEqual(StoredImage.objects.get(name=name).references, 2)
+
+        path = os.path.join(self.temp_dir, name)
+        for recipe, references in ((first, 1), (second, 0)):
+            self.client.delete(f'/api/recipes/{recipe["id"]}/')
+            self.assertEqual(
+                StoredImage.objects.get(name=name).references, references
+            )
+            self.assertTrue(os.path.exists(path))
+        # Файл без ссылок удаляет воркер.
+        self.process()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+
+    def test_upload_keeps_unreferenced_file(self):
+        image = make_image((64, 48), 'purple')
+        recipe = self.client.post(
+            '/api/recipes/', self.payload(image), format='json'
+        ).data
+        name = recipe['image'].split('/media/', 1)[1]
+        self.client.delete(f'/api/recipes/{recipe["id"]}/')
+        # Те же байты загружены до sweep: файл не пишется заново
+        # и не удаляется, запись снова со ссылкой.
+        self.client.post('/api/recipes/', self.payload(image), format='json')
+        self.process()
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, name)))
+
+    def test_unchanged_image_is_not_written(self):
+        image = make_image((64, 48), 'yellow')
+        recipe = self.client.post(
+            '/api/recipes/', self.payload(image), format='json'
+        ).data
+        self.process()
+        with mock.patch.object(
+            ContentAddressedStorage, '_save'
+        ) as save:
+            response = self.client.patch(
+                f'/api/recipes/{recipe["id"]}/', self.payload(image),
+                format='json'
+            )
+        save.assert_not_called()
+        self.assertEqual(response.data['image'], recipe['image'])
+        self.assertFalse(RecipeImageJob.objects.exists())
+        self.assertEqual(
+            set(response.data['image_variants']), set(IMAGE_VARIANTS)
+        )
+
+
+class StreamingBase64ImageFieldTests(SimpleTestCase):
+    """Декодирование картинок base64 кусками во временный файл."""
+
+    def decode(self, data):
+        image_file = StreamingBase64ImageField().to_internal_value(data)
+        self.addCleanup(image_file.close)
+        return image_file
+
+    def assertRejected(self, data, code):
+        with self.assertRaises(serializers.ValidationError) as error:
+            self.decode(data)
+        self.assertEqual(error.exception.detail[0].code, code)
+
+    def test_decodes_to_temporary_file(self):
+        for image_format, extension in (('PNG', 'png'), ('JPEG', 'jpg'),
+                                        ('GIF', 'gif'), ('WEBP', 'webp')):
+            with self.subTest(image_format):
+                image_file = self.decode(make_image(
+                    (30, 20), mode='RGB', image_format=image_format
+                ))
+                self.assertTrue(image_file.name.endswith(f'.{extension}'))
+                self.assertTrue(
+                    os.path.exists(image_file.temporary_file_path())
+                )
+                self.assertEqual(image_file.image.size, (30, 20))
+
+    def test_chunk_borders_and_line_breaks(self):
+        data = make_image((40, 40)).split(',', 1)[1]
+        wrapped = '\n'.join(
+            data[start:start + 76] for start in range(0, len(data), 76)
+        )
+        with mock.patch('api.fields.BASE64_CHUNK_SIZE', 8):
+            self.assertEqual(self.decode(wrapped).image.size, (40, 40))
+
+    def test_rejects_before_decoding_everything(self):
+        side = int(MAX_IMAGE_PIXELS ** 0.5) + 1
+        for size in ((side, side), (20000, 20000)):
+            with self.subTest(size=size):
+                self.assertRejected(
+                    make_image(size, 0, mode='1'), 'too_many_pixels'
+                )
+        self.assertRejected(
+            base64.b64encode(b'<svg></svg>').decode(), 'invalid_type'
+        )
+        self.assertRejected('QQ', 'invalid_base64')
+        self.assertRejected({'image': 'x'}, 'invalid_base64')
+
+    def test_memory_does_not_depend_on_size(self):
+        noise = Image.frombytes('RGB', (1024, 1024), os.urandom(1024 ** 2 * 3))
+        buffer = io.BytesIO()
+        noise.save(buffer, format='PNG')
+        data = base64.b64encode(buffer.getvalue()).decode()
+        tracemalloc.start()
+        try:
+            self.decode(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, len(data) / 4)
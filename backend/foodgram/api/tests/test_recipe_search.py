@@ -0,0 +1,59 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import FoodgramUser
+
+URL = '/api/recipes/'
+
+
+class RecipeSearchTests(TestCase):
+    """Полнотекстовый поиск рецептов: ?search=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = FoodgramUser.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.borsch, cls.salad, cls.soup = (
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text=text,
+                image='recipes/images/test.png',
+                cooking_time=10
+            ) for name, text in (
+                ('Борщ украинский', 'Свекла, капуста и картофель.'),
+                ('Салат из свеклы', 'Отварную свеклу натереть.'),
+                ('Суп дня', 'Подавать вместо борща со сметаной.'),
+            )
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(URL, {'search': query, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(self.search('борщ'), ['Борщ украинский', 'Суп дня'])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('свекл салат'), ['Салат из свеклы'])
+        self.assertEqual(self.search('борщ салат'), [])
+
+    def test_index_follows_changes(self):
+        self.salad.name = 'Винегрет'
+        self.salad.save()
+        Recipe.objects.filter(pk=self.borsch.pk).change_counter(
+            'favorites_count', 1
+        )
+        self.soup.delete()
+        self.assertEqual(self.search('винегрет'), ['Винегрет'])
+        self.assertEqual(self.search('борщ'), ['Борщ украинский'])
+
+    def test_blank_or_symbols_only(self):
+        self.assertEqual(len(self.search(' ')), 3)
+        self.assertEqual(self.search('"*'), [])
@@ -0,0 +1,91 @@
+import base64
+import io
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.models import Ingredient, Tag
+from users.models import FoodgramUser
+
+URL = '/api/recipes/'
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class RecipeWriteTests(TempMediaMixin, TestCase):
+    """Проверка id ингредиентов и тегов при записи рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(20)
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+            for i in range(5)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, ingredient_ids, tag_ids):
+        return {
+            'name': 'рецепт',
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': make_image(),
+            'tags': tag_ids,
+            'ingredients': [
+                {'id': pk, 'amount': 10} for pk in ingredient_ids
+            ],
+        }
+
+    def create(self, ingredients, tags):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(URL, self.payload(
+                [ingredient.pk for ingredient in ingredients],
+                [tag.pk for tag in tags]
+            ), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_ingredients(self):
+        self.assertEqual(
+            self.create(self.ingredients[:2], self.tags[:1]),
+            self.create(self.ingredients, self.tags)
+        )
+
+    def test_all_missing_ids_in_one_error(self):
+        response = self.client.post(URL, self.payload(
+            [self.ingredients[0].pk, 1001, 1000],
+            [self.tags[0].pk, 2000, 2001]
+        ), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['ingredients'],
+            ['Нет ингредиентов с id: 1000, 1001.']
+        )
+        self.assertEqual(
+            response.data['tags'], ['Нет тегов с id: 2000, 2001.']
+        )
+
+    def test_invalid_tag_id(self):
+        response = self.client.post(
+            URL, self.payload([self.ingredients[0].pk], ['tag']),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
@@ -0,0 +1,316 @@
+import csv
+import io
+import json
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListIngredient,
+    Tag
+)
+from users.models import FoodgramUser
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListDownloadTests(TestCase):
+    """Форматы файла со списком покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = FoodgramUser.objects.create_user(
+            email='user@foodgram.ru', username='user', password='pass'
+        )
+        salt, milk = Ingredient.objects.bulk_create((
+            Ingredient(name='соль', measurement_unit='г'),
+            Ingredient(name='молоко', measurement_unit='мл'),
+        ))
+        for amounts in ((5, 200), (10, 300)):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name='рецепт',
+                text='описание',
+                image='recipes/images/test.png',
+                cooking_time=10
+            )
+            RecipeIngredient.objects.bulk_create((
+                RecipeIngredient(
+                    recipe=recipe, ingredient=salt, amount=amounts[0]
+                ),
+                RecipeIngredient(
+                    recipe=recipe, ingredient=milk, amount=amounts[1]
+                ),
+            ))
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, response.getvalue().decode()
+
+    def test_txt_is_default(self):
+        response, content = self.download(URL)
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        self.assertIn(
+            'user_shopping_list_ingredients.txt',
+            response['Content-Disposition']
+        )
+        self.assertTrue(content.endswith(
+            'молоко --> 500 (мл)\nсоль --> 15 (г)\n'
+        ))
+
+    def test_csv_by_query_param(self):
+        response, content = self.download(f'{URL}?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ['name', 'amount', 'measurement_unit'],
+            ['молоко', '500', 'мл'],
+            ['соль', '15', 'г'],
+        ])
+
+    def test_json_by_accept_header(self):
+        response, content = self.download(
+            URL, HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(json.loads(content), [
+            {'name': 'молоко', 'amount': 500, 'measurement_unit': 'мл'},
+            {'name': 'соль', 'amount': 15, 'measurement_unit': 'г'},
+        ])
+
+    def test_empty_cart_is_valid_json(self):
+        ShoppingCart.objects.all().delete()
+        _, content = self.download(f'{URL}?format=json')
+        self.assertEqual(json.loads(content), [])
+
+    def test_guest_gets_401(self):
+        response = APIClient().get(URL)
+        self.assertEqual(response.status_code, 401)
+
+
+class ShoppingListTotalsTests(TestCase):
+    """Поддержка ShoppingListIngredient при изменении корзин и рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = FoodgramUser.objects.bulk_create((
+            FoodgramUser(email='user@foodgram.ru', username='user'),
+            FoodgramUser(email='other@foodgram.ru', username='other'),
+        ))
+        cls.salt, cls.milk, cls.egg = Ingredient.objects.bulk_create((
+            Ingredient(name='соль', measurement_unit='г'),
+            Ingredient(name='молоко', measurement_unit='мл'),
+            Ingredient(name='яйцо', measurement_unit='шт'),
+        ))
+        cls.tag = Tag.objects.create(name='завтрак', color='#000000',
+                                     slug='breakfast')
+
+    def setUp(self):
+        self.recipe = Recipe.objects.create(
+            author=self.other,
+            name='рецепт',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.bulk_create((
+            RecipeIngredient(
+                recipe=self.recipe, ingredient=self.salt, amount=5
+            ),
+            RecipeIngredient(
+                recipe=self.recipe, ingredient=self.milk, amount=200
+            ),
+        ))
+        for user in (self.user, self.other):
+            ShoppingCart.objects.create(user=user, recipe=self.recipe)
+
+    def totals(self, user):
+        return dict(
+            ShoppingListIngredient.objects.filter(
+                user=user
+            ).values_list('ingredient__name', 'amount')
+        )
+
+    def test_cart_add_and_remove(self):
+        self.assertEqual(self.totals(self.user), {'соль': 5, 'молоко': 200})
+        ShoppingCart.objects.get(user=self.user).delete()
+        self.assertEqual(self.totals(self.user), {})
+        self.assertEqual(self.totals(self.other), {'соль': 5, 'молоко': 200})
+
+    def test_cart_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        self.assertEqual(client.delete(url).status_code, 204)
+        self.assertEqual(self.totals(self.user), {})
+        self.assertEqual(client.post(url).status_code, 201)
+        self.assertEqual(self.totals(self.user), {'соль': 5, 'молоко': 200})
+
+    def test_cart_batch_api(self):
+        second = Recipe.objects.create(
+            author=self.other,
+            name='рецепт 2',
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=second, ingredient=self.salt, amount=1
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/recipes/shopping_cart/'
+        response = client.post(url, {
+            'recipes': [self.recipe.pk, second.pk, 1000]
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.recipe.pk, 'status': 'exists'},
+            {'id': second.pk, 'status': 'added'},
+            {'id': 1000, 'status': 'not_found'},
+        ])
+        self.assertEqual(self.totals(self.user), {'соль': 6, 'молоко': 200})
+        response = client.delete(url, {
+            'recipes': [self.recipe.pk, second.pk, 1000]
+        }, format='json')
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['removed', 'removed', 'not_found']
+        )
+        self.assertEqual(self.totals(self.user), {})
+        second.refresh_from_db()
+        self.assertEqual(second.in_carts_count, 0)
+        self.assertEqual(
+            client.post(url, {'recipes': []}, format='json').status_code, 400
+        )
+
+    def test_recipe_update(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        response = client.patch(
+            f'/api/recipes/{self.recipe.pk}/', {
+                'name': 'рецепт',
+                'text': 'описание',
+                'cooking_time': 10,
+                'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': self.milk.pk, 'amount': 250},
+                    {'id': self.egg.pk, 'amount': 2},
+                ],
+            }, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        for user in (self.user, self.other):
+            self.assertEqual(self.totals(user), {'молоко': 250, 'яйцо': 2})
+        self.assertEqual(
+            dict(self.recipe.recipe_ingredient.values_list(
+                'ingredient__name', 'amount'
+            )),
+            {'молоко': 250, 'яйцо': 2}
+        )
+
+    def test_changes_merge_into_existing_rows(self):
+        # Прибавление к существующей строке и новая строка, вычитание
+        # до нуля удаляет строку, вычитание из несуществующей - ничего.
+        ShoppingListIngredient.objects.apply_changes({
+            (self.user.pk, self.milk.pk): 50,
+            (self.user.pk, self.egg.pk): 3,
+            (self.user.pk, self.salt.pk): -5,
+            (self.other.pk, self.egg.pk): -1,
+        })
+        self.assertEqual(self.totals(self.user), {'молоко': 250, 'яйцо': 3})
+        self.assertEqual(self.totals(self.other), {'соль': 5, 'молоко': 200})
+
+    def test_admin_edits(self):
+        admin = FoodgramUser.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass'
+        )
+        self.client.force_login(admin)
+        url = f'/admin/recipes/recipe/{self.recipe.pk}/change/'
+        formset = self.client.get(url).context[
+            'inline_admin_formsets'
+        ][0].formset
+        data = {
+            'author': self.other.pk,
+            'name': 'рецепт',
+            'text': 'описание',
+            'tags': [self.tag.pk],
+            'cooking_time': 10,
+            f'{formset.prefix}-TOTAL_FORMS': 3,
+            f'{formset.prefix}-INITIAL_FORMS': 2,
+            f'{formset.prefix}-MIN_NUM_FORMS': 1,
+            f'{formset.prefix}-MAX_NUM_FORMS': 1000,
+            f'{formset.prefix}-2-ingredient': self.egg.pk,
+            f'{formset.prefix}-2-amount': 2,
+        }
+        for number, form in enumerate(formset.initial_forms):
+            row = form.instance
+            data.update({
+                f'{formset.prefix}-{number}-id': row.pk,
+                f'{formset.prefix}-{number}-recipe': self.recipe.pk,
+                f'{formset.prefix}-{number}-ingredient': row.ingredient_id,
+                f'{formset.prefix}-{number}-amount': row.amount + 1,
+                f'{formset.prefix}-{number}-DELETE': (
+                    'on' if row.ingredient == self.salt else ''
+                ),
+            })
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        for user in (self.user, self.other):
+            self.assertEqual(self.totals(user), {'молоко': 201, 'яйцо': 2})
+
+        milk = self.recipe.recipe_ingredient.get(ingredient=self.milk)
+        self.client.post(
+            f'/admin/recipes/recipeingredient/{milk.pk}/change/',
+            {'recipe': self.recipe.pk, 'ingredient': self.milk.pk,
+             'amount': 100}
+        )
+        self.client.post(
+            '/admin/recipes/recipeingredient/', {
+                'action': 'delete_selected',
+                '_selected_action': [
+                    self.recipe.recipe_ingredient.get(
+                        ingredient=self.egg
+                    ).pk
+                ],
+                'post': 'yes',
+            }
+        )
+        for user in (self.user, self.other):
+            self.assertEqual(self.totals(user), {'молоко': 100})
+        call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+
+    def test_recipe_delete(self):
+        self.recipe.delete()
+        self.assertFalse(ShoppingListIngredient.objects.exists())
+
+    def test_rebuild_command(self):
+        call_command('rebuild_shopping_lists', '--check', stdout=io.StringIO())
+        ShoppingListIngredient.objects.filter(user=self.user).update(amount=1)
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_shopping_lists', '--check', stdout=io.StringIO()
+            )
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        self.assertEqual(self.totals(self.user), {'соль': 5, 'молоко': 200})
+
+    def test_migration_fills_existing_carts(self):
+        ShoppingListIngredient.objects.all().delete()
+        import_module(
+            'recipes.migrations.0015_fill_shopping_lists'
+        ).fill_shopping_lists(apps, None)
+        for user in (self.user, self.other):
+            self.assertEqual(self.totals(user), {'соль': 5, 'молоко': 200})
@@ -0,0 +1,169 @@
+import base64
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.tests.temp_media import TempMediaMixin
+from recipes.jobs import process_jobs
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeJob,
+    SimilarRecipe,
+    Tag
+)
+from users.models import FoodgramUser
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class SimilarRecipesTests(TempMediaMixin, TestCase):
+    """Похожие рецепты: /api/recipes/{id}/similar/ и их пересчет."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = FoodgramUser.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass'
+        )
+        cls.soup, cls.salad = Tag.objects.bulk_create((
+            Tag(name='суп', color='#000001', slug='soup'),
+            Tag(name='салат', color='#000002', slug='salad'),
+        ))
+        cls.beet, cls.cabbage, cls.potato, cls.cucumber = (
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit='г')
+                for name in ('свекла', 'капуста', 'картофель', 'огурец')
+            )
+        )
+        cls.borsch = cls.make_recipe(
+            'борщ', (cls.beet, cls.cabbage, cls.potato), (cls.soup,)
+        )
+        cls.shchi = cls.make_recipe(
+            'щи', (cls.cabbage, cls.potato), (cls.soup,)
+        )
+        cls.vinaigrette = cls.make_recipe(
+            'винегрет', (cls.beet, cls.potato, cls.cucumber), (cls.salad,)
+        )
+        cls.cucumber_salad = cls.make_recipe(
+            'огурцы', (cls.cucumber,), (cls.salad,)
+        )
+
+    @classmethod
+    def make_recipe(cls, name, ingredients, tags):
+        recipe = Recipe.objects.create(
+            author=cls.author,
+            name=name,
+            text='описание',
+            image='recipes/images/test.png',
+            cooking_time=10
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        call_command('build_similar_recipes', stdout=io.StringIO())
+
+    def similar(self, recipe):
+        response = self.client.get(f'/api/recipes/{recipe.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data]
+
+    def test_ranked_by_ingredients_and_tags(self):
+        self.assertEqual(self.similar(self.borsch), ['щи', 'винегрет'])
+        self.assertEqual(self.similar(self.shchi), ['борщ', 'винегрет'])
+        self.assertEqual(
+            self.similar(self.vinaigrette), ['огурцы', 'борщ', 'щи']
+        )
+        self.assertEqual(self.similar(self.cucumber_salad), ['винегрет'])
+
+    def test_unknown_recipe(self):
+        self.assertEqual(
+            self.client.get('/api/recipes/1000/similar/').status_code, 404
+        )
+
+    def assertMatchesRebuild(self, recipe):
+        # Сходство остальных пар посчитано по прежним весам idf,
+        # поэтому с полным пересчетом сравнивается только сам рецепт.
+        incremental = self.similar(recipe)
+        call_command('build_similar_recipes', stdout=io.StringIO())
+        self.assertEqual(self.similar(recipe), incremental)
+
+    @staticmethod
+    def run_jobs():
+        call_command('process_recipe_jobs', once=True, stdout=io.StringIO())
+
+    def create_recipe(self, tags, ingredients):
+        payload = {
+            'name': 'свекольник',
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': make_image(),
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 1}
+                for ingredient in ingredients
+            ],
+        }
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.run_jobs()
+        return Recipe.objects.get(pk=response.data['id']), payload
+
+    def test_create_and_edit_update_neighbours(self):
+        created, payload = self.create_recipe(
+            (self.soup,), (self.beet, self.cabbage, self.potato)
+        )
+        self.assertEqual(self.similar(created), ['борщ', 'щи', 'винегрет'])
+        self.assertEqual(self.similar(self.borsch)[0], 'свекольник')
+        self.assertMatchesRebuild(created)
+
+        payload['tags'] = [self.salad.pk]
+        payload['ingredients'] = [{'id': self.cucumber.pk, 'amount': 1}]
+        response = self.client.patch(
+            f'/api/recipes/{created.pk}/', payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.run_jobs()
+        self.assertEqual(self.similar(created), ['огурцы', 'винегрет'])
+        self.assertNotIn('свекольник', self.similar(self.borsch))
+        self.assertIn('свекольник', self.similar(self.vinaigrette))
+        self.assertMatchesRebuild(created)
+
+    @mock.patch('recipes.similar.SIMILAR_RECIPES_COUNT', 1)
+    def test_neighbours_are_trimmed(self):
+        call_command('build_similar_recipes', stdout=io.StringIO())
+        self.assertEqual(self.similar(self.borsch), ['щи'])
+        created, _ = self.create_recipe(
+            (self.soup,), (self.beet, self.cabbage, self.potato)
+        )
+        self.assertEqual(self.similar(created), ['борщ'])
+        self.assertEqual(self.similar(self.borsch), ['свекольник'])
+        self.assertEqual(SimilarRecipe.objects.count(), Recipe.objects.count())
+
+    def test_update_error_is_recorded(self):
+        with mock.patch(
+            'recipes.similar.update_recipe', side_effect=ValueError('сбой')
+        ):
+            created, _ = self.create_recipe((self.soup,), (self.beet,))
+        job = RecipeJob.objects.get(recipe=created, kind=RecipeJob.SIMILAR)
+        self.assertEqual(job.error, 'ValueError: сбой')
+        self.assertEqual(self.similar(created), [])
+        job.attempts = 0
+        job.save()
+        self.assertEqual(process_jobs(10), (1, 0))
+        self.assertEqual(self.similar(created), ['борщ', 'винегрет'])
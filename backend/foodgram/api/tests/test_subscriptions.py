@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import FoodgramUser, Follow
+
+URL = '/api/users/subscriptions/'
+
+
+class SubscriptionsTests(TestCase):
+    """Список подписок с последними рецептами авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = FoodgramUser.objects.bulk_create((
+            FoodgramUser(email='user@foodgram.ru', username='user'),
+            FoodgramUser(email='author@foodgram.ru', username='author'),
+        ))
+        Follow.objects.create(user=cls.user, following=cls.author)
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.author,
+                name=f'рецепт {number}',
+                text='описание',
+                image='recipes/images/test.png',
+                cooking_time=10
+            ) for number in range(4)
+        )
+        # Одна дата у всех рецептов: порядок задает второй ключ (id).
+        Recipe.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_ids(self, **params):
+        response = self.client.get(URL, {'limit': 6, **params})
+        self.assertEqual(response.status_code, 200)
+        [author] = response.data['results']
+        return [recipe['id'] for recipe in author['recipes']]
+
+    def test_recipes_limit_with_equal_dates(self):
+        latest = list(Recipe.objects.values_list('id', flat=True))
+        self.assertEqual(latest, sorted(latest, reverse=True))
+        self.assertEqual(self.recipe_ids(), latest)
+        self.assertEqual(self.recipe_ids(recipes_limit=2), latest[:2])
+
+    def test_without_limit(self):
+        # Без ?limit= - весь список без пагинации, как у /api/users/,
+        # а не ответ 500 (пагинатор не создает страницу).
+        authors = FoodgramUser.objects.bulk_create(
+            FoodgramUser(email=f'{number}@foodgram.ru', username=f'a{number}')
+            for number in range(7)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=self.user, following=author) for author in authors
+        )
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 8)
+        response = self.client.get(URL, {'limit': 3})
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(len(response.data['results']), 3)
@@ -1,30 +1,34 @@
 from djoser.views import UserViewSet
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 from api.filters import IngredientsFilter, RecipeFilter
-from api.paginators import CustomPaginationLimit
+from api.paginators import CustomPaginationLimit, RecipePagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import SHOPPING_LIST_RENDERERS, shopping_list_response
 from api.serializers import (
     CreateRecipeSerializer,
-    FavoriteSerializer,
     FoodgramUserSerializer,
     FollowModelSerializer,
     FollowSerializer,
     GetRecipeDetailSerializer,
     IngredientSerializer,
-    ShoppingCartSerializer,
+    RecipeIdsSerializer,
+    RecipeMinifiedSerializer,
     TagSerializer
 )
+from recipes.feed import feed_recipe_ids
+from recipes.ingredient_search import find_ingredients
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
+    ShoppingListIngredient,
     Tag,
 )
 from users.models import FoodgramUser, Follow
@@ -39,13 +43,26 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет для модели Ингредиент"""
+    """
+    Вьюсет для модели Ингредиент.
+    Поиск по началу названия (?name=) обслуживается индексом в памяти
+    без обращения к базе. ?search= - ранжированный поиск с опечатками
+    и по части названия. limit ограничивает количество результатов.
+    """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filterset_class = IngredientsFilter
 
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if not (params.get('name') or params.get('search')):
+            return super().list(request, *args, **kwargs)
+        return Response(find_ingredients(
+            params.get('name'), params.get('search'), params.get('limit')
+        ))
+
 
 class RecipeViewset(viewsets.ModelViewSet):
     """
@@ -57,17 +74,22 @@ class RecipeViewset(viewsets.ModelViewSet):
 
     permission_classes = [IsAuthorOrReadOnly]
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    lookup_value_regex = r'\d+'
 
     def get_queryset(self):
         """Самый длинный запрос в жизни."""
         user_id = self.request.user.pk
         queryset = Recipe.objects.annotate_recipe(
             user_id
-        ).select_related(
-            'author'
         ).prefetch_related(
-            'ingredients',
-            'tags'
+            Prefetch(
+                'author',
+                queryset=FoodgramUser.objects.annotate_subscribed(user_id)
+            ),
+            'recipe_ingredient__ingredient',
+            'tags',
+            'image_variants'
         )
 
         return queryset
@@ -78,22 +100,34 @@ class RecipeViewset(viewsets.ModelViewSet):
         return GetRecipeDetailSerializer
 
     @staticmethod
-    def favorite_or_cart_save(request, pk, serializer_choice):
-        user = request.user
-        data = {'user': user.id, 'recipe': pk}
-        serializer = serializer_choice(
-            data=data,
-            context={'request': request}
+    def favorite_or_cart_save(request, pk, model, message):
+        """
+        Одна вставка INSERT ... ON CONFLICT DO NOTHING, в ответ - краткая
+        информация о рецепте.
+        """
+        recipe = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time'
+        ).filter(pk=pk).first()
+        if recipe is None:
+            # Как раньше при проверке сериализатором: 400, а не 404.
+            return Response(
+                {'errors': 'Рецепт не найден.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not model.objects.add(request.user.pk, [recipe.pk]):
+            return Response(
+                {'errors': message}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            RecipeMinifiedSerializer(
+                recipe, context={'request': request}
+            ).data,
+            status=status.HTTP_201_CREATED
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
     def favorite_or_cart_delete(request, pk, model):
-        recipe_user = model.objects.filter(user=request.user, recipe=pk)
-        if recipe_user.exists():
-            recipe_user.delete()
+        if model.objects.remove(request.user.pk, [int(pk)]):
             return Response(
                 'Связь рецепт-пользователь удалена.',
                 status=status.HTTP_204_NO_CONTENT
@@ -103,13 +137,47 @@ class RecipeViewset(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @staticmethod
+    def favorite_or_cart_batch(request, model):
+        """
+        Пакетное добавление (POST) или удаление (DELETE) рецептов
+        {"recipes": [id, ...]} одной вставкой или одним DELETE.
+        Для каждого id возвращается итог: added, exists, removed
+        или not_found.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        if request.method == 'DELETE':
+            removed = set(model.objects.remove(request.user.pk, recipe_ids))
+            statuses = {
+                pk: 'removed' if pk in removed else 'not_found'
+                for pk in recipe_ids
+            }
+        else:
+            added = set(model.objects.add(request.user.pk, recipe_ids))
+            skipped = set(recipe_ids) - added
+            existing = set(Recipe.objects.filter(
+                pk__in=skipped
+            ).values_list('pk', flat=True)) if skipped else set()
+            statuses = {
+                pk: ('added' if pk in added
+                     else 'exists' if pk in existing else 'not_found')
+                for pk in recipe_ids
+            }
+        return Response({'results': [
+            {'id': pk, 'status': result} for pk, result in statuses.items()
+        ]})
+
     @action(
         methods=['POST'],
         detail=True,
         permission_classes=[permissions.IsAuthenticated]
     )
     def favorite(self, request, pk):
-        return self.favorite_or_cart_save(request, pk, FavoriteSerializer)
+        return self.favorite_or_cart_save(
+            request, pk, Favorite, 'Рецепт уже в избранном.'
+        )
 
     @favorite.mapping.delete
     def unfavorite(self, request, pk):
@@ -123,46 +191,79 @@ class RecipeViewset(viewsets.ModelViewSet):
             detail=True,
             permission_classes=[permissions.IsAuthenticated])
     def shopping_cart(self, request, pk):
-        return self.favorite_or_cart_save(request, pk, ShoppingCartSerializer)
+        return self.favorite_or_cart_save(
+            request, pk, ShoppingCart, 'Рецепт уже в корзине.'
+        )
 
     @shopping_cart.mapping.delete
     def delete_from_shopping_cart(self, request, pk):
         return self.favorite_or_cart_delete(request, pk, ShoppingCart)
 
+    @action(methods=['POST', 'DELETE'],
+            detail=False,
+            url_path='shopping_cart',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        return self.favorite_or_cart_batch(request, ShoppingCart)
+
+    @action(methods=['POST', 'DELETE'],
+            detail=False,
+            url_path='favorite',
+            permission_classes=[permissions.IsAuthenticated])
+    def favorite_batch(self, request):
+        return self.favorite_or_cart_batch(request, Favorite)
+
     @action(methods=['GET'],
+            detail=False,
             permission_classes=[permissions.IsAuthenticated],
-            detail=False)
-    def download_shopping_cart(self, request):
-        """Подготовка queryset и вызов функции на скачивание."""
-        user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcart__user=user
-        ).values(
-            name=F('ingredient__name'),
-            measurement_unit=F('ingredient__measurement_unit')
-        ).annotate(amount=Sum('amount')).order_by('name')
-
-        return self.making_file_with_ingredients(user, ingredients)
+            pagination_class=CustomPaginationLimit)
+    def feed(self, request):
+        """
+        Лента рецептов авторов из подписок, от новых к старым
+        (recipes.feed): страница id берется из ленты, затем рецепты
+        страницы загружаются одним запросом.
+        """
+        recipe_ids = feed_recipe_ids(request.user.pk)
+        page = self.paginate_queryset(recipe_ids)
+        # Без ?limit= - вся лента, как у остальных списков API.
+        ids = list(recipe_ids) if page is None else page
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
-    @staticmethod
-    def making_file_with_ingredients(user, ingredients):
-        """Создаем и скачиваем файл с ингредиентами."""
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredients_list.append(
-                f'{ingredient["name"]} --> '
-                f'{ingredient["amount"]} '
-                f'({ingredient["measurement_unit"]})'
-            )
+    @action(methods=['GET'], detail=True, pagination_class=None)
+    def similar(self, request, pk):
+        """
+        Похожие рецепты из готовой таблицы соседей (recipes.similar),
+        от самого похожего.
+        """
+        recipes = self.get_queryset().filter(
+            similar_for__recipe=pk
+        ).order_by('-similar_for__score', 'id')
+        data = self.get_serializer(recipes, many=True).data
+        if not data:
+            get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        return Response(data)
 
-        final_to_buy = ('Ваш список ингредиентов для '
-                        'создания всех рецептов из корзины.\n\n')
-        final_to_buy += '\n'.join(ingredients_list)
-        return FileResponse(
-            final_to_buy,
-            as_attachment=True,
-            filename=f'{user.username}_shopping_list_ingredients.txt',
-            content_type='text/plain'
+    @action(methods=['GET'],
+            permission_classes=[permissions.IsAuthenticated],
+            detail=False,
+            renderer_classes=SHOPPING_LIST_RENDERERS)
+    def download_shopping_cart(self, request):
+        """
+        Подготовка queryset и вызов функции на скачивание.
+        Формат файла (txt, csv, json) выбирается параметром format
+        или заголовком Accept.
+        """
+        renderer = request.accepted_renderer
+        # Строки читаются из курсора по мере отправки ответа.
+        ingredients = ShoppingListIngredient.objects.file_rows(request.user)
+        return shopping_list_response(
+            request.user, renderer.stream(ingredients.iterator()), renderer
         )
 
 
@@ -178,11 +279,46 @@ class FoodgramUsersViewSet(UserViewSet):
     lookup_field = 'id'
     pagination_class = CustomPaginationLimit
 
+    def get_queryset(self):
+        return super().get_queryset().annotate_subscribed(
+            self.request.user.pk
+        )
+
     def get_permissions(self):
         if self.action == 'me':
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
 
+    def get_following_queryset(self):
+        """
+        Авторы для FollowSerializer.
+        is_subscribed аннотируется, recipes_count хранится в строке
+        пользователя (recipes.counters), а рецепты всех авторов
+        страницы подгружаются одним запросом, ограниченным recipes_limit
+        через ROW_NUMBER() OVER (PARTITION BY author_id
+        ORDER BY pub_date DESC, id DESC).
+        """
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author'
+        )
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.alias(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    # Как Recipe.Meta.ordering: id различает рецепты
+                    # с одинаковой датой.
+                    order_by=(F('pub_date').desc(), F('id').desc())
+                )
+            ).filter(row_number__lte=int(recipes_limit))
+
+        return FoodgramUser.objects.annotate_subscribed(
+            self.request.user.pk
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by(*FoodgramUser._meta.ordering)
+
     @action(
         detail=True,
         methods=['POST'],
@@ -200,20 +336,23 @@ class FoodgramUsersViewSet(UserViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        author = self.get_following_queryset().get(pk=following)
+        return Response(
+            FollowSerializer(author, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, **kwargs):
-        follow = Follow.objects.filter(
+        deleted, _ = Follow.objects.filter(
             user=request.user,
             following=self.kwargs.get('id')
-        )
-        if not follow.exists():
+        ).delete()
+        if not deleted:
             return Response(
                 'Нельзя отписаться, так как вы не подписаны',
                 status=status.HTTP_400_BAD_REQUEST
             )
-        follow.delete()
         return Response(
             'Успешно отписались',
             status=status.HTTP_204_NO_CONTENT
@@ -228,11 +367,16 @@ class FoodgramUsersViewSet(UserViewSet):
         Uses FollowSerializer. Can take arguments: limit, recipes_limit
         """
         user = request.user
-        subscriptions = FoodgramUser.objects.filter(following__user=user)
+        subscriptions = self.get_following_queryset().filter(
+            following__user=user
+        )
         page = self.paginate_queryset(subscriptions)
         serializer = FollowSerializer(
-            page,
+            subscriptions if page is None else page,
             many=True,
             context={'request': request}
         )
+        if page is None:
+            # Без ?limit= - весь список, как у остальных списков API.
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
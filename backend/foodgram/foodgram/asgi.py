@@ -2,6 +2,9 @@
 ASGI config for foodgram project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Запросы под ASGI разрешаются по foodgram.asgi_urls: часть маршрутов
+чтения там асинхронные. Запуск: gunicorn -k uvicorn.workers.UvicornWorker
+foodgram.asgi (см. README).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -10,7 +13,22 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'foodgram.asgi_urls'
+
+
+class FoodgramASGIHandler(ASGIHandler):
+    """ASGIHandler, который разрешает запросы по ASGI_URLCONF."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+get_asgi_application()
+application = FoodgramASGIHandler()
@@ -0,0 +1,18 @@
+"""
+Маршруты под ASGI: горячие маршруты чтения обслуживают async-вьюхи
+(api.async_views), остальные - те же вьюсеты, что и под WSGI.
+"""
+from django.urls import path
+
+from api import async_views
+from foodgram.urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/tags/', async_views.tag_list),
+    path('api/ingredients/', async_views.ingredient_list),
+    path(
+        'api/recipes/download_shopping_cart/',
+        async_views.download_shopping_cart
+    ),
+    *wsgi_urlpatterns,
+]
@@ -8,3 +8,44 @@ MAX_STR_LENGTH = 15
 MIN_VALUE = 1
 MAX_COOKING_VALUE = 600
 MAX_AMOUNT_VALUE = 10000
+
+INGREDIENTS_SEARCH_LIMIT = 20
+CURSOR_PAGE_SIZE = 6
+# Сколько рецептов можно добавить в корзину или избранное одним запросом.
+MAX_BATCH_RECIPES = 100
+
+# Варианты картинок рецептов: вид -> (ширина, высота, формат).
+IMAGE_VARIANTS = {
+    'thumbnail': (480, 360, 'JPEG'),
+    'thumbnail_webp': (480, 360, 'WEBP'),
+    'detail': (1200, 900, 'JPEG'),
+    'detail_webp': (1200, 900, 'WEBP'),
+}
+MAX_VARIANT_KIND_LENGTH = 20
+IMAGE_QUALITY = 82
+IMAGE_JOB_MAX_ATTEMPTS = 3
+# Остальные фоновые задачи по рецептам, см. recipes.jobs.
+RECIPE_JOB_MAX_ATTEMPTS = 3
+# Через сколько секунд задачу упавшего воркера берет другой.
+JOB_LOCK_TIMEOUT = 10 * 60
+
+# Загрузка картинок рецептов в base64, см. api.fields.
+MAX_IMAGE_UPLOAD_SIZE = 20 * 1024 * 1024  # client_max_body_size в nginx
+MAX_IMAGE_PIXELS = 40_000_000
+BASE64_CHUNK_SIZE = 64 * 1024  # кратно 4
+
+# Похожие рецепты, см. recipes.similar.
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_TAG_WEIGHT = 0.2
+# Ингредиенты из большей доли рецептов (соль, вода) не учитываются.
+SIMILAR_COMMON_SHARE = 0.05
+SIMILAR_COMMON_MIN_RECIPES = 100
+# Сколько рецептов с общими ингредиентами сравнивать при изменении одного.
+SIMILAR_CANDIDATES = 2000
+
+# Лента подписок, см. recipes.feed.
+FEED_LENGTH = 500
+# Рецепты авторов с большим числом подписчиков не копируются в ленты,
+# а читаются при показе ленты.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_FANOUT_BATCH_SIZE = 1000
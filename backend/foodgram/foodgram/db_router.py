@@ -0,0 +1,195 @@
+"""
+Чтение с реплик базы данных.
+
+ReplicaMiddleware выбирает реплику из settings.REPLICA_DATABASES для
+запросов безопасными методами (GET, HEAD, OPTIONS), ReplicaRouter
+направляет туда чтение, все записи и остальные запросы идут
+в основную базу. После записи запросы того же пользователя
+REPLICA_STICKY_SECONDS секунд читают из основной базы: изменения
+успевают дойти до реплик, и пользователь видит свои же записи.
+Метка пользователя хранится в кэше STICKY_CACHE, общем для воркеров,
+и проверяется при аутентификации по токену (ReplicaTokenAuthentication).
+Клиенты с сессией (админка) получают вместо нее cookie.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+STICKY_COOKIE = 'db_primary'
+# Алиас кэша settings.CACHES с метками пользователей после записи.
+STICKY_CACHE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Алиас реплики для текущего запроса, None - основная база.
+read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+    """Чтение - с реплики запроса, если она выбрана, запись - в основную."""
+
+    def db_for_read(self, model, **hints):
+        # Метки STICKY_CACHE (DatabaseCache) нужны сразу после записи.
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему репликацией из основной базы.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Выбор базы для чтения на время запроса, под WSGI и ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_alias.set(self.choose_replica(request))
+        try:
+            response = self.get_response(request)
+            # Аутентификация могла вернуть чтение в основную базу.
+            alias = read_alias.get()
+        finally:
+            read_alias.reset(token)
+        return self.stick_to_primary(request, routed(response, alias))
+
+    async def __acall__(self, request):
+        token = read_alias.set(self.choose_replica(request))
+        try:
+            response = await self.get_response(request)
+            alias = read_alias.get()
+        finally:
+            read_alias.reset(token)
+        return self.stick_to_primary(request, routed(response, alias))
+
+    @staticmethod
+    def choose_replica(request):
+        replicas = settings.REPLICA_DATABASES
+        if (replicas and request.method in SAFE_METHODS
+                and STICKY_COOKIE not in request.COOKIES):
+            return random.choice(replicas)
+        return None
+
+    @staticmethod
+    def stick_to_primary(request, response):
+        if settings.REPLICA_DATABASES and request.method not in SAFE_METHODS:
+            # request.user ставят AuthenticationMiddleware и DRF.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                stick(user.pk)
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+class ReplicaTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с чтением своих записей: после записи и входа
+    запросы пользователя читают из основной базы. Токен, который еще
+    не дошел до реплики, ищется в основной базе.
+    """
+
+    def authenticate_credentials(self, key):
+        try:
+            user, token = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            if read_alias.get() is None:
+                raise
+            read_alias.set(None)
+            return super().authenticate_credentials(key)
+        if read_alias.get() is not None and is_sticky(user.pk):
+            read_alias.set(None)
+        return user, token
+
+
+def sticky_key(user_id):
+    return f'user:{user_id}'
+
+
+def stick(user_id):
+    """REPLICA_STICKY_SECONDS секунд пользователь читает из основной базы."""
+    caches[STICKY_CACHE].set(
+        sticky_key(user_id), 1, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def is_sticky(user_id):
+    return caches[STICKY_CACHE].get(sticky_key(user_id)) is not None
+
+
+@receiver(user_logged_in)
+def user_logged_in_to_primary(sender, user, **kwargs):
+    # Новый токен входа еще может не дойти до реплик.
+    if settings.REPLICA_DATABASES:
+        stick(user.pk)
+
+
+def routed(response, alias):
+    """
+    Потоковый ответ читает базу уже после выхода из ReplicaMiddleware:
+    каждая часть итератора получается с выбранной для запроса базой.
+    """
+    if not response.streaming:
+        return response
+    if response.is_async:
+        response.streaming_content = aiter_routed(
+            response.streaming_content, alias
+        )
+    else:
+        response.streaming_content = iter_routed(
+            response.streaming_content, alias
+        )
+    return response
+
+
+def iter_routed(content, alias):
+    content = iter(content)
+    while True:
+        token = read_alias.set(alias)
+        try:
+            part = next(content)
+        except StopIteration:
+            return
+        finally:
+            read_alias.reset(token)
+        yield part
+
+
+async def aiter_routed(content, alias):
+    content = content.__aiter__()
+    while True:
+        token = read_alias.set(alias)
+        try:
+            part = await content.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            read_alias.reset(token)
+        yield part
@@ -0,0 +1,49 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+
+class CountersQuerySetMixin:
+    """Изменение денормализованных счетчиков (recipes.counters)."""
+
+    def change_counter(self, field, delta):
+        """Атомарно прибавляет delta к счетчику, не опуская его ниже нуля."""
+        value = F(field) + delta
+        if delta < 0:
+            value = Greatest(value, 0)
+        return self.update(**{field: value})
+
+    def subtract_links(self, field, links, link):
+        """
+        Вычитает из счетчика каждой строки число ее связей из links
+        (link - поле-ссылка связи): один UPDATE с подзапросом вместо
+        UPDATE на каждую связь.
+        """
+        counts = links.filter(**{link: OuterRef('pk')}).order_by().values(
+            link
+        ).annotate(total=Count('pk')).values('total')
+        return self.filter(pk__in=links.values(link)).update(
+            **{field: Greatest(F(field) - Subquery(counts), 0)}
+        )
+
+
+class CountersMixin:
+    """
+    Модель с денормализованными счетчиками (recipes.counters).
+    Счетчики меняются только через UPDATE ... SET n = n + 1, поэтому
+    обычное сохранение существующей строки пишет все поля, кроме них:
+    иначе оно затерло бы счетчик значением, прочитанным до изменения.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and kwargs.get('update_fields') is None
+                and not self._state.adding and not kwargs.get('force_insert')):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 from pathlib import Path
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'djoser',
@@ -33,6 +35,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.db_router.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,11 +76,47 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения (foodgram.db_router): хосты PostgreSQL через запятую,
+# а с SQLITE - файлы, например копия db.sqlite3.
+REPLICAS = [
+    replica for replica in os.getenv('DB_REPLICAS', '').split(',') if replica
+]
+
 if os.getenv('SQLITE', ''):
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
+    replica_settings = [
+        {**DATABASES['default'], 'NAME': BASE_DIR / replica}
+        for replica in REPLICAS
+    ]
+else:
+    replica_settings = [
+        {**DATABASES['default'], 'HOST': replica} for replica in REPLICAS
+    ]
+
+REPLICA_DATABASES = []
+for number, replica in enumerate(replica_settings, 1):
+    DATABASES[f'replica{number}'] = {
+        **replica, 'TEST': {'MIRROR': 'default'}
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Метки пользователей после записи (foodgram.db_router): общие
+    # для всех воркеров. Таблица - manage.py createcachetable.
+    'db_primary': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'db_primary_cache',
+    },
+}
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -118,7 +157,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'foodgram.db_router.ReplicaTokenAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -147,3 +186,9 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Файл индекса ингредиентов для автодополнения, общий для всех воркеров
+INGREDIENT_INDEX_PATH = os.getenv(
+    'INGREDIENT_INDEX_PATH',
+    os.path.join(tempfile.gettempdir(), 'foodgram', 'ingredients.idx')
+)
@@ -0,0 +1,19 @@
+import os
+
+
+def on_starting(server):
+    """Строим индекс ингредиентов до запуска воркеров."""
+    import django
+    from django.db import DatabaseError, connections
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from recipes.ingredient_index import build_index
+
+    try:
+        build_index()
+    except DatabaseError as error:
+        # До миграций таблицы нет, индекс построится при первом запросе.
+        server.log.warning('Индекс ингредиентов не построен: %s', error)
+    # Соединение мастера не должно достаться воркерам после fork.
+    connections.close_all()
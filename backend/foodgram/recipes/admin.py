@@ -1,21 +1,69 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from django.db import models
 from django.utils.safestring import mark_safe
 
+from recipes.admin_filters import AuthorFilter, NameFilter
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
+    RecipeImageJob,
     RecipeIngredient,
+    RecipeJob,
     ShoppingCart,
+    ShoppingListIngredient,
     Tag
 )
 
 
+class GroupConcat(models.Aggregate):
+    """Строки группы через запятую: STRING_AGG или GROUP_CONCAT."""
+
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = models.TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG', **extra_context
+        )
+
+
+def recipe_amounts(recipe_ids):
+    """{recipe_id: {ingredient_id: amount}} для рецептов recipe_ids."""
+    amounts = defaultdict(dict)
+    for recipe_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('recipe', 'ingredient', 'amount'):
+        amounts[recipe_id][ingredient_id] = amount
+    return amounts
+
+
+@contextmanager
+def shopping_lists_sync(recipe_ids):
+    """
+    Ингредиенты рецептов меняются в админке мимо сериализатора:
+    списки покупок пересчитываются по разнице до и после, как в API.
+    """
+    recipe_ids = {recipe_id for recipe_id in recipe_ids if recipe_id}
+    old_amounts = recipe_amounts(recipe_ids)
+    yield
+    new_amounts = recipe_amounts(recipe_ids)
+    for recipe_id in recipe_ids:
+        ShoppingListIngredient.objects.update_recipe(
+            recipe_id, old_amounts[recipe_id], new_amounts[recipe_id]
+        )
+
+
 class RecipeIngredientsInLine(admin.TabularInline):
     model = Recipe.ingredients.through
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
@@ -29,29 +77,32 @@ class RecipeAdmin(admin.ModelAdmin):
         'recipe_is_favorite'
     )
 
+    def get_queryset(self, request):
+        # Названия ингредиентов собираются тем же запросом, что и строки.
+        return super().get_queryset(request).annotate(
+            ingredient_names=GroupConcat('recipe_ingredient__ingredient__name')
+        )
+
     @admin.display(description='Ингредиенты')
     def ingredients_list(self, obj):
-        ingredients = obj.recipe_ingredient.all()
-        ingredient_names = [
-            ingr_recipe.ingredient.name for ingr_recipe in ingredients
-        ]
+        return obj.ingredient_names
 
-        return ', '.join(ingredient_names)
+    def save_related(self, request, form, formsets, change):
+        with shopping_lists_sync({form.instance.pk} if change else ()):
+            super().save_related(request, form, formsets, change)
 
-    search_fields = (
-        'email',
-        'first_name',
-        'last_name'
-    )
+    search_fields = ('name',)
+    autocomplete_fields = ('author', 'tags')
     inlines = (RecipeIngredientsInLine,)
     ordering = ('name',)
-    list_filter = ('author', 'name', 'tags')
+    list_filter = (AuthorFilter, NameFilter, 'tags')
     readonly_fields = ('recipe_is_favorite', 'get_image')
 
-    @admin.display(description='Рецепт в избранном')
+    @admin.display(
+        description='Рецепт в избранном', ordering='favorites_count'
+    )
     def recipe_is_favorite(self, obj):
-        # Count new field
-        return obj.favorite.count()
+        return obj.favorites_count
 
     @admin.display(description='Картинка')
     def get_image(self, obj):
@@ -65,27 +116,72 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         'ingredient',
         'amount'
     )
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        # Ингредиент могли перенести в другой рецепт: меняются оба.
+        with shopping_lists_sync({obj.recipe_id, form.initial.get('recipe')}):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with shopping_lists_sync({obj.recipe_id}):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with shopping_lists_sync(set(
+            queryset.values_list('recipe', flat=True)
+        )):
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug')
+    search_fields = ('name', 'slug')
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name', )
+    # Поиск по началу названия идет по триграммному индексу.
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+
+@admin.register(ShoppingListIngredient)
+class ShoppingListIngredientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    autocomplete_fields = ('user', 'ingredient')
+
+
+@admin.register(RecipeImageJob)
+class RecipeImageJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'recipe', 'created', 'attempts', 'locked_at', 'error'
+    )
+    autocomplete_fields = ('recipe',)
+    list_filter = ('attempts',)
+
+
+@admin.register(RecipeJob)
+class RecipeJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'recipe', 'kind', 'created', 'attempts', 'locked_at', 'error'
+    )
+    autocomplete_fields = ('recipe',)
+    list_filter = ('kind', 'attempts')
 
 
 admin.site.unregister(Group)
@@ -0,0 +1,65 @@
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.db.models import Q
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр с полем ввода вместо списка всех значений: страница не растет
+    вместе с числом пользователей и рецептов. Строки ищутся по любому
+    из search_lookups.
+    """
+
+    template = 'admin/input_filter.html'
+    search_lookups = ()
+
+    def lookups(self, request, model_admin):
+        # Без вариантов SimpleListFilter не выводится.
+        return (('', ''),)
+
+    def choices(self, changelist):
+        yield {
+            'query_parts': [
+                (name, value) for name, value in changelist.params.items()
+                if name not in (self.parameter_name, PAGE_VAR)
+            ],
+            'clear_url': changelist.get_query_string(
+                remove=(self.parameter_name,)
+            ),
+        }
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        condition = Q()
+        for lookup in self.search_lookups:
+            condition |= Q(**{lookup: value})
+        return queryset.filter(condition)
+
+
+class AuthorFilter(InputFilter):
+    title = 'автору (начало e-mail или никнейма)'
+    parameter_name = 'author'
+    search_lookups = (
+        'author__email__istartswith',
+        'author__username__istartswith',
+    )
+
+
+class NameFilter(InputFilter):
+    title = 'названию'
+    parameter_name = 'name'
+    search_lookups = ('name__icontains',)
+
+
+class EmailFilter(InputFilter):
+    title = 'e-mail (начало)'
+    parameter_name = 'email'
+    search_lookups = ('email__istartswith',)
+
+
+class UsernameFilter(InputFilter):
+    title = 'никнейму (начало)'
+    parameter_name = 'username'
+    search_lookups = ('username__istartswith',)
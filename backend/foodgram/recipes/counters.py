@@ -0,0 +1,68 @@
+"""
+Денормализованные счетчики популярности.
+
+Чтобы списки и админка не считали COUNT(*) на каждую строку, число
+связей хранится в самих строках рецептов и пользователей. Сигналы
+(recipes.signals) меняют счетчик одним UPDATE ... SET n = n + 1 в той же
+транзакции, что и связь. Удаление связей идет мимо сигналов, чтобы
+каскад оставался одним DELETE: прямое удаление меняет счетчики в
+QuerySet.delete связи, каскад при удалении пользователя - сигнал
+pre_delete одним UPDATE на поле. Пути, которые обходят и то и другое
+(bulk_create, сырой SQL), должны менять счетчики сами или вызвать
+manage.py reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart, User
+from users.models import Follow
+
+# (модель со счетчиком, поле счетчика, модель связей, поле-ссылка связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'following'),
+)
+
+
+def change(model, pk, field, delta):
+    model.objects.filter(pk=pk).change_counter(field, delta)
+
+
+def expected(related, link):
+    """Подзапрос с настоящим числом связей строки."""
+    return Coalesce(
+        Subquery(
+            related.objects.filter(
+                **{link: OuterRef('pk')}
+            ).order_by().values(link).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def drifted(model, field, related, link):
+    """Строки, в которых счетчик разошелся с числом связей."""
+    return model.objects.alias(
+        expected=expected(related, link)
+    ).exclude(**{field: F('expected')})
+
+
+def reconcile(check=False):
+    """
+    Исправляет разошедшиеся счетчики, возвращает
+    {'Модель.поле': число исправленных строк}.
+    С check=True только считает расхождения.
+    """
+    result = {}
+    for model, field, related, link in COUNTERS:
+        rows = drifted(model, field, related, link)
+        label = f'{model.__name__}.{field}'
+        if check:
+            result[label] = rows.count()
+        else:
+            result[label] = rows.update(**{field: F('expected')})
+    return result
@@ -0,0 +1,106 @@
+"""
+Варианты картинок рецептов.
+
+Запрос на создание или изменение рецепта только сохраняет присланную
+картинку и ставит рецепт в очередь (RecipeImageJob). Воркер
+(manage.py process_images) делает из нее уменьшенные пережатые копии
+(foodgram.constants.IMAGE_VARIANTS), которые API отдает в image_variants.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from foodgram.constants import (
+    IMAGE_JOB_MAX_ATTEMPTS,
+    IMAGE_QUALITY,
+    IMAGE_VARIANTS,
+)
+from recipes.jobs import run_jobs
+from recipes.models import RecipeImageJob, RecipeImageVariant
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def enqueue(recipes):
+    """
+    Ставит рецепты в очередь. Уже стоящая задача сбрасывается: если ее
+    сейчас обрабатывает воркер, она выполнится еще раз, уже для новой
+    картинки.
+    """
+    RecipeImageJob.objects.bulk_create(
+        [RecipeImageJob(recipe=recipe) for recipe in recipes],
+        update_conflicts=True,
+        unique_fields=('recipe',),
+        update_fields=('created', 'attempts', 'locked_at', 'error')
+    )
+
+
+def render_variants(image_file):
+    """Варианты картинки: {вид: (байты, ширина, высота)}."""
+    with Image.open(image_file) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        variants = {}
+        for kind, (width, height, image_format) in IMAGE_VARIANTS.items():
+            image = original.copy()
+            image.thumbnail((width, height), Image.LANCZOS)
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            content = io.BytesIO()
+            image.save(
+                content,
+                image_format,
+                quality=IMAGE_QUALITY,
+                optimize=True,
+                progressive=True,
+                method=6,
+            )
+            variants[kind] = (content.getvalue(), *image.size)
+    return variants
+
+
+def process_recipe_image(recipe):
+    """Создает или заменяет варианты картинки рецепта."""
+    source = recipe.image.name
+    existing = {
+        variant.kind: variant for variant in recipe.image_variants.all()
+    }
+    if source and all(
+        kind in existing and existing[kind].source == source
+        for kind in IMAGE_VARIANTS
+    ):
+        return
+    with recipe.image.open('rb') as image_file:
+        rendered = render_variants(image_file)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    for kind, (content, width, height) in rendered.items():
+        variant = existing.get(kind) or RecipeImageVariant(
+            recipe=recipe, kind=kind
+        )
+        old_file = variant.file.name
+        variant.width, variant.height, variant.source = width, height, source
+        variant.file.save(
+            f'{stem}_{kind}.{EXTENSIONS[IMAGE_VARIANTS[kind][2]]}',
+            ContentFile(content),
+            save=False
+        )
+        variant.save()
+        if old_file:
+            storage = variant.file.storage
+            transaction.on_commit(lambda name=old_file: storage.delete(name))
+
+
+def process_jobs(limit):
+    """Обрабатывает до limit задач из очереди, возвращает (успешно, ошибок)."""
+    return run_jobs(
+        RecipeImageJob.objects.filter(attempts__lt=IMAGE_JOB_MAX_ATTEMPTS),
+        lambda job: process_recipe_image(job.recipe),
+        (OSError, ValueError, Image.DecompressionBombError),
+        limit
+    )
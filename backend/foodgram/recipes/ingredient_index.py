@@ -0,0 +1,143 @@
+"""
+Индекс ингредиентов для автодополнения по префиксу названия.
+
+Индекс - отсортированный по названию в нижнем регистре файл, который
+каждый процесс gunicorn открывает через mmap: страницы файла лежат
+в page cache один раз на всех воркеров. Поиск - бинарный поиск
+по таблице смещений, база данных при этом не используется.
+
+Формат файла:
+    MAGIC | count: uint32 | offsets: uint32[count] | records
+    record: key 0x1f name 0x1f measurement_unit 0x1f id \n
+Ключ (key) - название в нижнем регистре в utf-8, порядок байт utf-8
+совпадает с порядком строк, поэтому сравниваем байты.
+"""
+import mmap
+import os
+import tempfile
+from array import array
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+MAGIC = b'FGINGR1\n'
+SEPARATOR = b'\x1f'
+OFFSET_SIZE = array('I').itemsize
+
+
+def build_index(path=None):
+    """Строит файл индекса из таблицы ингредиентов и атомарно заменяет."""
+    write_index(
+        path or settings.INGREDIENT_INDEX_PATH,
+        Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator()
+    )
+
+
+def write_index(path, rows):
+    """Записывает индекс из строк (id, name, measurement_unit)."""
+    records = sorted(
+        (name.lower().encode(), name, measurement_unit, pk)
+        for pk, name, measurement_unit in rows
+    )
+    offsets = array('I')
+    body = bytearray()
+    start = len(MAGIC) + OFFSET_SIZE * (len(records) + 1)
+    for key, name, measurement_unit, pk in records:
+        offsets.append(start + len(body))
+        body += SEPARATOR.join((
+            key, name.encode(), measurement_unit.encode(), str(pk).encode()
+        )) + b'\n'
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, 'wb') as index_file:
+        index_file.write(MAGIC)
+        index_file.write(array('I', (len(records),)).tobytes())
+        index_file.write(offsets.tobytes())
+        index_file.write(body)
+    os.chmod(temp_path, 0o644)
+    # Воркеры с открытым старым файлом дочитают его и переоткроют новый.
+    os.replace(temp_path, path)
+
+
+class IngredientIndex:
+    """Открытый через mmap файл индекса."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as index_file:
+            stat = os.fstat(index_file.fileno())
+            self.version = (stat.st_ino, stat.st_mtime_ns)
+            self._mm = mmap.mmap(
+                index_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} не является индексом ингредиентов')
+        start = len(MAGIC) + OFFSET_SIZE
+        self.count = memoryview(self._mm)[len(MAGIC):start].cast('I')[0]
+        self._offsets = memoryview(self._mm)[
+            start:start + OFFSET_SIZE * self.count
+        ].cast('I')
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, position):
+        start = self._offsets[position]
+        return self._mm[start:self._mm.find(SEPARATOR, start)]
+
+    def _record(self, position):
+        start = self._offsets[position]
+        _, name, measurement_unit, pk = self._mm[
+            start:self._mm.find(b'\n', start)
+        ].split(SEPARATOR)
+        return {
+            'id': int(pk),
+            'name': name.decode(),
+            'measurement_unit': measurement_unit.decode(),
+        }
+
+    def records(self):
+        return (self._record(position) for position in range(self.count))
+
+    def search(self, prefix, limit=None):
+        """Ингредиенты, название которых начинается с prefix (без учета
+        регистра), в алфавитном порядке, не больше limit (если задан)."""
+        prefix = prefix.lower().encode()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        end = self.count if limit is None else min(low + limit, self.count)
+        found = []
+        for position in range(low, end):
+            if not self._key(position).startswith(prefix):
+                break
+            found.append(self._record(position))
+        return found
+
+
+_index = None
+
+
+def get_index():
+    """
+    Индекс текущего процесса. Файл строится при первом обращении,
+    если его еще нет, и переоткрывается, если его заменили.
+    """
+    global _index
+    path = settings.INGREDIENT_INDEX_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        build_index(path)
+        stat = os.stat(path)
+    if _index is None or _index.version != (stat.st_ino, stat.st_mtime_ns):
+        _index = IngredientIndex(path)
+    return _index
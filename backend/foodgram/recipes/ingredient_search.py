@@ -0,0 +1,175 @@
+"""
+Ранжированный поиск ингредиентов с опечатками и по середине названия.
+
+Сначала идут ингредиенты, название которых начинается с запроса,
+затем остальные по убыванию триграммного сходства (как similarity()
+в pg_trgm). На PostgreSQL поиск идет по GIN-индексам pg_trgm,
+на остальных базах - по триграммному индексу в памяти процесса,
+построенному из файла recipes.ingredient_index.
+"""
+import heapq
+import re
+from array import array
+from collections import Counter
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from foodgram.constants import INGREDIENTS_SEARCH_LIMIT
+from recipes.ingredient_index import get_index
+from recipes.models import Ingredient
+
+SIMILARITY_THRESHOLD = 0.3
+# Индекса нет и его не удалось построить из базы, файл испорчен
+# (ValueError из IngredientIndex) или запрос pg_trgm не выполнился.
+INDEX_ERRORS = (OSError, ValueError, DatabaseError)
+WORD = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Триграммы слов текста, как show_trgm() в pg_trgm."""
+    result = set()
+    for word in WORD.findall(text.lower()):
+        result |= word_trigrams(word)
+    return result
+
+
+def word_trigrams(word):
+    word = f'  {word} '
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def similarity(shared, size, other_size):
+    return shared / (size + other_size - shared)
+
+
+class NgramIndex:
+    """
+    Триграммный индекс по словарю слов из названий ингредиентов.
+    Слов в каталоге намного меньше, чем названий, поэтому похожие
+    на слова запроса слова ищутся быстро, а точное сходство считается
+    только для названий, в которых эти слова встречаются.
+    """
+
+    def __init__(self, records):
+        self.records = list(records)
+        words = {}
+        self.name_words = []
+        for record in self.records:
+            self.name_words.append(tuple(
+                words.setdefault(word, len(words))
+                for word in dict.fromkeys(WORD.findall(record['name'].lower()))
+            ))
+        self.word_grams = [frozenset(word_trigrams(word)) for word in words]
+        self.word_names = [array('I') for _ in words]
+        for position, name_words in enumerate(self.name_words):
+            for word in name_words:
+                self.word_names[word].append(position)
+        self.gram_words = {}
+        for word, grams in enumerate(self.word_grams):
+            for gram in grams:
+                self.gram_words.setdefault(gram, array('I')).append(word)
+
+    def similar_words(self, word):
+        grams = word_trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.gram_words.get(gram, ()))
+        return [
+            other for other, count in shared.items()
+            if similarity(
+                count, len(grams), len(self.word_grams[other])
+            ) >= SIMILARITY_THRESHOLD
+        ]
+
+    def search(self, query, limit, exclude=()):
+        """Самые похожие на query ингредиенты, кроме id из exclude."""
+        grams = trigrams(query)
+        candidates = set()
+        for word in set(WORD.findall(query.lower())):
+            for other in self.similar_words(word):
+                candidates.update(self.word_names[other])
+        scored = []
+        for position in candidates:
+            name_grams = frozenset().union(*(
+                self.word_grams[word] for word in self.name_words[position]
+            ))
+            score = similarity(
+                len(grams & name_grams), len(grams), len(name_grams)
+            )
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((score, position))
+        found = []
+        for _, position in heapq.nlargest(limit + len(exclude), scored):
+            record = self.records[position]
+            if record['id'] not in exclude:
+                found.append(record)
+        return found[:limit]
+
+
+_ngram_index = None
+
+
+def get_ngram_index():
+    """Триграммный индекс процесса, пересобирается вместе с файлом."""
+    global _ngram_index
+    index = get_index()
+    if _ngram_index is None or _ngram_index[0] != index.version:
+        _ngram_index = (index.version, NgramIndex(index.records()))
+    return _ngram_index[1]
+
+
+def ranked_search(query, limit, prefix_index, ngram_index):
+    """Совпадения по началу названия, затем похожие по триграммам."""
+    found = prefix_index.search(query, limit)
+    if len(found) < limit:
+        found += ngram_index.search(
+            query,
+            limit - len(found),
+            exclude={record['id'] for record in found}
+        )
+    return found
+
+
+def search_ingredients(query, limit):
+    if connection.vendor != 'postgresql':
+        return ranked_search(query, limit, get_index(), get_ngram_index())
+    return list(trigram_search(query, limit))
+
+
+def find_ingredients(name, search, limit):
+    """
+    Ответ /api/ingredients/ с ?name= или ?search= (значения из строки
+    запроса), общий для IngredientViewSet и async-вьюхи. ?name=
+    ограничивается только переданным limit, как и фильтр по базе
+    до индекса; ?search= - limit или INGREDIENTS_SEARCH_LIMIT.
+    """
+    limit = int(limit) if limit and limit.isdigit() else None
+    if search and limit is None:
+        limit = INGREDIENTS_SEARCH_LIMIT
+    try:
+        if search:
+            return search_ingredients(search, limit)
+        return get_index().search(name, limit)
+    except INDEX_ERRORS:
+        # Индекс недоступен - ищем в базе по началу названия.
+        return list(Ingredient.objects.filter(
+            name__istartswith=search or name
+        ).values('id', 'name', 'measurement_unit')[:limit])
+
+
+def trigram_search(query, limit):
+    """Запрос поиска по индексам pg_trgm (только PostgreSQL)."""
+    return Ingredient.objects.filter(
+        Q(name__trigram_similar=query) | Q(name__istartswith=query)
+    ).annotate(
+        is_prefix=Case(
+            When(name__istartswith=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ),
+        similarity=TrigramSimilarity('name', query),
+    ).order_by(
+        '-is_prefix', '-similarity', 'name'
+    ).values('id', 'name', 'measurement_unit')[:limit]
@@ -0,0 +1,115 @@
+"""
+Фоновые задачи по рецептам.
+
+Запрос, который создает или меняет рецепт, только ставит задачу
+в очередь в своей транзакции: RecipeImageJob для картинок (см.
+recipes.images), RecipeJob для остальных задач. Выполняют их воркеры
+manage.py process_images и manage.py process_recipe_jobs. Время ответа
+не зависит от объема задачи (числа подписчиков автора, размера
+каталога), а ее ошибка не превращает сохраненный рецепт в ответ 500:
+она записывается в задачу, и задача повторяется.
+"""
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from foodgram.constants import JOB_LOCK_TIMEOUT, RECIPE_JOB_MAX_ATTEMPTS
+from recipes import feed, similar
+from recipes.models import RecipeJob
+
+
+def enqueue(recipes, kinds):
+    """
+    Ставит задачи kinds для рецептов. Уже стоящая задача сбрасывается:
+    если ее сейчас выполняет воркер, она выполнится еще раз.
+    """
+    RecipeJob.objects.bulk_create(
+        [RecipeJob(recipe=recipe, kind=kind)
+         for recipe in recipes for kind in kinds],
+        update_conflicts=True,
+        unique_fields=('recipe', 'kind'),
+        update_fields=('created', 'attempts', 'locked_at', 'error')
+    )
+
+
+def claim(pending, job_id, skip_locked):
+    """
+    Берет задачу в короткой транзакции: locked_at и attempts
+    записываются сразу, и блокировка строки снимается до выполнения.
+    Повторная постановка задачи (enqueue) не ждет воркера.
+    """
+    with transaction.atomic():
+        job = pending.select_for_update(
+            skip_locked=skip_locked
+        ).filter(id=job_id).first()
+        if job is not None:
+            job.locked_at = timezone.now()
+            job.attempts += 1
+            job.save(update_fields=('locked_at', 'attempts'))
+    return job
+
+
+def run_jobs(pending, handle, errors, limit):
+    """
+    Выполняет handle(job) для до limit задач из QuerySet pending,
+    возвращает (успешно, ошибок). Выполненная задача удаляется,
+    при ошибке из errors в задаче записывается error. Задачу, взятую
+    упавшим воркером, через JOB_LOCK_TIMEOUT берет другой. На PostgreSQL
+    несколько воркеров пропускают задачи друг друга (SKIP LOCKED).
+    """
+    done = failed = 0
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    pending = pending.filter(
+        Q(locked_at__isnull=True)
+        | Q(locked_at__lt=timezone.now() - timedelta(
+            seconds=JOB_LOCK_TIMEOUT
+        ))
+    )
+    for job_id in list(pending.values_list('id', flat=True)[:limit]):
+        job = claim(pending, job_id, skip_locked)
+        if job is None:
+            continue
+        # Задачу, поставленную заново во время выполнения, enqueue
+        # сбрасывает (locked_at = NULL): она остается в очереди.
+        claimed = type(job).objects.filter(
+            id=job.id, locked_at=job.locked_at
+        )
+        try:
+            with transaction.atomic():
+                handle(job)
+                claimed.delete()
+        except errors as error:
+            claimed.update(
+                locked_at=None, error=f'{type(error).__name__}: {error}'
+            )
+            failed += 1
+        else:
+            done += 1
+    return done, failed
+
+
+def fan_out(recipe):
+    feed.fan_out(recipe.pk, recipe.author_id, recipe.pub_date)
+
+
+def update_similar(recipe):
+    similar.update_recipe(recipe.pk)
+
+
+HANDLERS = {
+    RecipeJob.FEED: fan_out,
+    RecipeJob.SIMILAR: update_similar,
+}
+
+
+def process_jobs(limit):
+    """Выполняет до limit задач RecipeJob, возвращает (успешно, ошибок)."""
+    return run_jobs(
+        RecipeJob.objects.filter(attempts__lt=RECIPE_JOB_MAX_ATTEMPTS),
+        lambda job: HANDLERS[job.kind](job.recipe),
+        # ValueError - от numpy/scipy при пересчете похожих рецептов.
+        (DatabaseError, ValueError),
+        limit
+    )
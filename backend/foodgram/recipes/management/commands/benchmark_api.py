@@ -0,0 +1,549 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import urlencode
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.generate_data import zipf_weights
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import FoodgramUser
+
+PERCENTILES = (50, 95, 99)
+# Размер страницы, который передает фронтенд: без ?limit= списки
+# рецептов и пользователей отдаются целиком.
+PAGE_LIMIT = 6
+INTERFACES = ('wsgi', 'asgi')
+
+# Счетчик запросов к БД текущего HTTP-запроса. ContextVar, а не
+# connection.execute_wrapper: под ASGI несколько запросов одновременно
+# идут через одно соединение, а контекст копируется в sync_to_async.
+query_count = ContextVar('query_count', default=None)
+
+
+def recipes_page(context, rng):
+    return [('GET', '/api/recipes/',
+             {'page': rng.randint(1, 5), 'limit': PAGE_LIMIT},
+             context.maybe_token(rng))]
+
+
+def recipes_by_tag(context, rng):
+    return [('GET', '/api/recipes/',
+             {'tags': rng.choice(context.tags), 'limit': PAGE_LIMIT},
+             context.maybe_token(rng))]
+
+
+def recipes_feed(context, rng):
+    return [('GET', '/api/recipes/', {'cursor': '', 'limit': PAGE_LIMIT},
+             context.maybe_token(rng))]
+
+
+def recipes_favorited(context, rng):
+    return [('GET', '/api/recipes/', {'is_favorited': 1, 'limit': PAGE_LIMIT},
+             context.token(rng))]
+
+
+def recipe_detail(context, rng):
+    return [('GET', f'/api/recipes/{context.recipe(rng)}/', {},
+             context.maybe_token(rng))]
+
+
+def ingredients_prefix(context, rng):
+    return [('GET', '/api/ingredients/',
+             {'name': rng.choice(context.ingredients)[:3]}, None)]
+
+
+def ingredients_search(context, rng):
+    return [('GET', '/api/ingredients/',
+             {'search': rng.choice(context.ingredients)[:5]}, None)]
+
+
+def tags_list(context, rng):
+    return [('GET', '/api/tags/', {}, None)]
+
+
+def users_me(context, rng):
+    return [('GET', '/api/users/me/', {}, context.token(rng))]
+
+
+def subscriptions(context, rng):
+    return [('GET', '/api/users/subscriptions/',
+             {'recipes_limit': 3, 'limit': PAGE_LIMIT},
+             context.token(rng))]
+
+
+def download_shopping_cart(context, rng):
+    return [('GET', '/api/recipes/download_shopping_cart/', {},
+             context.token(rng))]
+
+
+def favorite_toggle(context, rng):
+    """Добавление в избранное и удаление, база возвращается как была."""
+    path = f'/api/recipes/{context.recipe(rng)}/favorite/'
+    token = rng.choice(context.fresh_tokens)
+    return [('POST', path, {}, token), ('DELETE', path, {}, token)]
+
+
+# Название сценария: (вес, запросы сценария, меняет ли данные).
+SCENARIOS = {
+    'recipes:list': (20, recipes_page, False),
+    'recipes:tags': (10, recipes_by_tag, False),
+    'recipes:feed': (10, recipes_feed, False),
+    'recipes:favorited': (5, recipes_favorited, False),
+    'recipes:detail': (20, recipe_detail, False),
+    'ingredients:name': (10, ingredients_prefix, False),
+    'ingredients:search': (5, ingredients_search, False),
+    'tags:list': (5, tags_list, False),
+    'users:me': (3, users_me, False),
+    'users:subscriptions': (5, subscriptions, False),
+    'recipes:download': (3, download_shopping_cart, False),
+    'recipes:favorite': (4, favorite_toggle, True),
+}
+
+
+class Context:
+    """Данные, по которым воркеры строят запросы."""
+
+    def __init__(self, recipes, tokens, fresh_tokens, tags, ingredients,
+                 skew):
+        self.recipes = recipes
+        self.recipe_weights = zipf_weights(len(recipes), skew)
+        self.tokens = tokens
+        self.fresh_tokens = fresh_tokens
+        self.tags = tags
+        self.ingredients = ingredients
+
+    def recipe(self, rng):
+        return rng.choices(self.recipes, cum_weights=self.recipe_weights)[0]
+
+    def token(self, rng):
+        return rng.choice(self.tokens)
+
+    def maybe_token(self, rng):
+        return self.token(rng) if rng.random() < 0.5 else None
+
+
+def count_query(execute, sql, params, many, context):
+    counter = query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@contextmanager
+def counting_queries():
+    """Счетчик на соединениях воркера и соединениях новых потоков."""
+    current = connections.all()
+    for database in current:
+        install_counter(None, database)
+    connection_created.connect(install_counter)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install_counter)
+        for database in current:
+            database.execute_wrappers.remove(count_query)
+
+
+def host():
+    return next((
+        host for host in settings.ALLOWED_HOSTS
+        if host != '*' and not host.startswith('.')
+    ), 'localhost')
+
+
+def call_wsgi(application, method, path, params, token):
+    """Запрос к WSGI-приложению. Возвращает (статус, мс, запросов к БД)."""
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(params),
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host(),
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': '0',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+    status = []
+
+    def start_response(response_status, headers, exc_info=None):
+        status.append(int(response_status.split()[0]))
+
+    counter = [0]
+    reset = query_count.set(counter)
+    start = time.perf_counter()
+    try:
+        response = application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+    finally:
+        query_count.reset(reset)
+    return status[0], (time.perf_counter() - start) * 1000, counter[0]
+
+
+async def call_asgi(application, method, path, params, token):
+    """Запрос к ASGI-приложению. Возвращает (статус, мс, запросов к БД)."""
+    headers = [
+        (b'host', host().encode()),
+        (b'content-type', b'application/json'),
+        (b'content-length', b'0'),
+    ]
+    if token:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params).encode(),
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    status = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Клиент не отключается, пока приложение не ответит.
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    counter = [0]
+    query_count.set(counter)
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return status[0], (time.perf_counter() - start) * 1000, counter[0]
+
+
+def client_calls(context, scenarios, requests, warmup, seed):
+    """
+    Запросы одного клиента по весам сценариев:
+    (замерять ли, сценарий, метод, путь, параметры, токен).
+    """
+    rng = random.Random(seed)
+    names = list(scenarios)
+    weights = [SCENARIOS[name][0] for name in names]
+    for number in range(warmup + requests):
+        name = rng.choices(names, weights)[0]
+        for method, path, params, token in SCENARIOS[name][1](context, rng):
+            yield number >= warmup, name, method, path, params, token
+
+
+def run_wsgi_client(application, calls):
+    """Клиент в своем потоке, как поток воркера gthread."""
+    results = []
+    started = None
+    try:
+        for measured, name, method, path, params, token in calls:
+            if measured and started is None:
+                started = time.time()
+            result = call_wsgi(application, method, path, params, token)
+            if measured:
+                results.append((f'{name}:{method}', *result))
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+    return started, results
+
+
+async def run_asgi_client(application, calls):
+    """Клиент - задача в цикле событий воркера, как у uvicorn."""
+    results = []
+    started = None
+    for measured, name, method, path, params, token in calls:
+        if measured and started is None:
+            started = time.time()
+        result = await call_asgi(application, method, path, params, token)
+        if measured:
+            results.append((f'{name}:{method}', *result))
+    return started, results
+
+
+async def run_asgi_clients(application, clients):
+    return await asyncio.gather(*(
+        run_asgi_client(application, calls) for calls in clients
+    ))
+
+
+def run_worker(arguments):
+    """
+    Воркер: concurrency клиентов делят между собой requests сценариев,
+    каждый сначала делает warmup сценариев прогрева.
+    """
+    (context, scenarios, requests, warmup, seed, interface,
+     concurrency) = arguments
+    django.setup()
+    clients = [
+        client_calls(
+            context, scenarios,
+            requests // concurrency + (client < requests % concurrency),
+            warmup, seed + client
+        )
+        for client in range(concurrency)
+    ]
+    with counting_queries():
+        if interface == 'asgi':
+            from foodgram.asgi import application
+            # Синхронный код из sync_to_async выполняется в этом потоке,
+            # как в едином потоке синхронного кода воркера uvicorn.
+            runs = async_to_sync(run_asgi_clients)(application, clients)
+        elif concurrency == 1:
+            runs = [run_wsgi_client(get_wsgi_application(), clients[0])]
+        else:
+            application = get_wsgi_application()
+            with ThreadPoolExecutor(concurrency) as executor:
+                runs = list(executor.map(
+                    lambda calls: run_wsgi_client(application, calls),
+                    clients
+                ))
+    started = min(
+        (started for started, _ in runs if started is not None),
+        default=time.time()
+    )
+    return started, time.time(), [
+        result for _, results in runs for result in results
+    ]
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share / 100))]
+
+
+def summarize(results, duration):
+    summary = {
+        'requests': len(results),
+        'errors': sum(status >= 400 for _, status, _, _ in results),
+        'throughput_rps': len(results) / duration if duration else 0,
+    }
+    timings = sorted(ms for _, _, ms, _ in results)
+    queries = [count for _, _, _, count in results]
+    for share in PERCENTILES:
+        summary[f'p{share}_ms'] = percentile(timings, share)
+    summary['max_ms'] = timings[-1]
+    summary['queries_mean'] = sum(queries) / len(queries)
+    summary['queries_max'] = max(queries)
+    statuses = defaultdict(int)
+    for _, status, _, _ in results:
+        statuses[str(status)] += 1
+    summary['statuses'] = dict(statuses)
+    return summary
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест API: несколько процессов отправляют запросы
+    реальных маршрутов напрямую в WSGI- или ASGI-приложение (без сети)
+    по взвешенным сценариям. В каждом процессе-воркере concurrency
+    клиентов: потоки для WSGI, задачи asyncio для ASGI, - так
+    сравнивается, сколько одновременных запросов держит воркер.
+    Популярность рецептов - по Ципфу, как в generate_data. По каждому
+    маршруту считаются p50/p95/p99, пропускная способность и число
+    запросов к БД; результат сохраняется в JSON и может сравниваться
+    с прошлым прогоном.
+    """
+
+    help = 'Нагрузочный тест маршрутов API через WSGI/ASGI-приложение.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Число процессов, 0 - выполнить в текущем процессе.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сценариев на процесс.'
+        )
+        parser.add_argument(
+            '--interface', choices=INTERFACES, default='wsgi',
+            help='Приложение: foodgram.wsgi или foodgram.asgi.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Одновременных клиентов в процессе.'
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Сколько пользователей (токенов) используют воркеры.'
+        )
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help='Сценарии через запятую.'
+        )
+        parser.add_argument(
+            '--read-only', action='store_true',
+            help='Не запускать сценарии, меняющие данные.'
+        )
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark_api.json')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'].split(',')
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+            )
+        if options['read_only']:
+            scenarios = [name for name in scenarios if not SCENARIOS[name][2]]
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency должно быть не меньше 1.')
+        rng = random.Random(options['seed'])
+        context = self.make_context(rng, options['users'], options['skew'])
+
+        concurrency = options['concurrency']
+        tasks = [
+            (context, scenarios, options['requests'], options['warmup'],
+             options['seed'] + number * concurrency, options['interface'],
+             concurrency)
+            for number in range(max(options['processes'], 1))
+        ]
+        if options['processes']:
+            # Процессы откроют свои соединения, унаследованные не делим.
+            connections.close_all()
+            with multiprocessing.Pool(options['processes']) as pool:
+                runs = pool.map(run_worker, tasks)
+        else:
+            runs = [run_worker(tasks[0])]
+
+        duration = (max(finished for _, finished, _ in runs)
+                    - min(started for started, _, _ in runs))
+        results = [result for _, _, run in runs for result in run]
+        if not results:
+            raise CommandError('Нет ни одного запроса.')
+        by_endpoint = defaultdict(list)
+        for result in results:
+            by_endpoint[result[0]].append(result)
+        report = {
+            'meta': {
+                'started': datetime.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'interface': options['interface'],
+                'processes': options['processes'],
+                'concurrency': concurrency,
+                'requests_per_process': options['requests'],
+                'seed': options['seed'],
+                'recipes': len(context.recipes),
+            },
+            'total': summarize(results, duration),
+            'endpoints': {
+                name: summarize(endpoint, duration)
+                for name, endpoint in sorted(by_endpoint.items())
+            },
+        }
+        with open(options['output'], 'w', encoding='UTF-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='UTF-8') as compare:
+                previous = json.load(compare)
+        self.print_report(report, previous)
+        self.stdout.write(f'Результат сохранен в {options["output"]}')
+
+    def make_context(self, rng, users, skew):
+        recipes = list(Recipe.objects.values_list('id', flat=True))
+        user_ids = list(FoodgramUser.objects.filter(
+            is_active=True
+        ).values_list('id', flat=True))
+        if not recipes or not user_ids:
+            raise CommandError(
+                'Нет рецептов или пользователей: запустите generate_data.'
+            )
+        sample = rng.sample(user_ids, min(users, len(user_ids)))
+        tokens = [
+            Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in sample
+        ]
+        # Избранное меняют отдельные пользователи без своего избранного:
+        # POST всегда создает запись, DELETE удаляет только ее.
+        fresh = []
+        for number in range(users):
+            user, _ = FoodgramUser.objects.get_or_create(
+                email=f'benchmark{number}@example.com',
+                defaults={'username': f'benchmark{number}'}
+            )
+            user.favorite.all().delete()
+            fresh.append(Token.objects.get_or_create(user=user)[0].key)
+        return Context(
+            recipes=recipes,
+            tokens=tokens,
+            fresh_tokens=fresh,
+            tags=list(Tag.objects.values_list('slug', flat=True)) or [''],
+            ingredients=list(
+                Ingredient.objects.values_list('name', flat=True)[:1000]
+            ) or ['а'],
+            skew=skew,
+        )
+
+    def print_report(self, report, previous):
+        header = (f'{"маршрут":<32}{"запросов":>9}{"ошибок":>7}'
+                  f'{"p50":>8}{"p95":>8}{"p99":>8}{"rps":>8}{"БД":>6}')
+        self.stdout.write(header)
+        rows = [*report['endpoints'].items(), ('итого', report['total'])]
+        for name, summary in rows:
+            line = (
+                f'{name:<32}{summary["requests"]:>9}{summary["errors"]:>7}'
+                f'{summary["p50_ms"]:>8.1f}{summary["p95_ms"]:>8.1f}'
+                f'{summary["p99_ms"]:>8.1f}{summary["throughput_rps"]:>8.1f}'
+                f'{summary["queries_mean"]:>6.1f}'
+            )
+            before = (previous or {}).get('endpoints', {}).get(name)
+            if name == 'итого' and previous:
+                before = previous.get('total')
+            if before and before['p95_ms']:
+                change = summary['p95_ms'] / before['p95_ms'] - 1
+                line += f'  p95 {change:+.0%}'
+            style = self.style.ERROR if summary['errors'] else str
+            self.stdout.write(style(line))
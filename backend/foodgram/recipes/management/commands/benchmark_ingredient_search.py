@@ -0,0 +1,185 @@
+import csv
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram.constants import INGREDIENTS_SEARCH_LIMIT
+from recipes.ingredient_index import IngredientIndex, write_index
+from recipes.ingredient_search import (
+    NgramIndex,
+    ranked_search,
+    trigram_search
+)
+from recipes.models import Ingredient
+
+TARGET_MS = 10
+INSERT_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """
+    Замер поиска ингредиентов на синтетическом каталоге. По умолчанию -
+    индексы в памяти, база не используется. С --database - запросы
+    к PostgreSQL, как в IngredientViewSet: ?search= - trigram_search
+    по индексам pg_trgm, ?name= - фильтр по началу названия.
+    """
+
+    help = 'Замер скорости поиска ингредиентов (?name= и ?search=).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--database',
+            action='store_true',
+            help='Искать в базе (только PostgreSQL). Каталог добавляется '
+                 'к таблице ингредиентов в транзакции, которая затем '
+                 'откатывается.'
+        )
+
+    @staticmethod
+    def make_catalogue(size, rng):
+        """Названия из слов data/ingredients.csv в случайных сочетаниях."""
+        file_path = os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
+        with open(file_path, encoding='UTF-8') as ingredients:
+            rows = list(csv.reader(ingredients))
+        words = sorted({word for name, _ in rows for word in name.split()})
+        units = sorted({unit for _, unit in rows})
+        catalogue = [
+            (pk, name, unit) for pk, (name, unit) in enumerate(rows, 1)
+        ]
+        for pk in range(len(catalogue) + 1, size + 1):
+            catalogue.append((
+                pk,
+                ' '.join(rng.sample(words, rng.randint(1, 3))),
+                rng.choice(units),
+            ))
+        return catalogue
+
+    @staticmethod
+    def make_query(name, rng):
+        """Начало названия, слово из середины или слово с опечаткой."""
+        word = rng.choice(name.split())
+        kind = rng.randrange(3)
+        if kind == 0:
+            return name[:rng.randint(1, min(len(name), 6))]
+        if kind == 1 or len(word) < 4:
+            return word
+        position = rng.randrange(1, len(word) - 1)
+        return word[:position] + rng.choice('аеиоуя') + word[position + 1:]
+
+    def timed(self, search, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'p50': statistics.median(timings),
+            'p95': timings[int(len(timings) * 0.95)],
+            'p99': timings[int(len(timings) * 0.99)],
+            'max': timings[-1],
+        }
+
+    def memory_results(self, catalogue, queries):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ingredients.idx')
+            start = time.perf_counter()
+            write_index(path, catalogue)
+            prefix_index = IngredientIndex(path)
+            built = time.perf_counter()
+            ngram_index = NgramIndex(prefix_index.records())
+            self.stdout.write(
+                f'Ингредиентов: {len(prefix_index)}, '
+                f'файл индекса: {built - start:.2f} с, '
+                f'триграммы: {time.perf_counter() - built:.2f} с'
+            )
+            return {
+                '?name=': self.timed(
+                    lambda query: prefix_index.search(
+                        query, INGREDIENTS_SEARCH_LIMIT
+                    ),
+                    queries
+                ),
+                '?search=': self.timed(
+                    lambda query: ranked_search(
+                        query, INGREDIENTS_SEARCH_LIMIT,
+                        prefix_index, ngram_index
+                    ),
+                    queries
+                ),
+            }
+
+    def database_results(self, catalogue, queries):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                '--database: поиск по pg_trgm есть только в PostgreSQL.'
+            )
+        with transaction.atomic():
+            start = time.perf_counter()
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for _, name, unit in catalogue),
+                batch_size=INSERT_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            with connection.cursor() as cursor:
+                # Статистика планировщика для нового каталога.
+                cursor.execute(
+                    'ANALYZE '
+                    + connection.ops.quote_name(Ingredient._meta.db_table)
+                )
+            self.stdout.write(
+                f'Ингредиентов в базе: {Ingredient.objects.count()}, '
+                f'запись: {time.perf_counter() - start:.2f} с'
+            )
+            results = {
+                '?name=': self.timed(
+                    lambda query: list(Ingredient.objects.filter(
+                        name__istartswith=query
+                    ).values('id', 'name', 'measurement_unit')[
+                        :INGREDIENTS_SEARCH_LIMIT
+                    ]),
+                    queries
+                ),
+                '?search=': self.timed(
+                    lambda query: list(
+                        trigram_search(query, INGREDIENTS_SEARCH_LIMIT)
+                    ),
+                    queries
+                ),
+            }
+            transaction.set_rollback(True)
+        return results
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        catalogue = self.make_catalogue(options['size'], rng)
+        queries = [
+            self.make_query(rng.choice(catalogue)[1], rng)
+            for _ in range(options['queries'])
+        ]
+
+        if options['database']:
+            results = self.database_results(catalogue, queries)
+        else:
+            results = self.memory_results(catalogue, queries)
+
+        for mode, result in results.items():
+            line = f'{mode:<10}' + ' '.join(
+                f'{name}={value:.2f}мс' for name, value in result.items()
+            )
+            if result['p95'] < TARGET_MS:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'{line} (p95 больше {TARGET_MS} мс)'
+                ))
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from recipes.similar import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Полный пересчет похожих рецептов (recipes.similar): матрица
+    рецептов и ингредиентов перемножается пачками строк, для каждого
+    рецепта сохраняются лучшие соседи.
+    """
+
+    help = 'Пересчитывает таблицу похожих рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько рецептов сравнивать со всеми за один шаг.'
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено похожих рецептов: {created}'
+        ))
@@ -0,0 +1,238 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+PASSWORD = 'generated-password'
+IMAGE_PATH = 'recipes/images/generated.png'
+
+
+def zipf_weights(size, skew):
+    """
+    Накопленные веса распределения Ципфа для рангов 1..size:
+    элемент ранга k выбирается пропорционально 1 / k ** skew,
+    при skew=0 распределение равномерное.
+    """
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    """
+    Синтетические данные для нагрузочного тестирования:
+    пользователи, подписки, рецепты с тегами и ингредиентами, избранное
+    и корзины. Популярность авторов (число рецептов и подписчиков)
+    и рецептов (избранное и корзины) распределена по Ципфу.
+    Ингредиенты и теги берутся из базы (load_data, load_tags).
+    """
+
+    help = 'Генерация синтетических пользователей, рецептов и связей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument(
+            '--follows', type=float, default=10,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число избранных рецептов пользователя.'
+        )
+        parser.add_argument(
+            '--carts', type=float, default=5,
+            help='Среднее число рецептов в корзине пользователя.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX'),
+            help='Число ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--author-skew', type=float, default=1.1,
+            help='Показатель Ципфа для популярности авторов (0 - равномерно).'
+        )
+        parser.add_argument(
+            '--recipe-skew', type=float, default=1.1,
+            help='Показатель Ципфа для популярности рецептов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Рецепты публикуются равномерно за последние days дней.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError(
+                'Нет ингредиентов или тегов: сначала выполните '
+                'load_data и load_tags.'
+            )
+        if options['users'] < 2 and (options['follows'] or options['recipes']):
+            raise CommandError('Нужно хотя бы два пользователя.')
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            author_weights = zipf_weights(len(user_ids),
+                                          options['author_skew'])
+            self.create_follows(user_ids, author_weights, options['follows'])
+            recipe_ids = self.create_recipes(
+                options, user_ids, author_weights, ingredient_ids, tag_ids
+            )
+            recipe_weights = zipf_weights(len(recipe_ids),
+                                          options['recipe_skew'])
+            favorites = self.create_relations(
+                Favorite, user_ids, recipe_ids, recipe_weights,
+                options['favorites']
+            )
+            carts = self.create_relations(
+                ShoppingCart, user_ids, recipe_ids, recipe_weights,
+                options['carts']
+            )
+        # Связи созданы через bulk_create, сигналы не сработали.
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('build_similar_recipes', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}, '
+            f'в избранном: {favorites}, в корзинах: {carts}'
+        ))
+
+    def sizes(self, mean, count):
+        """Случайные размеры со средним mean, от 0 до 2 * mean."""
+        return [
+            round(self.rng.uniform(0, 2 * mean)) for _ in range(count)
+        ]
+
+    def bulk_create(self, model, objects, **kwargs):
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            created += model.objects.bulk_create(
+                objects[start:start + self.batch_size], **kwargs
+            )
+        return created
+
+    def create_users(self, count):
+        start = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        password = make_password(PASSWORD)
+        users = self.bulk_create(User, [
+            User(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            ) for number in range(start, start + count)
+        ])
+        self.stdout.write(f'Пользователи: {len(users)}')
+        return [user.id for user in users]
+
+    def create_follows(self, user_ids, author_weights, mean):
+        follows = {}
+        for user_id, size in zip(
+            user_ids, self.sizes(mean, len(user_ids))
+        ):
+            for author_id in self.rng.choices(
+                user_ids, cum_weights=author_weights, k=size
+            ):
+                if author_id != user_id:
+                    follows[user_id, author_id] = Follow(
+                        user_id=user_id, following_id=author_id
+                    )
+        self.bulk_create(Follow, list(follows.values()))
+        self.stdout.write(f'Подписки: {len(follows)}')
+
+    def create_recipes(self, options, user_ids, author_weights,
+                       ingredient_ids, tag_ids):
+        if not default_storage.exists(IMAGE_PATH):
+            image = io.BytesIO()
+            Image.new('RGB', (1, 1), 'white').save(image, 'PNG')
+            default_storage.save(IMAGE_PATH, ContentFile(image.getvalue()))
+
+        now = timezone.now()
+        period = timedelta(days=options['days']).total_seconds()
+        low, high = options['ingredients']
+        recipe_ids = []
+        count = options['recipes']
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=author_id,
+                    name=f'Рецепт {start + number + 1}',
+                    text='Сгенерированный рецепт.',
+                    image=IMAGE_PATH,
+                    cooking_time=self.rng.randint(1, 180),
+                ) for number, author_id in enumerate(self.rng.choices(
+                    user_ids, cum_weights=author_weights, k=size
+                ))
+            )
+            # pub_date заполняется auto_now_add, разносим даты отдельно.
+            for recipe in recipes:
+                recipe.pub_date = now - timedelta(
+                    seconds=self.rng.uniform(0, period)
+                )
+            Recipe.objects.bulk_update(recipes, ['pub_date'])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids,
+                    min(self.rng.randint(low, high), len(ingredient_ids))
+                )
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, min(3, len(tag_ids)))
+                )
+            )
+            recipe_ids += [recipe.id for recipe in recipes]
+        self.stdout.write(f'Рецепты: {len(recipe_ids)}')
+        return recipe_ids
+
+    def create_relations(self, model, user_ids, recipe_ids, recipe_weights,
+                         mean):
+        if not recipe_ids:
+            return 0
+        relations = []
+        for user_id, size in zip(
+            user_ids, self.sizes(mean, len(user_ids))
+        ):
+            relations += [
+                model(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in set(self.rng.choices(
+                    recipe_ids, cum_weights=recipe_weights, k=size
+                ))
+            ]
+        self.bulk_create(model, relations)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: '
+                          f'{len(relations)}')
+        return len(relations)
@@ -1,37 +1,51 @@
-import csv
 import os
-from builtins import FileNotFoundError
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError
 
+from recipes.ingredient_index import build_index
+from recipes.management.loaders import ReferenceLoader, read_rows
 from recipes.models import Ingredient
 
+FIELDS = ('name', 'measurement_unit')
+
 
 class Command(BaseCommand):
-    """Загрузка ингредиентов в БД."""
+    """
+    Загрузка ингредиентов в БД из csv или json (список объектов
+    с name и measurement_unit). Повторный запуск ничего не дублирует.
+    """
 
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
+    help = 'Загрузка ингредиентов из data/ingredients.csv или json.'
 
-        self.stdout.write('Началась загрузка данных...')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv')
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError(f'Неизвестный формат файла: {path}')
 
+        self.stdout.write('Началась загрузка данных...')
+        loader = ReferenceLoader(
+            Ingredient, key_fields=FIELDS, batch_size=options['batch_size']
+        )
         try:
-            with open(file_path, 'r', encoding='UTF-8') as ingredients:
-                for name, measurement_unit in csv.reader(ingredients):
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit,
-                    )
+            with open(path, encoding='UTF-8') as ingredients:
+                stats = loader.load(
+                    read_rows(ingredients, FIELDS, file_format)
+                )
         except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(
-                'Файл ingredients.csv не найден')
-            )
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(
-                f'Ошибка при чтении файла: {str(e)}')
-            )
-
-        self.stdout.write(self.style.SUCCESS(
-            'Данные об ингредиентах успешно добавлены в БД')
-        )
+            raise CommandError(f'Файл {path} не найден')
+        except (ValueError, KeyError, DatabaseError) as error:
+            raise CommandError(f'Ошибка при загрузке {path}: {error}')
+
+        # bulk-запросы не вызывают сигналы, индекс пересобираем сами.
+        build_index()
+        self.stdout.write(self.style.SUCCESS(f'Ингредиенты: {stats}'))
@@ -1,36 +1,37 @@
-import csv
 import os
-from builtins import FileNotFoundError
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError
 
+from recipes.management.loaders import ReferenceLoader, read_csv
 from recipes.models import Tag
 
 
 class Command(BaseCommand):
-    """Загрузка тегов в БД."""
+    """Загрузка тегов в БД. Существующие теги обновляются по slug."""
 
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR, 'data/tags.csv')
+    help = 'Загрузка тегов из data/tags.csv.'
 
-        self.stdout.write('Началась загрузка тегов в БД...')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=os.path.join(settings.BASE_DIR, 'data/tags.csv')
+        )
 
+    def handle(self, *args, **options):
+        path = options['path']
+        self.stdout.write('Началась загрузка тегов в БД...')
+        loader = ReferenceLoader(
+            Tag, key_fields=('slug',), update_fields=('name', 'color')
+        )
         try:
-            with open(file_path, 'r', encoding='UTF-8') as tags:
-                for name, color, slug in csv.reader(tags):
-                    Tag.objects.get_or_create(
-                        name=name,
-                        color=color,
-                        slug=slug
-                    )
+            with open(path, encoding='UTF-8') as tags:
+                stats = loader.load(
+                    read_csv(tags, ('name', 'color', 'slug'))
+                )
         except FileNotFoundError:
-            self.stdout.write(self.style.ERROR('Файл tags.csv не найден'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(
-                f'Ошибка при чтении файла тегов: {str(e)}')
-            )
-
-        self.stdout.write(self.style.SUCCESS(
-            'Данные о тегах успешно добавлены в БД')
-        )
+            raise CommandError(f'Файл {path} не найден')
+        except (ValueError, DatabaseError) as error:
+            raise CommandError(f'Ошибка при загрузке {path}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Теги: {stats}'))
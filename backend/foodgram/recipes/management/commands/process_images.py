@@ -0,0 +1,50 @@
+from django.db.models import Count, F, Q
+
+from foodgram.constants import IMAGE_VARIANTS
+from recipes.images import enqueue, process_jobs
+from recipes.management.workers import JobWorkerCommand
+from recipes.models import Recipe, StoredImage
+from recipes.storage import recipe_image_storage
+
+
+class Command(JobWorkerCommand):
+    """
+    Воркер, который делает варианты картинок рецептов из очереди
+    RecipeImageJob и удаляет файлы картинок без ссылок.
+    """
+
+    help = 'Обработка картинок рецептов в фоне.'
+    done_message = 'Обработано картинок'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--enqueue-missing',
+            action='store_true',
+            help='Поставить в очередь рецепты без готовых вариантов.'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_missing']:
+            self.enqueue_missing()
+        super().handle(*args, **options)
+
+    def process_jobs(self, batch_size):
+        removed = StoredImage.objects.sweep(recipe_image_storage(), batch_size)
+        if removed:
+            self.stdout.write(f'Удалено файлов без ссылок: {removed}')
+        return process_jobs(batch_size)
+
+    def enqueue_missing(self):
+        recipes = Recipe.objects.alias(
+            ready=Count(
+                'image_variants',
+                filter=Q(image_variants__source=F('image'))
+            )
+        ).filter(ready__lt=len(IMAGE_VARIANTS)).only('id')
+        count = 0
+        for start in range(0, recipes.count(), 1000):
+            batch = list(recipes.order_by('id')[start:start + 1000])
+            enqueue(batch)
+            count += len(batch)
+        self.stdout.write(f'Поставлено в очередь рецептов: {count}')
@@ -0,0 +1,15 @@
+from recipes.jobs import process_jobs
+from recipes.management.workers import JobWorkerCommand
+
+
+class Command(JobWorkerCommand):
+    """
+    Воркер очереди RecipeJob: рассылка новых рецептов в ленты
+    подписчиков и другие задачи, которые не должны выполняться
+    в запросе (см. recipes.jobs).
+    """
+
+    help = 'Фоновые задачи по рецептам.'
+
+    def process_jobs(self, batch_size):
+        return process_jobs(batch_size)
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Пересборка лент подписок (recipes.feed) из подписок и рецептов:
+    после загрузки данных в обход сигналов и после того, как авторы
+    перешли порог подписчиков для рассылки.
+    """
+
+    help = 'Пересобирает ленты подписок пользователей.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {rebuild()}'
+        ))
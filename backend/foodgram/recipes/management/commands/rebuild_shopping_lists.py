@@ -0,0 +1,79 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.models import RecipeIngredient, ShoppingListIngredient
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """Пересчет списков покупок (ShoppingListIngredient) с нуля."""
+
+    help = ('Пересчитывает суммарные ингредиенты корзин. '
+            'С --check только сверяет их с корзинами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Не изменять данные, только найти расхождения.'
+        )
+
+    @staticmethod
+    def expected_totals():
+        return RecipeIngredient.objects.filter(
+            recipe__shoppingcart__isnull=False
+        ).values_list(
+            F('recipe__shoppingcart__user'), 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+
+    def handle(self, *args, **options):
+        if options['check']:
+            return self.check_totals()
+
+        self.stdout.write('Пересчет списков покупок...')
+        created = 0
+        with transaction.atomic():
+            ShoppingListIngredient.objects.all().delete()
+            batch = []
+            for user_id, ingredient_id, amount in (
+                self.expected_totals().iterator()
+            ):
+                batch.append(ShoppingListIngredient(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+                if len(batch) == BATCH_SIZE:
+                    created += len(batch)
+                    ShoppingListIngredient.objects.bulk_create(batch)
+                    batch = []
+            created += len(batch)
+            ShoppingListIngredient.objects.bulk_create(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны, записей: {created}'
+        ))
+
+    def check_totals(self):
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListIngredient.objects.values_list(
+                'user', 'ingredient', 'amount'
+            ).iterator()
+        }
+        wrong = 0
+        for user_id, ingredient_id, amount in (
+            self.expected_totals().iterator()
+        ):
+            if actual.pop((user_id, ingredient_id), None) != amount:
+                wrong += 1
+        wrong += len(actual)
+        if wrong:
+            raise CommandError(
+                f'Расхождений в списках покупок: {wrong}. '
+                'Запустите команду без --check для пересчета.'
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок корректны'))
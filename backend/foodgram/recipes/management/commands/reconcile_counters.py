@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    """
+    Сверка счетчиков популярности (recipes.counters) с настоящим
+    числом избранного, корзин, рецептов и подписчиков.
+    """
+
+    help = ('Исправляет разошедшиеся счетчики рецептов и пользователей. '
+            'С --check только находит расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Не изменять данные, только найти расхождения.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = reconcile(check=options['check'])
+        for label, rows in result.items():
+            if rows:
+                self.stdout.write(f'{label}: {rows}')
+        wrong = sum(result.values())
+        if options['check'] and wrong:
+            raise CommandError(
+                f'Расхождений в счетчиках: {wrong}. '
+                'Запустите команду без --check для исправления.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: {wrong}' if wrong
+            else 'Счетчики корректны'
+        ))
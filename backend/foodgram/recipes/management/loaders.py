@@ -0,0 +1,220 @@
+"""
+Загрузка справочников (ингредиенты, теги) из csv и json.
+
+Файл читается потоком и загружается пачками: на PostgreSQL через COPY
+во временную таблицу и один INSERT ... ON CONFLICT / UPDATE из нее,
+на остальных базах через bulk_create с update_conflicts. Повторная
+загрузка того же файла ничего не меняет.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from itertools import islice
+
+from django.db import connection, transaction
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class LoadStats:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __str__(self):
+        return (f'добавлено: {self.inserted}, обновлено: {self.updated}, '
+                f'без изменений: {self.unchanged}')
+
+
+def read_csv(file, fields):
+    for line, row in enumerate(csv.reader(file), 1):
+        if len(row) != len(fields):
+            raise ValueError(
+                f'строка {line}: ожидалось полей {len(fields)}, '
+                f'получено {len(row)}'
+            )
+        yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """Объекты из json-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('ожидался json-массив')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield {field: item[field] for field in fields}
+        if not chunk:
+            raise ValueError('json-массив не закрыт')
+
+
+def read_rows(file, fields, file_format):
+    if file_format == 'json':
+        return read_json(file, fields)
+    return read_csv(file, fields)
+
+
+class CSVStream(io.TextIOBase):
+    """Файлоподобный объект для COPY: строки csv из итератора словарей."""
+
+    def __init__(self, rows, fields):
+        self.rows = rows
+        self.fields = fields
+        self.buffer = ''
+        self.writer = csv.writer(self)
+        self.pending = []
+
+    def write(self, text):
+        self.pending.append(text)
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(row[field] for field in self.fields)
+            self.buffer += ''.join(self.pending)
+            self.pending.clear()
+        if size < 0:
+            size = len(self.buffer)
+        result, self.buffer = self.buffer[:size], self.buffer[size:]
+        return result
+
+    def readable(self):
+        return True
+
+
+class ReferenceLoader:
+    """
+    Идемпотентная загрузка модели-справочника.
+    key_fields - уникальный ключ записи, update_fields - поля,
+    которые обновляются у уже существующих записей.
+    """
+
+    def __init__(self, model, key_fields, update_fields=(),
+                 batch_size=5000):
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.update_fields = tuple(update_fields)
+        self.fields = self.key_fields + self.update_fields
+        self.batch_size = batch_size
+
+    def load(self, rows):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                return self.copy_load(rows)
+            stats = LoadStats()
+            rows = iter(rows)
+            while batch := list(islice(rows, self.batch_size)):
+                self.load_batch(batch, stats)
+            return stats
+
+    def key(self, values):
+        return tuple(values[field] for field in self.key_fields)
+
+    def load_batch(self, batch, stats):
+        rows = {}
+        for row in batch:
+            if self.key(row) in rows:
+                stats.unchanged += 1
+            rows[self.key(row)] = row
+        first_key = self.key_fields[0]
+        existing = {
+            self.key(values): values
+            for values in self.model.objects.filter(**{
+                f'{first_key}__in': {row[first_key] for row in rows.values()}
+            }).values(*self.fields)
+        }
+        changed = []
+        for key, row in rows.items():
+            if key not in existing:
+                stats.inserted += 1
+                changed.append(row)
+            elif existing[key] != row:
+                stats.updated += 1
+                changed.append(row)
+            else:
+                stats.unchanged += 1
+        objects = [self.model(**row) for row in changed]
+        if self.update_fields:
+            self.model.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=self.key_fields,
+                update_fields=self.update_fields
+            )
+        else:
+            self.model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def columns(self, fields):
+        return [
+            connection.ops.quote_name(self.model._meta.get_field(field).column)
+            for field in fields
+        ]
+
+    def copy_load(self, rows):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        keys = ', '.join(self.columns(self.key_fields))
+        values = self.columns(self.update_fields)
+        columns = ', '.join(self.columns(self.fields))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE staging ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY staging ({columns}) FROM STDIN WITH (FORMAT csv)',
+                CSVStream(iter(rows), self.fields)
+            )
+            cursor.execute('SELECT COUNT(*) FROM staging')
+            total = cursor.fetchone()[0]
+            updated = 0
+            if values:
+                assignments = ', '.join(
+                    f'{column} = staging.{column}' for column in values
+                )
+                join = ' AND '.join(
+                    f'target.{column} = staging.{column}'
+                    for column in self.columns(self.key_fields)
+                )
+                changes = ' OR '.join(
+                    f'target.{column} IS DISTINCT FROM staging.{column}'
+                    for column in values
+                )
+                cursor.execute(
+                    f'UPDATE {table} AS target SET {assignments} '
+                    f'FROM (SELECT DISTINCT ON ({keys}) * FROM staging) '
+                    f'AS staging WHERE {join} AND ({changes})'
+                )
+                updated = cursor.rowcount
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({keys}) {columns} FROM staging '
+                f'ON CONFLICT DO NOTHING'
+            )
+            inserted = cursor.rowcount
+        return LoadStats(
+            inserted=inserted,
+            updated=updated,
+            unchanged=total - inserted - updated
+        )
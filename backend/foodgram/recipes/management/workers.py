@@ -0,0 +1,52 @@
+"""Общий цикл воркеров очередей задач (см. recipes.jobs)."""
+import signal
+import time
+from abc import ABC, abstractmethod
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+
+class JobWorkerCommand(ABC, BaseCommand):
+    """
+    Воркер очереди: process_jobs(batch_size) выполняет пачку задач
+    и возвращает (успешно, ошибок). Без --once работает, пока его
+    не остановят; текущая задача при SIGTERM дорабатывается.
+    """
+
+    done_message = 'Выполнено задач'
+
+    @abstractmethod
+    def process_jobs(self, batch_size):
+        """Выполняет до batch_size задач, возвращает (успешно, ошибок)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while self.running:
+            close_old_connections()
+            done, failed = self.process_jobs(options['batch_size'])
+            if done or failed:
+                self.stdout.write(
+                    f'{self.done_message}: {done}, с ошибкой: {failed}'
+                )
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
+
+    def stop(self, signum, frame):
+        self.running = False
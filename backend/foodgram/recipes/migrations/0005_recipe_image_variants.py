@@ -0,0 +1,49 @@
+# Generated by Django 4.2.4 on 2026-10-17 06:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='вид')),
+                ('file', models.ImageField(upload_to='recipes/variants/', verbose_name='файл')),
+                ('width', models.PositiveIntegerField(verbose_name='ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='высота')),
+                ('source', models.CharField(help_text='Имя картинки рецепта, из которой сделан вариант', max_length=255, verbose_name='исходная картинка')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Вариант картинки рецепта',
+                'verbose_name_plural': 'Варианты картинок рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='неудачных попыток')),
+                ('error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='image_job', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Обработка картинки',
+                'verbose_name_plural': 'Очередь обработки картинок',
+                'ordering': ('created', 'id'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimagevariant',
+            constraint=models.UniqueConstraint(fields=('recipe', 'kind'), name='constraint_recipe_image_variant'),
+        ),
+    ]
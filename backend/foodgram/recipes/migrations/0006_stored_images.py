@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2026-10-17 06:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+import recipes.storage
+
+
+def count_references(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    StoredImage = apps.get_model('recipes', 'StoredImage')
+    StoredImage.objects.bulk_create(
+        StoredImage(name=name, references=references)
+        for name, references in Recipe.objects.exclude(image='').values_list(
+            'image'
+        ).annotate(references=Count('id')).order_by().iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='имя файла')),
+                ('references', models.PositiveIntegerField(default=1, verbose_name='число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='загрузите картинку', storage=recipes.storage.recipe_image_storage, upload_to='recipes/images/', verbose_name='картинка'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
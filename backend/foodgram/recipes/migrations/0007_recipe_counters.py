@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-17 06:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'recipes', 'Favorite', 'recipe'),
+    ('recipes', 'Recipe', 'in_carts_count',
+     'recipes', 'ShoppingCart', 'recipe'),
+    ('users', 'FoodgramUser', 'recipes_count', 'recipes', 'Recipe', 'author'),
+    ('users', 'FoodgramUser', 'followers_count',
+     'users', 'Follow', 'following'),
+)
+
+
+def count_relations(apps, schema_editor):
+    for app, model, field, related_app, related, link in COUNTERS:
+        related = apps.get_model(related_app, related)
+        apps.get_model(app, model).objects.update(**{field: Coalesce(
+            Subquery(
+                related.objects.filter(**{link: OuterRef('pk')}).order_by(
+                ).values(link).annotate(total=Count('pk')).values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_stored_images'),
+        ('users', '0003_foodgramuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='в корзинах'),
+        ),
+        migrations.RunPython(count_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Для name__icontains в поиске админки: UPPER("name"::text) LIKE UPPER(...)
+INDEX = 'recipes_recipe_upper_name_trgm'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX} '
+        'ON recipes_recipe USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
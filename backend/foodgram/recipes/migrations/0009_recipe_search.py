@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# См. recipes.recipe_search.
+POSTGRESQL_FORWARD = (
+    "ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector "
+    "tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx "
+    "ON recipes_recipe USING gin (search_vector)",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+# Триггер на UPDATE срабатывает только при изменении name и text, а не
+# при каждом изменении счетчиков рецепта.
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5("
+    "name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert "
+    "AFTER INSERT ON recipes_recipe BEGIN "
+    "INSERT INTO recipes_recipe_fts(rowid, name, text) "
+    "VALUES (new.id, new.name, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete "
+    "AFTER DELETE ON recipes_recipe BEGIN "
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text) "
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update "
+    "AFTER UPDATE OF name, text ON recipes_recipe BEGIN "
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text) "
+    "VALUES ('delete', old.id, old.name, old.text); "
+    "INSERT INTO recipes_recipe_fts(rowid, name, text) "
+    "VALUES (new.id, new.name, new.text); END",
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARD,
+                 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRESQL_BACKWARD,
+                 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
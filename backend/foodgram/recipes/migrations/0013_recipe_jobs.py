@@ -0,0 +1,34 @@
+# Generated by Django 4.2.4 on 2026-10-17 07:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_counters_not_editable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('feed', 'рассылка в ленты подписчиков')], max_length=20, verbose_name='задача')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='неудачных попыток')),
+                ('error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Задача по рецепту',
+                'verbose_name_plural': 'Очередь задач по рецептам',
+                'ordering': ('created', 'id'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipejob',
+            constraint=models.UniqueConstraint(fields=('recipe', 'kind'), name='constraint_recipe_job'),
+        ),
+    ]
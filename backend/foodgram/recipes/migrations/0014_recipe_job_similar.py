@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipejob',
+            name='kind',
+            field=models.CharField(choices=[('feed', 'рассылка в ленты подписчиков'), ('similar', 'пересчет похожих рецептов')], max_length=20, verbose_name='задача'),
+        ),
+    ]
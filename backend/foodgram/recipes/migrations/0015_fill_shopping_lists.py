@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-17 07:56
+
+from django.db import migrations
+from django.db.models import F, Sum
+
+BATCH_SIZE = 5000
+
+
+def fill_shopping_lists(apps, schema_editor):
+    """
+    Списки покупок по корзинам, сохраненным до 0002: таблица
+    ShoppingListIngredient создана пустой. Пересчет с нуля, как
+    manage.py rebuild_shopping_lists, поэтому повторный запуск безопасен.
+    """
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListIngredient = apps.get_model(
+        'recipes', 'ShoppingListIngredient'
+    )
+    ShoppingListIngredient.objects.all().delete()
+    ShoppingListIngredient.objects.bulk_create(
+        (
+            ShoppingListIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, ingredient_id, amount in
+            RecipeIngredient.objects.filter(
+                recipe__shoppingcart__isnull=False
+            ).values_list(
+                F('recipe__shoppingcart__user'), 'ingredient'
+            ).annotate(total=Sum('amount')).order_by().iterator()
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_job_similar'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.4 on 2026-10-17 12:40
+
+import heapq
+
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+# Значения foodgram.constants на момент миграции.
+BATCH_SIZE = 1000
+FEED_LENGTH = 500
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+
+
+def fill_timeline(apps, schema_editor):
+    """
+    Ленты по подпискам, сохраненным до 0011: таблица TimelineEntry
+    создана пустой. Пересборка с нуля, как manage.py rebuild_feeds,
+    поэтому повторный запуск безопасен. Память ограничена последними
+    FEED_LENGTH рецептами каждого автора и пачкой подписчиков.
+    """
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    TimelineEntry.objects.all().delete()
+    recent = {}
+    for recipe_id, author_id, pub_date in Recipe.objects.alias(
+        position=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('pub_date').desc(), F('id').desc())
+        )
+    ).filter(
+        position__lte=FEED_LENGTH,
+        author__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    ).order_by().values_list('id', 'author', 'pub_date').iterator():
+        recent.setdefault(author_id, []).append((pub_date, recipe_id))
+    follows = Follow.objects.filter(
+        following__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    )
+    followers = follows.order_by('user_id').values_list(
+        'user', flat=True
+    ).distinct()
+    last = 0
+    while True:
+        batch = list(followers.filter(user__gt=last)[:BATCH_SIZE])
+        if not batch:
+            return
+        authors = {}
+        for user_id, author_id in follows.filter(
+            user__in=batch
+        ).values_list('user', 'following'):
+            authors.setdefault(user_id, []).append(author_id)
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                              author_id=author_id, pub_date=pub_date)
+                for user_id, author_ids in authors.items()
+                for pub_date, recipe_id, author_id in heapq.nlargest(
+                    FEED_LENGTH,
+                    ((pub_date, recipe_id, author_id)
+                     for author_id in author_ids
+                     for pub_date, recipe_id in recent.get(author_id, ()))
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+        last = batch[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_fill_shopping_lists'),
+        ('users', '0005_counters_not_editable'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
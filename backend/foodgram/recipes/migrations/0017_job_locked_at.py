@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-17 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_fill_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimagejob',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='взята воркером'),
+        ),
+        migrations.AddField(
+            model_name='recipejob',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='взята воркером'),
+        ),
+        migrations.AlterField(
+            model_name='recipeimagejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='попыток'),
+        ),
+        migrations.AlterField(
+            model_name='recipejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='попыток'),
+        ),
+    ]
@@ -1,15 +1,20 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+
+from django.db import connection, models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.db.models.functions import Greatest
 from colorfield.fields import ColorField
 
 from foodgram.constants import (
     MAX_RECIPES_NAMES_LENGTH,
     MAX_STR_LENGTH,
     MAX_COOKING_VALUE,
+    MAX_VARIANT_KIND_LENGTH,
     MAX_AMOUNT_VALUE,
     MIN_VALUE,
 )
+from foodgram.mixins import CountersMixin, CountersQuerySetMixin
+from recipes.storage import recipe_image_storage
 from users.models import FoodgramUser as User
 
 
@@ -39,7 +44,7 @@ class Tag(models.Model):
         return self.name[:MAX_STR_LENGTH]
 
 
-class RecipeQuerySet(models.QuerySet):
+class RecipeQuerySet(CountersQuerySetMixin, models.QuerySet):
     """Класс для аннотирования queryset."""
 
     def annotate_recipe(self, user_id):
@@ -59,7 +64,7 @@ class RecipeQuerySet(models.QuerySet):
         )
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """
     Класс для модели рецепта
     """
@@ -78,6 +83,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='картинка',
         upload_to='recipes/images/',
+        storage=recipe_image_storage,
         help_text='загрузите картинку',
 
     )
@@ -112,17 +118,44 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации рецепта',
         auto_now_add=True)
+    # Счетчики поддерживаются сигналами, см. recipes.counters,
+    # поэтому в формах (админка) их нет.
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='в избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='в корзинах',
+        default=0,
+        editable=False
+    )
     objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         default_related_name = 'recipes'
+        indexes = [
+            # Ключ keyset-пагинации ленты, см. api.paginators
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Рецепт {self.name}. Автор: {self.author.username}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        recipe = super().from_db(db, field_names, values)
+        # Имя картинки из базы: по нему сигнал видит, что картинку заменили.
+        recipe.loaded_image = recipe.__dict__.get('image')
+        return recipe
+
 
 class Ingredient(models.Model):
     """Класс для модели Ингредиент."""
@@ -202,6 +235,88 @@ class RecipeIngredient(models.Model):
                 )
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Добавление и удаление рецептов пользователя одним запросом.
+    Запросы идут мимо сигналов, поэтому счетчик рецепта (counter_field
+    модели) и список покупок меняются здесь же, пачкой.
+    """
+
+    def execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [recipe_id for recipe_id, in cursor.fetchall()]
+
+    def relations_changed(self, user_id, recipe_ids, sign):
+        if not recipe_ids:
+            return
+        Recipe.objects.filter(pk__in=recipe_ids).change_counter(
+            self.model.counter_field, sign
+        )
+        if self.model is ShoppingCart:
+            if sign > 0:
+                ShoppingListIngredient.objects.add_recipes(user_id, recipe_ids)
+            else:
+                ShoppingListIngredient.objects.remove_recipes(
+                    user_id, recipe_ids
+                )
+
+    def add(self, user_id, recipe_ids):
+        """
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING: несуществующие и
+        уже добавленные рецепты пропускаются. Возвращает id добавленных.
+        """
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            return []
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        recipes = connection.ops.quote_name(Recipe._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with transaction.atomic():
+            added = self.execute(
+                f'INSERT INTO {table} (user_id, recipe_id) '
+                f'SELECT %s, id FROM {recipes} WHERE id IN ({placeholders}) '
+                f'ON CONFLICT DO NOTHING RETURNING recipe_id',
+                [user_id, *recipe_ids]
+            )
+            self.relations_changed(user_id, added, 1)
+        return added
+
+    def remove(self, user_id, recipe_ids):
+        """Один DELETE. Возвращает id рецептов, которые были удалены."""
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            return []
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with transaction.atomic():
+            removed = self.execute(
+                f'DELETE FROM {table} WHERE user_id = %s '
+                f'AND recipe_id IN ({placeholders}) RETURNING recipe_id',
+                [user_id, *recipe_ids]
+            )
+            self.relations_changed(user_id, removed, -1)
+        return removed
+
+    def delete(self):
+        """
+        Удаление пачкой - через remove, по запросу на пользователя.
+        Сигналов удаления у модели нет, поэтому при удалении рецепта или
+        пользователя Django удаляет связи одним DELETE (см. signals).
+        """
+        recipes = {}
+        for user_id, recipe_id in self.values_list('user', 'recipe'):
+            recipes.setdefault(user_id, []).append(recipe_id)
+        deleted = 0
+        with transaction.atomic():
+            for user_id, recipe_ids in recipes.items():
+                deleted += len(self.model.objects.remove(user_id, recipe_ids))
+        return deleted, {self.model._meta.label: deleted}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class UserRecipeBaseModel(models.Model):
     """Базовый класс для моделей избранного и корзины."""
 
@@ -219,6 +334,7 @@ class UserRecipeBaseModel(models.Model):
         related_query_name="%(class)s",
         verbose_name='Рецепдт',
     )
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         abstract = True
@@ -229,10 +345,17 @@ class UserRecipeBaseModel(models.Model):
             )
         ]
 
+    def delete(self, using=None, keep_parents=False):
+        removed = type(self).objects.remove(self.user_id, [self.recipe_id])
+        self.pk = None
+        return len(removed), {self._meta.label: len(removed)}
+
 
 class Favorite(UserRecipeBaseModel):
     """Класс для модели избранного."""
 
+    counter_field = 'favorites_count'
+
     class Meta(UserRecipeBaseModel.Meta):
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
@@ -244,9 +367,497 @@ class Favorite(UserRecipeBaseModel):
 class ShoppingCart(UserRecipeBaseModel):
     """Класс для модели Корзины."""
 
+    counter_field = 'in_carts_count'
+
     class Meta(UserRecipeBaseModel.Meta):
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
 
     def __str__(self):
         return f'{self.recipe.name} в корзине у {self.user.username}'
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    """
+    Суммарное количество ингредиентов в корзинах. Методы изменения
+    принимают изменения пачкой, чтобы число запросов не зависело
+    от количества рецептов и пользователей.
+    """
+
+    def file_rows(self, user):
+        """Строки файла списка покупок пользователя (api.renderers)."""
+        return self.filter(user=user).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name')
+
+    def apply_changes(self, changes):
+        """
+        Применяет изменения вида {(user_id, ingredient_id): delta}.
+        Прибавление - INSERT ... ON CONFLICT DO UPDATE: если строки еще
+        нет, два одновременных запроса не вставят ее дважды. Вычитание -
+        UPDATE существующих строк и DELETE обнулившихся.
+        """
+        added = sorted(
+            (key, delta) for key, delta in changes.items() if delta > 0
+        )
+        removed = sorted(
+            (key, -delta) for key, delta in changes.items() if delta < 0
+        )
+        if not (added or removed):
+            return
+        fields = ('user_id', 'ingredient_id', 'amount')
+        with transaction.atomic():
+            for batch in self.batches(fields, added):
+                self.add_amounts(batch)
+            for batch in self.batches(fields, removed):
+                self.subtract_amounts(batch)
+
+    def batches(self, fields, rows):
+        size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+        return (
+            rows[start:start + size] for start in range(0, len(rows), size)
+        )
+
+    def add_amounts(self, rows):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(rows))} '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [value for (user_id, ingredient_id), amount in rows
+                 for value in (user_id, ingredient_id, amount)]
+            )
+
+    def subtract_amounts(self, rows):
+        affected = self.filter(
+            user__in={user_id for (user_id, _), _ in rows},
+            ingredient__in={ingredient_id for (_, ingredient_id), _ in rows},
+        )
+        # Строки из произведения множеств, которых нет в rows, не меняются.
+        affected.update(amount=Greatest(F('amount') - Case(
+            *(When(user_id=user_id, ingredient_id=ingredient_id,
+                   then=Value(amount))
+              for (user_id, ingredient_id), amount in rows),
+            default=Value(0),
+            output_field=models.IntegerField()
+        ), 0))
+        affected.filter(amount=0).delete()
+
+    def recipe_totals(self, recipe_ids):
+        """Подзапрос: сумма каждого ингредиента в рецептах recipe_ids."""
+        table = connection.ops.quote_name(RecipeIngredient._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        return (
+            f'SELECT ingredient_id, SUM(amount) AS total FROM {table} '
+            f'WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id'
+        )
+
+    def add_recipes(self, user_id, recipe_ids):
+        """
+        Рецепты добавлены в корзину пользователя: один INSERT ... SELECT
+        с суммами ингредиентов и ON CONFLICT DO UPDATE.
+        """
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            # WHERE у SELECT обязателен: без него SQLite принимает
+            # ON CONFLICT за часть JOIN.
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'SELECT %s, totals.ingredient_id, totals.total '
+                f'FROM ({self.recipe_totals(recipe_ids)}) AS totals '
+                f'WHERE true '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [user_id, *recipe_ids]
+            )
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """
+        Рецепты удалены из корзины пользователя: UPDATE ... FROM
+        с суммами ингредиентов и DELETE обнулившихся строк.
+        """
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with transaction.atomic(savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET amount = {table}.amount - '
+                    f'totals.total '
+                    f'FROM ({self.recipe_totals(recipe_ids)}) AS totals '
+                    f'WHERE {table}.user_id = %s '
+                    f'AND {table}.ingredient_id = totals.ingredient_id',
+                    [*recipe_ids, user_id]
+                )
+            self.filter(user_id=user_id, amount__lte=0).delete()
+
+    def update_recipe(self, recipe, old_amounts, new_amounts):
+        """
+        Ингредиенты рецепта изменились. Принимает словари
+        {ingredient_id: amount} до и после изменения.
+        """
+        deltas = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.apply_changes({
+            (user_id, ingredient_id): delta
+            for user_id in ShoppingCart.objects.filter(
+                recipe=recipe
+            ).values_list('user', flat=True)
+            for ingredient_id, delta in deltas.items()
+        })
+
+
+class ShoppingListIngredient(models.Model):
+    """
+    Суммарное количество ингредиента во всех рецептах корзины.
+    Хранится заранее, чтобы скачивание списка покупок было одним
+    чтением по индексу. Пересчитать: manage.py rebuild_shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='количество',
+    )
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='constraint_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (f'{self.ingredient.name} для {self.user.username}: '
+                f'{self.amount} {self.ingredient.measurement_unit}')
+
+
+class RecipeImageVariant(models.Model):
+    """
+    Уменьшенная и пережатая копия картинки рецепта
+    (виды - foodgram.constants.IMAGE_VARIANTS).
+    Создается воркером process_images после сохранения рецепта.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Рецепт'
+    )
+    kind = models.CharField(
+        verbose_name='вид',
+        max_length=MAX_VARIANT_KIND_LENGTH,
+    )
+    file = models.ImageField(
+        verbose_name='файл',
+        upload_to='recipes/variants/',
+    )
+    width = models.PositiveIntegerField(verbose_name='ширина')
+    height = models.PositiveIntegerField(verbose_name='высота')
+    source = models.CharField(
+        verbose_name='исходная картинка',
+        max_length=255,
+        help_text='Имя картинки рецепта, из которой сделан вариант'
+    )
+
+    class Meta:
+        verbose_name = 'Вариант картинки рецепта'
+        verbose_name_plural = 'Варианты картинок рецептов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'kind'),
+                name='constraint_recipe_image_variant'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.width}x{self.height} для {self.recipe_id}'
+
+
+class RecipeImageJob(models.Model):
+    """Очередь рецептов, для картинок которых нужно сделать варианты."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_job',
+        verbose_name='Рецепт'
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата постановки в очередь',
+        auto_now_add=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='попыток',
+        default=0
+    )
+    locked_at = models.DateTimeField(
+        verbose_name='взята воркером',
+        null=True,
+        blank=True
+    )
+    error = models.TextField(verbose_name='последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Очередь обработки картинок'
+        ordering = ('created', 'id')
+
+    def __str__(self):
+        return f'Картинка рецепта {self.recipe_id}'
+
+
+class RecipeJob(models.Model):
+    """
+    Очередь фоновых задач по рецепту (см. recipes.jobs), кроме
+    картинок: у тех своя очередь RecipeImageJob.
+    """
+
+    FEED = 'feed'
+    SIMILAR = 'similar'
+    KINDS = (
+        (FEED, 'рассылка в ленты подписчиков'),
+        (SIMILAR, 'пересчет похожих рецептов'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name='Рецепт'
+    )
+    kind = models.CharField(
+        verbose_name='задача',
+        max_length=MAX_VARIANT_KIND_LENGTH,
+        choices=KINDS
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата постановки в очередь',
+        auto_now_add=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='попыток',
+        default=0
+    )
+    locked_at = models.DateTimeField(
+        verbose_name='взята воркером',
+        null=True,
+        blank=True
+    )
+    error = models.TextField(verbose_name='последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача по рецепту'
+        verbose_name_plural = 'Очередь задач по рецептам'
+        ordering = ('created', 'id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'kind'),
+                name='constraint_recipe_job'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: рецепт {self.recipe_id}'
+
+
+class StoredImageQuerySet(models.QuerySet):
+    """
+    Счетчики ссылок рецептов на файлы картинок. Файл без ссылок
+    удаляет не release, а sweep в воркере process_images: запись
+    с references=0 остается до него. Удаление файла и проверка его
+    наличия при загрузке тех же байт (ContentAddressedStorage.save,
+    lock) идут под блокировкой строки, поэтому загрузка не может
+    сослаться на файл, который сейчас удаляется.
+    """
+
+    def acquire(self, name):
+        """Одним запросом: новая запись или +1 к существующей."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        references = connection.ops.quote_name('references')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, {references}) VALUES (%s, 1) '
+                f'ON CONFLICT (name) DO UPDATE '
+                f'SET {references} = {table}.{references} + 1',
+                [name]
+            )
+
+    def release(self, name):
+        """-1 к ссылкам; файл без ссылок остается до sweep."""
+        self.filter(name=name).update(references=F('references') - 1)
+
+    def lock(self, name):
+        """
+        Блокирует запись файла до конца транзакции (если запись есть):
+        sweep не удалит файл, пока загрузка не сослалась на него.
+        """
+        list(self.select_for_update().filter(name=name).values('id'))
+
+    def sweep(self, storage, limit):
+        """
+        Удаляет до limit файлов без ссылок вместе с записями,
+        возвращает их число. Каждый файл - в своей транзакции под
+        блокировкой строки; заблокированные загрузкой строки
+        пропускаются (SKIP LOCKED на PostgreSQL).
+        """
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        removed = 0
+        for name in list(self.filter(
+            references=0
+        ).values_list('name', flat=True)[:limit]):
+            with transaction.atomic():
+                image = self.select_for_update(
+                    skip_locked=skip_locked
+                ).filter(name=name, references=0).first()
+                if image is None:
+                    continue
+                storage.delete(name)
+                image.delete()
+                removed += 1
+        return removed
+
+
+class StoredImage(models.Model):
+    """
+    Файл картинки в recipes.storage.ContentAddressedStorage и число
+    рецептов, которые на него ссылаются (0 - файл ждет удаления).
+    """
+
+    name = models.CharField(
+        verbose_name='имя файла',
+        max_length=255,
+        unique=True
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='число ссылок',
+        default=1
+    )
+    objects = StoredImageQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Ближайший по ингредиентам и тегам рецепт (см. recipes.similar).
+    Для каждого рецепта хранится SIMILAR_RECIPES_COUNT соседей.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='constraint_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.similar_id} похож на {self.recipe_id}: {self.score:.2f}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Рецепт в ленте подписчика его автора (см. recipes.feed).
+    Автор и дата публикации копируются из рецепта для отписки
+    и сортировки ленты без соединения с рецептами.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='constraint_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
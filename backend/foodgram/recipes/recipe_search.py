@@ -0,0 +1,81 @@
+"""
+Полнотекстовый поиск рецептов по названию и описанию.
+
+На PostgreSQL рецепты ищутся по генерируемому столбцу
+recipes_recipe.search_vector (tsvector с русской морфологией, название
+с весом A, описание - B) через GIN-индекс и сортируются по ts_rank.
+На остальных базах (SQLite) - по таблице FTS5 recipes_recipe_fts,
+которую триггеры держат в согласии с recipes_recipe; слова запроса
+ищутся как начала слов, что заменяет стемминг, и сортировка идет по bm25.
+Столбец, таблица и триггеры создаются миграцией 0009_recipe_search.
+SQLite пересоздает таблицу при части изменений схемы, теряя триггеры:
+такие миграции рецептов должны создавать их заново.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса столбцов name и text для bm25.
+FTS_WEIGHTS = (10.0, 1.0)
+WORD = re.compile(r'\w+')
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты queryset, подходящие под запрос, с аннотацией search_rank
+    (чем больше, тем релевантнее), отсортированные по ней.
+    """
+    words = WORD.findall(query.lower())
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        queryset = postgresql_search(queryset, query)
+    else:
+        queryset = fts5_search(queryset, words)
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+
+def postgresql_search(queryset, query):
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    search_query = SearchQuery(query, config=CONFIG, search_type='websearch')
+    return queryset.alias(
+        search_vector=RawSQL(
+            f'{table}.search_vector', (), output_field=SearchVectorField()
+        )
+    ).filter(
+        search_vector=search_query
+    ).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query)
+    )
+
+
+def fts5_search(queryset, words):
+    """
+    Отбор - pk__in по подзапросу к FTS5, ранг - bm25 той же строки
+    FTS5 в коррелированном подзапросе (bm25 доступна только при MATCH).
+    """
+    match = ' '.join(f'"{word}"*' for word in words)
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    weights = ', '.join(map(str, FTS_WEIGHTS))
+    return queryset.filter(
+        pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,)
+        )
+    ).annotate(
+        search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+            (match,),
+            output_field=FloatField()
+        )
+    )
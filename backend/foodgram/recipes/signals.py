@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes import feed, jobs
+from recipes.counters import change
+from recipes.images import enqueue
+from recipes.ingredient_index import build_index
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeImageVariant,
+    RecipeJob,
+    ShoppingCart,
+    ShoppingListIngredient,
+    StoredImage,
+    User
+)
+from users.models import Follow
+
+# Связь -> (модель со счетчиком, поле счетчика, поле-ссылка связи).
+COUNTED = {
+    Favorite: (Recipe, 'favorites_count', 'recipe_id'),
+    ShoppingCart: (Recipe, 'in_carts_count', 'recipe_id'),
+    Recipe: (User, 'recipes_count', 'author_id'),
+    Follow: (User, 'followers_count', 'following_id'),
+}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListIngredient.objects.add_recipes(
+            instance.user_id, [instance.recipe_id]
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def counted_added(sender, instance, created, **kwargs):
+    if created:
+        model, field, link = COUNTED[sender]
+        change(model, getattr(instance, link), field, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def counted_removed(sender, instance, origin, **kwargs):
+    model, field, link = COUNTED[sender]
+    # Строка со счетчиком удаляется вместе со связями: не трогаем ее.
+    if not isinstance(origin, model) or origin.pk != getattr(instance, link):
+        change(model, getattr(instance, link), field, -1)
+
+
+@receiver(pre_delete, sender=User)
+def user_removed(sender, instance, **kwargs):
+    # У избранного, корзин и подписок нет сигналов удаления, поэтому
+    # каскад удаляет их одним DELETE без выборки строк. Счетчики
+    # рецептов и авторов, на которые ссылались связи, уменьшаются здесь
+    # одним UPDATE на поле. Прямое удаление связей - в их QuerySet.delete.
+    for related in (Favorite, ShoppingCart, Follow):
+        model, field, link = COUNTED[related]
+        model.objects.subtract_links(
+            field, related.objects.filter(user=instance), link
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    # Рассылку в ленты подписчиков делает воркер process_recipe_jobs.
+    if created:
+        jobs.enqueue([instance], (RecipeJob.FEED,))
+
+
+@receiver(post_save, sender=Follow)
+def author_followed(sender, instance, created, **kwargs):
+    if created:
+        feed.follow(instance.user_id, instance.following_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    ShoppingListIngredient.objects.update_recipe(
+        instance,
+        dict(instance.recipe_ingredient.values_list('ingredient', 'amount')),
+        {}
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    transaction.on_commit(build_index)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    # Та же картинка хранилищем не пишется и получает то же имя.
+    loaded = getattr(instance, 'loaded_image', None)
+    if instance.image.name != loaded:
+        if instance.image.name:
+            StoredImage.objects.acquire(instance.image.name)
+        if loaded:
+            StoredImage.objects.release(loaded)
+        enqueue([instance])
+        instance.loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_removed(sender, instance, **kwargs):
+    if instance.image.name:
+        StoredImage.objects.release(instance.image.name)
+
+
+@receiver(post_delete, sender=RecipeImageVariant)
+def image_variant_removed(sender, instance, **kwargs):
+    storage, name = instance.file.storage, instance.file.name
+    transaction.on_commit(lambda: storage.delete(name))
@@ -0,0 +1,251 @@
+"""
+Похожие рецепты.
+
+Рецепт описывается разреженным вектором ингредиентов с весом
+idf = log(1 + N / df): редкий общий ингредиент говорит о сходстве
+больше частого. Ингредиенты, которые есть почти везде (соль, вода),
+не учитываются совсем: они почти не влияют на сходство, но сделали бы
+произведение матриц плотным. Сходство двух рецептов с общими
+ингредиентами:
+
+    (1 - SIMILAR_TAG_WEIGHT) * косинус векторов ингредиентов
+    + SIMILAR_TAG_WEIGHT * коэффициент Жаккара их тегов
+
+Для каждого рецепта хранятся SIMILAR_RECIPES_COUNT лучших соседей
+(SimilarRecipe). manage.py build_similar_recipes пересчитывает всех
+пачками строк матрицы, а update_recipe после изменения рецепта через
+API (в воркере process_recipe_jobs, см. recipes.jobs) пересчитывает
+соседей одного рецепта среди кандидатов с общими ингредиентами
+и добавляет его в списки этих кандидатов. Веса idf при этом
+не пересчитываются для всего каталога, поэтому полный пересчет стоит
+запускать по расписанию.
+"""
+import math
+from array import array
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from scipy import sparse
+
+from foodgram.constants import (
+    SIMILAR_CANDIDATES,
+    SIMILAR_COMMON_MIN_RECIPES,
+    SIMILAR_COMMON_SHARE,
+    SIMILAR_RECIPES_COUNT,
+    SIMILAR_TAG_WEIGHT,
+)
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+RecipeTag = Recipe.tags.through
+
+
+def ingredient_weights(ingredient_ids=None):
+    """{ingredient_id: idf} без слишком частых ингредиентов."""
+    total = Recipe.objects.count()
+    common = max(total * SIMILAR_COMMON_SHARE, SIMILAR_COMMON_MIN_RECIPES)
+    frequencies = RecipeIngredient.objects.values('ingredient').annotate(
+        frequency=Count('id')
+    ).values_list('ingredient', 'frequency').order_by()
+    if ingredient_ids is not None:
+        frequencies = frequencies.filter(ingredient__in=ingredient_ids)
+    return {
+        ingredient_id: math.log(1 + total / frequency)
+        for ingredient_id, frequency in frequencies.iterator()
+        if frequency <= common
+    }
+
+
+def pairs(rows):
+    """Пары (рецепт, объект) из values_list в два массива numpy."""
+    recipes, objects = array('q'), array('q')
+    for recipe_id, object_id in rows:
+        recipes.append(recipe_id)
+        objects.append(object_id)
+    return np.frombuffer(recipes, np.int64), np.frombuffer(objects, np.int64)
+
+
+class RecipeVectors:
+    """
+    Векторы рецептов recipe_ids (строки в порядке возрастания id):
+    нормированная матрица ингредиентов и бинарная матрица тегов.
+    """
+
+    def __init__(self, recipe_ids, ingredients, tags, weights):
+        self.ids = np.unique(np.asarray(recipe_ids, np.int64))
+        recipes, ingredient_ids = ingredients
+        values = np.array(
+            [weights.get(pk, 0.0) for pk in ingredient_ids.tolist()]
+        )
+        self.ingredients = self.matrix(recipes, ingredient_ids, values)
+        norms = np.sqrt(
+            np.asarray(self.ingredients.multiply(self.ingredients).sum(1))
+        ).ravel()
+        norms[norms == 0] = 1
+        self.ingredients = sparse.diags(1 / norms) @ self.ingredients
+        self.ingredients.eliminate_zeros()
+
+        recipes, tag_ids = tags
+        self.tags = self.matrix(recipes, tag_ids, np.ones(len(tag_ids)))
+        self.tag_counts = np.asarray(self.tags.sum(1)).ravel()
+
+    def matrix(self, recipes, object_ids, values):
+        keep = np.isin(recipes, self.ids)
+        recipes, object_ids = recipes[keep], object_ids[keep]
+        columns, column_of = np.unique(object_ids, return_inverse=True)
+        return sparse.csr_matrix(
+            (values[keep], (np.searchsorted(self.ids, recipes), column_of)),
+            shape=(len(self.ids), len(columns))
+        )
+
+    def similarity(self, rows):
+        """
+        Сходство строк rows со всеми рецептами: разреженная матрица,
+        в которой есть только пары с общими ингредиентами.
+        """
+        cosine = (self.ingredients[rows] @ self.ingredients.T).tocoo()
+        first, second = rows[cosine.row], cosine.col
+        shared = np.asarray(
+            self.tags[first].multiply(self.tags[second]).sum(1)
+        ).ravel()
+        union = self.tag_counts[first] + self.tag_counts[second] - shared
+        jaccard = np.divide(
+            shared, union, out=np.zeros(len(shared)), where=union > 0
+        )
+        # Округление убирает разницу в последних знаках между полным
+        # и частичным пересчетом, равные рецепты сортируются по id.
+        score = np.round((1 - SIMILAR_TAG_WEIGHT) * cosine.data
+                         + SIMILAR_TAG_WEIGHT * jaccard, 9)
+        return sparse.csr_matrix(
+            (score, (cosine.row, second)), shape=cosine.shape
+        )
+
+    def nearest(self, rows):
+        """Для строк rows: (id рецепта, id соседей, сходство) по убыванию."""
+        count = SIMILAR_RECIPES_COUNT
+        rows = np.asarray(rows)
+        scores = self.similarity(rows)
+        for position, row in enumerate(rows):
+            start, end = scores.indptr[position], scores.indptr[position + 1]
+            columns = scores.indices[start:end]
+            values = scores.data[start:end]
+            keep = columns != row
+            columns, values = columns[keep], values[keep]
+            if len(values) > count:
+                top = np.argpartition(-values, count)[:count]
+                columns, values = columns[top], values[top]
+            order = np.lexsort((self.ids[columns], -values))
+            yield (int(self.ids[row]), self.ids[columns[order]].tolist(),
+                   values[order].tolist())
+
+
+def load_vectors(recipe_ids=None, weights=None):
+    ingredients = RecipeIngredient.objects.order_by()
+    tags = RecipeTag.objects.order_by()
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.values_list('id', flat=True)
+    else:
+        ingredients = ingredients.filter(recipe__in=recipe_ids)
+        tags = tags.filter(recipe__in=recipe_ids)
+    return RecipeVectors(
+        list(recipe_ids),
+        pairs(ingredients.values_list('recipe', 'ingredient').iterator()),
+        pairs(tags.values_list('recipe', 'tag').iterator()),
+        ingredient_weights() if weights is None else weights
+    )
+
+
+def rebuild(batch_size=1000):
+    """Полный пересчет, возвращает число сохраненных соседей."""
+    vectors = load_vectors()
+    created = 0
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        for start in range(0, len(vectors.ids), batch_size):
+            rows = np.arange(start, min(start + batch_size, len(vectors.ids)))
+            created += len(SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score)
+                for recipe_id, similar_ids, scores in vectors.nearest(rows)
+                for similar_id, score in zip(similar_ids, scores)
+            ))
+    return created
+
+
+def update_recipe(recipe_id):
+    """
+    Соседи рецепта после его создания или изменения: сравнение
+    с SIMILAR_CANDIDATES рецептами с наибольшим числом общих ингредиентов.
+    Рецепт также попадает в списки соседей тех кандидатов, для которых
+    он лучше худшего из их соседей.
+    """
+    own = list(RecipeIngredient.objects.filter(
+        recipe=recipe_id
+    ).values_list('ingredient', flat=True))
+    weights = ingredient_weights(own)
+    candidates = list(RecipeIngredient.objects.filter(
+        ingredient__in=weights.keys()
+    ).exclude(recipe=recipe_id).values('recipe').annotate(
+        shared=Count('id')
+    ).order_by('-shared', 'recipe').values_list(
+        'recipe', flat=True
+    )[:SIMILAR_CANDIDATES])
+    recipe_ids = [recipe_id, *candidates]
+    weights.update(ingredient_weights(set(RecipeIngredient.objects.filter(
+        recipe__in=candidates
+    ).values_list('ingredient', flat=True)) - weights.keys()))
+    vectors = load_vectors(recipe_ids, weights)
+    row = int(np.searchsorted(vectors.ids, recipe_id))
+    similarity = vectors.similarity(np.array([row]))
+    scores = {
+        int(vectors.ids[column]): score
+        for column, score in zip(similarity.indices, similarity.data)
+        if column != row
+    }
+    _, similar_ids, top_scores = next(vectors.nearest([row]))
+
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe=recipe_id).delete()
+        SimilarRecipe.objects.filter(similar=recipe_id).exclude(
+            recipe__in=scores.keys()
+        ).delete()
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for similar_id, score in zip(similar_ids, top_scores)
+        )
+        add_to_candidates(recipe_id, scores)
+
+
+def add_to_candidates(recipe_id, scores):
+    """Добавляет рецепт в списки соседей кандидатов и обрезает их."""
+    current = {}
+    for row in SimilarRecipe.objects.filter(
+        recipe__in=scores.keys()
+    ).exclude(similar=recipe_id).values('recipe', 'id', 'score'):
+        current.setdefault(row['recipe'], []).append(row)
+    to_save, pushed_out, not_better = [], [], []
+    for candidate, score in scores.items():
+        neighbours = sorted(
+            current.get(candidate, []), key=lambda row: -row['score']
+        )
+        if (len(neighbours) >= SIMILAR_RECIPES_COUNT
+                and score <= neighbours[SIMILAR_RECIPES_COUNT - 1]['score']):
+            not_better.append(candidate)
+            continue
+        to_save.append(SimilarRecipe(
+            recipe_id=candidate, similar_id=recipe_id, score=score
+        ))
+        pushed_out.extend(
+            row['id'] for row in neighbours[SIMILAR_RECIPES_COUNT - 1:]
+        )
+    SimilarRecipe.objects.filter(id__in=pushed_out).delete()
+    SimilarRecipe.objects.filter(
+        similar=recipe_id, recipe__in=not_better
+    ).delete()
+    SimilarRecipe.objects.bulk_create(
+        to_save,
+        update_conflicts=True,
+        unique_fields=('recipe', 'similar'),
+        update_fields=('score',)
+    )
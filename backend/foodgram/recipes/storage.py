@@ -0,0 +1,46 @@
+import hashlib
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище картинок рецептов, в котором имя файла - sha256 его
+    содержимого: upload_to/ab/abcd...ef.png. Одинаковые картинки
+    хранятся одним файлом, повторное сохранение тех же байт ничего
+    не пишет. Сколько рецептов ссылается на файл, считает
+    recipes.models.StoredImage. Сохранять картинку нужно в той же
+    транзакции, что и StoredImage.objects.acquire (как при сохранении
+    рецепта через API и админку): блокировка записи файла держится
+    до коммита.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        name = posixpath.join(
+            posixpath.dirname(name),
+            digest[:2],
+            digest + posixpath.splitext(name)[1].lower()
+        )
+        with transaction.atomic(savepoint=False):
+            # Файл без ссылок не удалится, пока идет проверка и запись.
+            apps.get_model('recipes', 'StoredImage').objects.lock(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
+
+
+def recipe_image_storage():
+    return ContentAddressedStorage()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.admin_filters import EmailFilter, UsernameFilter
 from users.models import FoodgramUser, Follow
 
 
@@ -17,20 +18,22 @@ class FoodgramUserAdmin(UserAdmin):
 
     search_fields = (
         'email',
+        'username',
         'first_name',
         'last_name'
     )
     ordering = ('email',)
-    list_filter = ('email', 'username',)
+    list_filter = (EmailFilter, UsernameFilter)
 
-    @admin.display(description='Рецепты')
+    @admin.display(description='Рецепты', ordering='recipes_count')
     def recipes(self, obj):
-        # Count new field
-        return obj.recipes.count()
+        return obj.recipes_count
 
-    @admin.display(description='Количество подписчиков')
+    @admin.display(
+        description='Количество подписчиков', ordering='followers_count'
+    )
     def followers(self, obj):
-        return obj.following.count()
+        return obj.followers_count
 
 
 @admin.register(Follow)
@@ -39,3 +42,4 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'following',
     )
+    autocomplete_fields = ('user', 'following')
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.4 on 2026-10-17 06:23
+
+from django.db import migrations
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='foodgramuser',
+            managers=[
+                ('objects', users.models.FoodgramUserManager()),
+            ],
+        ),
+    ]
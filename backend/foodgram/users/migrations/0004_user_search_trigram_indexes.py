@@ -0,0 +1,37 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Поиск и фильтры админки сравнивают UPPER("поле"::text) через LIKE.
+FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_foodgramuser_upper_{field}_trgm '
+            f'ON users_foodgramuser USING gin (UPPER({field}::text) '
+            'gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS users_foodgramuser_upper_{field}_trgm'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_foodgramuser_counters'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,12 +1,32 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
 
 import foodgram.constants as const
+from foodgram.mixins import CountersMixin, CountersQuerySetMixin
 from users.validators import validate_username
 
 
-class FoodgramUser(AbstractUser):
+class FoodgramUserQuerySet(CountersQuerySetMixin, models.QuerySet):
+    """Класс для аннотирования queryset пользователей."""
+
+    def annotate_subscribed(self, user_id):
+        return self.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(
+                    following__pk=OuterRef('pk'),
+                    user_id=user_id,
+                )
+            ),
+        )
+
+
+class FoodgramUserManager(UserManager.from_queryset(FoodgramUserQuerySet)):
+    """Менеджер пользователей с аннотациями FoodgramUserQuerySet."""
+
+
+class FoodgramUser(CountersMixin, AbstractUser):
     '''
     Класс для кастомной модели Юзер для проекта Foodgram.
     Поле email будет использоваться вместо поля username.
@@ -38,8 +58,22 @@ class FoodgramUser(AbstractUser):
         verbose_name='Фамилия',
         max_length=const.MAX_NAME_LENGTH,
     )
+    # Счетчики поддерживаются сигналами, см. recipes.counters,
+    # поэтому в формах (админка) их нет.
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='подписчиков',
+        default=0,
+        editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'last_name', 'first_name')
+    objects = FoodgramUserManager()
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('email', 'username',)
@@ -50,6 +84,33 @@ class FoodgramUser(AbstractUser):
         return self.username
 
 
+class FollowQuerySet(models.QuerySet):
+
+    def delete(self):
+        """
+        Отписка: счетчик подписчиков - одним UPDATE, записи авторов
+        в лентах подписчиков - через recipes.feed. Сигналов удаления у
+        модели нет, поэтому при удалении пользователя Django удаляет
+        подписки одним DELETE (см. recipes.signals).
+        """
+        # recipes.feed импортирует эту модель.
+        from recipes.feed import unfollow
+
+        with transaction.atomic(savepoint=False):
+            pairs = list(self.values_list('user', 'following'))
+            if not pairs:
+                return 0, {}
+            FoodgramUser.objects.subtract_links(
+                'followers_count', self, 'following'
+            )
+            for user_id, author_id in pairs:
+                unfollow(user_id, author_id)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Follow(models.Model):
     """
     Класс подписки одного пользователя на другого.
@@ -69,6 +130,8 @@ class Follow(models.Model):
         verbose_name='Автор рецептов'
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -85,3 +148,8 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user.username} подписан на {self.following.username}'
+
+    def delete(self, using=None, keep_parents=False):
+        result = type(self).objects.filter(pk=self.pk).delete()
+        self.pk = None
+        return result